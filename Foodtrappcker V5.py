@@ -2,1524 +2,362 @@
 # -*- coding: utf-8 -*-
 
 from __future__ import annotations
-from datetime import datetime, date
-from typing import List, Dict
-import io
+from datetime import date, timedelta
+from typing import TYPE_CHECKING, Dict, List
+import logging
+import math
+import os
+import time
+import uuid
 
-import pandas as pd
 import streamlit as st
 
+# coach, columnar e importar se importan en el camino que los usa (modo coach,
+# export Parquet, import); eventos ya lo carga almacen
+from foodtrappcker import activos, almacen, bitacora, busqueda, catalogo, eventos, exportar
+from foodtrappcker.diario import Diario, NOMBRE_AGUA, nuevo_id
+from foodtrappcker.nutricion import (
+    CLAVES, CON_OBJETIVO, GENEROS, NUTRIENTES, OBJETIVOS, SIN_OBJETIVO, color_hex, requerimientos_perfil,
+    valores_fila,
+)
+from foodtrappcker.plantillas import Recientes, nueva_plantilla
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+    from foodtrappcker import coach
+
+logger = logging.getLogger(__name__)
+
 # =========================
 # Configuración básica
 # =========================
 st.set_page_config(page_title="Diario de Comidas", layout="wide")
-HORA_FMT = "%H:%M"
+MAX_OPCIONES = 50  # opciones del selector de alimentos por búsqueda
+DEBUG = os.environ.get("DIARIO_DEBUG", "") not in ("", "0")
 
 # =========================
-# Estilos responsivos (móvil/tablet/desktop)
+# Estilos + logo (preparados una vez por proceso)
 # =========================
-st.markdown("""
-<style>
-.block-container {
-    padding-top: 2.2rem;       /* antes .5rem → más espacio superior */
-    padding-bottom: 2rem;
-    max-width: 1200px;
-}
-h1 {
-    line-height: 1.25;         /* evita que el emoji se recorte */
-    overflow: visible !important;
-}
-.stProgress > div > div { height: 16px; border-radius: 12px; }
-.stButton > button { padding: .65rem 1rem; border-radius: 12px; }
-.stNumberInput input, .stTextInput input { border-radius: 10px; }
-
-/* Móvil */
-@media (max-width: 480px) {
-  .block-container { padding-left: .6rem; padding-right: .6rem; padding-top: 1.5rem; }
-  .stProgress > div > div { height: 22px; }
-  .stButton > button { width: 100%; font-size: 1rem; }
-  .stNumberInput label, .stTextInput label, .stSelectbox label { font-size: 0.95rem; }
-  .stDataFrame { font-size: .92rem; }
-  .st-emotion-cache-ocqkz7, .st-emotion-cache-1wmy9hl { display: block !important; }
-}
-
-/* Tablet */
-@media (min-width: 481px) and (max-width: 1024px) {
-  .stProgress > div > div { height: 20px; }
-  .stButton > button { font-size: .95rem; }
-}
-</style>
-""", unsafe_allow_html=True)
+st.markdown(activos.chrome_html(), unsafe_allow_html=True)
 
-# =========================
-# Logo superior derecho
-# =========================
-from pathlib import Path
-import base64
-
-logo_path = Path(__file__).parent / "Logohorizontal.png"
-
-with open(logo_path, "rb") as f:
-    logo_base64 = base64.b64encode(f.read()).decode()
-
-st.markdown(
-    f"""
-    <style>
-    [data-testid="stAppViewContainer"] {{
-        position: relative;
-    }}
-    .logo-tribu {{
-        position: absolute;
-        top: 10px;
-        right: 25px;
-        width: 180px;
-        z-index: 999;
-    }}
-    </style>
-    <img src="data:image/png;base64,{logo_base64}" class="logo-tribu">
-    """,
-    unsafe_allow_html=True
-)
+if DEBUG:
+    logger.info("chrome estático por rerun: %d bytes", activos.bytes_chrome())
+    st.sidebar.caption(f"Chrome estático por rerun: {activos.bytes_chrome() / 1024:.1f} KiB")
 
 
-# =========================
-# BASE INTERNA (proporcionada)
-# =========================
-BASE_INTERNA: List[Dict] = [
-  {
-    "nombre": "Pechuga de pollo (cruda, sin piel)",
-    "porcion_desc": "100g",
-    "kcal": 120.0,
-    "proteina_g": 22.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Carne roja magra (cruda)",
-    "porcion_desc": "100g",
-    "kcal": 170.0,
-    "proteina_g": 27.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Carne roja (cruda)",
-    "porcion_desc": "100g",
-    "kcal": 280.0,
-    "proteina_g": 23.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Pavo (pechuga cruda, sin piel)",
-    "porcion_desc": "100g",
-    "kcal": 110.0,
-    "proteina_g": 21.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Hamburguesa (completa)",
-    "porcion_desc": "1 unidad",
-    "kcal": 615.0,
-    "proteina_g": 32.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Arepa",
-    "porcion_desc": "1 unidad",
-    "kcal": 218.0,
-    "proteina_g": 5.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Estofado de pollo",
-    "porcion_desc": "1 plato",
-    "kcal": 350.0,
-    "proteina_g": 22.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Estofado de res",
-    "porcion_desc": "1 plato",
-    "kcal": 450.0,
-    "proteina_g": 30.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Chuleta de cerdo magra (cruda)",
-    "porcion_desc": "100g",
-    "kcal": 143.0,
-    "proteina_g": 21.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Salmón (crudo)",
-    "porcion_desc": "100g",
-    "kcal": 142.0,
-    "proteina_g": 20.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Huevo Frtio",
-    "porcion_desc": "1 unidad",
-    "kcal": 110.0,
-    "proteina_g": 7.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Paella",
-    "porcion_desc": "1 plato",
-    "kcal": 400.0,
-    "proteina_g": 15.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Chicharron de cerdo",
-    "porcion_desc": "1 plato",
-    "kcal": 500.0,
-    "proteina_g": 40.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Clara de huevo",
-    "porcion_desc": "1 unidad",
-    "kcal": 4.0,
-    "proteina_g": 4.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Bowl de Ensalada",
-    "porcion_desc": "1 unidad",
-    "kcal": 170.0,
-    "proteina_g": 4.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Atún fresco (crudo)",
-    "porcion_desc": "100g",
-    "kcal": 144.0,
-    "proteina_g": 23.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Atún en lata (en aceite)",
-    "porcion_desc": "1 unidad (120g)",
-    "kcal": 250.0,
-    "proteina_g": 26.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Atún en lata (en agua)",
-    "porcion_desc": "1 unidad (120g)",
-    "kcal": 120.0,
-    "proteina_g": 28.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Merluza (cruda, pescado blanco)",
-    "porcion_desc": "100g",
-    "kcal": 85.0,
-    "proteina_g": 18.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Bacalao (crudo, pescado blanco)",
-    "porcion_desc": "100g",
-    "kcal": 82.0,
-    "proteina_g": 18.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Tilapia (cruda)",
-    "porcion_desc": "100g",
-    "kcal": 96.0,
-    "proteina_g": 20.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Camarones (crudos)",
-    "porcion_desc": "100g",
-    "kcal": 99.0,
-    "proteina_g": 24.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Huevo entero",
-    "porcion_desc": "1 unidad",
-    "kcal": 70.0,
-    "proteina_g": 6.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Rapidita",
-    "porcion_desc": "1 unidad",
-    "kcal": 145.0,
-    "proteina_g": 4.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Requesón (cottage 2%)",
-    "porcion_desc": "100g",
-    "kcal": 82.0,
-    "proteina_g": 11.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Legumbres (cocidas, secas, crudas)",
-    "porcion_desc": "100g",
-    "kcal": 116.0,
-    "proteina_g": 9.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Edamame (vaina verde, crudo)",
-    "porcion_desc": "100g",
-    "kcal": 122.0,
-    "proteina_g": 11.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Tofu firme",
-    "porcion_desc": "100g",
-    "kcal": 76.0,
-    "proteina_g": 8.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Batido Nutricional",
-    "porcion_desc": "1 scoop",
-    "kcal": 45.0,
-    "proteina_g": 4.5,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "PDM",
-    "porcion_desc": "1 scoop",
-    "kcal": 55.0,
-    "proteina_g": 9.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Olluquitos",
-    "porcion_desc": "1 plato",
-    "kcal": 195.0,
-    "proteina_g": 3.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "H24 Rebuild Strength",
-    "porcion_desc": "1 scoop",
-    "kcal": 95.0,
-    "proteina_g": 12.5,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Crocante de Proteina",
-    "porcion_desc": "1 barra",
-    "kcal": 37.0,
-    "proteina_g": 7.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Bebida Pro H24",
-    "porcion_desc": "1 sobre",
-    "kcal": 35.0,
-    "proteina_g": 17.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Beverage Mix",
-    "porcion_desc": "1 scoop",
-    "kcal": 37.0,
-    "proteina_g": 15.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Proteina Personalizada en Polvo (PPP)",
-    "porcion_desc": "1 scoop (6g)",
-    "kcal": 20.0,
-    "proteina_g": 5.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Lentejas (cocidas)",
-    "porcion_desc": "100g",
-    "kcal": 116.0,
-    "proteina_g": 9.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Garbanzos (cocidos)",
-    "porcion_desc": "100g",
-    "kcal": 164.0,
-    "proteina_g": 9.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Arvejas (cocidas)",
-    "porcion_desc": "100g",
-    "kcal": 84.0,
-    "proteina_g": 5.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Espinaca",
-    "porcion_desc": "100g",
-    "kcal": 23.0,
-    "proteina_g": 3.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Brócoli",
-    "porcion_desc": "100g",
-    "kcal": 34.0,
-    "proteina_g": 3.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Zanahoria",
-    "porcion_desc": "100g",
-    "kcal": 41.0,
-    "proteina_g": 1.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Pepino",
-    "porcion_desc": "100g",
-    "kcal": 16.0,
-    "proteina_g": 0.7,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Cebolla",
-    "porcion_desc": "100g",
-    "kcal": 40.0,
-    "proteina_g": 1.1,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Pimiento",
-    "porcion_desc": "100g",
-    "kcal": 31.0,
-    "proteina_g": 1.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Tomate",
-    "porcion_desc": "100g",
-    "kcal": 18.0,
-    "proteina_g": 0.9,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Plátano",
-    "porcion_desc": "1 unidad",
-    "kcal": 105.0,
-    "proteina_g": 1.3,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Manzana",
-    "porcion_desc": "1 unidad",
-    "kcal": 95.0,
-    "proteina_g": 0.5,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Pera",
-    "porcion_desc": "1 unidad",
-    "kcal": 101.0,
-    "proteina_g": 0.6,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Naranja",
-    "porcion_desc": "1 unidad",
-    "kcal": 62.0,
-    "proteina_g": 1.2,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Mandarina",
-    "porcion_desc": "1 unidad",
-    "kcal": 47.0,
-    "proteina_g": 0.7,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Piña",
-    "porcion_desc": "1 taza (165g)",
-    "kcal": 82.0,
-    "proteina_g": 0.9,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Papaya",
-    "porcion_desc": "1 taza (145g)",
-    "kcal": 62.0,
-    "proteina_g": 0.7,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Mango",
-    "porcion_desc": "1 taza (165g)",
-    "kcal": 99.0,
-    "proteina_g": 1.4,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Uvas",
-    "porcion_desc": "1 puñado (80g)",
-    "kcal": 55.0,
-    "proteina_g": 0.6,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Fresas",
-    "porcion_desc": "1 puñado (100g)",
-    "kcal": 33.0,
-    "proteina_g": 0.7,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Kiwi",
-    "porcion_desc": "1 unidad",
-    "kcal": 42.0,
-    "proteina_g": 0.8,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Almendras",
-    "porcion_desc": "1 puñado (28g)",
-    "kcal": 170.0,
-    "proteina_g": 6.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Maní (cacahuate)",
-    "porcion_desc": "1 puñado (28g)",
-    "kcal": 165.0,
-    "proteina_g": 7.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Nueces",
-    "porcion_desc": "1 puñado (28g)",
-    "kcal": 185.0,
-    "proteina_g": 4.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Arroz Blanco (Cocido)",
-    "porcion_desc": "1 taza (150g)",
-    "kcal": 200.0,
-    "proteina_g": 4.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Arroz Integral (Cocido)",
-    "porcion_desc": "1 taza (150g)",
-    "kcal": 215.0,
-    "proteina_g": 5.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Pasta Blanca (Cocida)",
-    "porcion_desc": "1 taza (150g)",
-    "kcal": 220.0,
-    "proteina_g": 7.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Papa (Cocida)",
-    "porcion_desc": "1 unidad (150g)",
-    "kcal": 130.0,
-    "proteina_g": 3.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Camote (Cocido)",
-    "porcion_desc": "1 unidad (150g)",
-    "kcal": 135.0,
-    "proteina_g": 2.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Quinua (Cocida)",
-    "porcion_desc": "1 taza (185g)",
-    "kcal": 222.0,
-    "proteina_g": 8.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Avena (Cocida)",
-    "porcion_desc": "1 taza (234g)",
-    "kcal": 154.0,
-    "proteina_g": 6.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Pasta Integral (Cocida)",
-    "porcion_desc": "1 taza (150g)",
-    "kcal": 210.0,
-    "proteina_g": 8.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Aceituna verde deshuesada",
-    "porcion_desc": "1 unidad",
-    "kcal": 5,
-    "proteina_g": 0.05,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Herbal Aloe Concentrado",
-    "porcion_desc": "3 tapas",
-    "kcal": 1.8,
-    "proteina_g": 0.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "N-R-G",
-    "porcion_desc": "1/2 cucharadita",
-    "kcal": 3.4,
-    "proteina_g": 0.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Té Concentrado de Hierbas",
-    "porcion_desc": "1/2 cucharadita",
-    "kcal": 6.0,
-    "proteina_g": 0.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "CR7 Drive",
-    "porcion_desc": "1 scoop",
-    "kcal": 50.0,
-    "proteina_g": 0.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "RLX",
-    "porcion_desc": "1 sobre",
-    "kcal": 5.0,
-    "proteina_g": 0.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Collagen Beauty Drink",
-    "porcion_desc": "1 scoop",
-    "kcal": 25.0,
-    "proteina_g": 2.5,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Niteworks",
-    "porcion_desc": "1 scoop",
-    "kcal": 25.0,
-    "proteina_g": 0.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Immune Essentials",
-    "porcion_desc": "1 scoop",
-    "kcal": 25.0,
-    "proteina_g": 0.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Complex Multivitamínico",
-    "porcion_desc": "1 cápsula",
-    "kcal": 5.0,
-    "proteina_g": 0.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Her Calic",
-    "porcion_desc": "1 cápsula",
-    "kcal": 5.0,
-    "proteina_g": 0.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Omeg 3",
-    "porcion_desc": "1 cápsula",
-    "kcal": 10.0,
-    "proteina_g": 0.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Xtra Cal",
-    "porcion_desc": "1 cápsula",
-    "kcal": 10.0,
-    "proteina_g": 0.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Queso Cheddar",
-    "porcion_desc": "10 laminas (20g)",
-    "kcal": 270.0,
-    "proteina_g": 18.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Queso Edam",
-    "porcion_desc": "100g",
-    "kcal": 350.0,
-    "proteina_g": 25.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Queso Mozzarella",
-    "porcion_desc": "100g",
-    "kcal": 280.0,
-    "proteina_g": 28.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Yogurt Griego",
-    "porcion_desc": "1 vaso (250ml)",
-    "kcal": 136.0,
-    "proteina_g": 7.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Yogurt Griego Light",
-    "porcion_desc": "1 vaso (250ml)",
-    "kcal": 125.0,
-    "proteina_g": 15.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Yogurt Natural",
-    "porcion_desc": "1 vaso (250ml)",
-    "kcal": 118.0,
-    "proteina_g": 6.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Leche evaporada (diluida)",
-    "porcion_desc": "1 vaso (250ml)",
-    "kcal": 155.0,
-    "proteina_g": 8.8,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Leche de vaca (deslactosada)",
-    "porcion_desc": "1 vaso (250ml)",
-    "kcal": 115.0,
-    "proteina_g": 8.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Leche de soya (sin azúcar)",
-    "porcion_desc": "1 vaso (250ml)",
-    "kcal": 95.0,
-    "proteina_g": 7.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Leche de almendras (sin azúcar)",
-    "porcion_desc": "1 vaso (250ml)",
-    "kcal": 35.0,
-    "proteina_g": 1.2,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Tomate (unidad)",
-    "porcion_desc": "1 unidad",
-    "kcal": 18.0,
-    "proteina_g": 0.9,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Manzana (unidad)",
-    "porcion_desc": "1 unidad",
-    "kcal": 95.0,
-    "proteina_g": 0.5,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Pera (unidad)",
-    "porcion_desc": "1 unidad",
-    "kcal": 101.0,
-    "proteina_g": 0.6,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Uva",
-    "porcion_desc": "1 puñado (80g)",
-    "kcal": 55.0,
-    "proteina_g": 0.6,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Plátano (unidad)",
-    "porcion_desc": "1 unidad",
-    "kcal": 105.0,
-    "proteina_g": 1.3,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Pan de molde blanco",
-    "porcion_desc": "1 tajada",
-    "kcal": 80.0,
-    "proteina_g": 3.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Pan de molde integral",
-    "porcion_desc": "1 tajada",
-    "kcal": 80.0,
-    "proteina_g": 3.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Pan francés",
-    "porcion_desc": "1 unidad",
-    "kcal": 160.0,
-    "proteina_g": 5.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Pan ciabatta",
-    "porcion_desc": "1 unidad",
-    "kcal": 260.0,
-    "proteina_g": 9.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Arándanos",
-    "porcion_desc": "1 puñado (70g)",
-    "kcal": 40.0,
-    "proteina_g": 0.5,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Frambuesas",
-    "porcion_desc": "1 puñado (70g)",
-    "kcal": 32.0,
-    "proteina_g": 0.7,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Zarzamoras",
-    "porcion_desc": "1 puñado (70g)",
-    "kcal": 43.0,
-    "proteina_g": 1.4,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Lechuga",
-    "porcion_desc": "1 taza (50g)",
-    "kcal": 8.0,
-    "proteina_g": 0.5,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Yogurt Danlac Griego Natural",
-    "porcion_desc": "1 vaso (250ml)",
-    "kcal": 136.0,
-    "proteina_g": 7.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Yogurt Danlac Descremado Natural",
-    "porcion_desc": "1 vaso (250ml)",
-    "kcal": 126.0,
-    "proteina_g": 5.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Chaufa de Pollo (Carta)",
-    "porcion_desc": "1 plato",
-    "kcal": 750.0,
-    "proteina_g": 32.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Chaufa de Pollo (Menu)",
-    "porcion_desc": "1 plato",
-    "kcal": 420.0,
-    "proteina_g": 18.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Chaufa Especial (Menu)",
-    "porcion_desc": "1 plato",
-    "kcal": 480.0,
-    "proteina_g": 22.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Chaufa Especial (Carta)",
-    "porcion_desc": "1 plato",
-    "kcal": 850.0,
-    "proteina_g": 40.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Arroz Aeropuerto (Menu)",
-    "porcion_desc": "1 plato",
-    "kcal": 600.0,
-    "proteina_g": 20.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Arroz Aeropuerto (Carta)",
-    "porcion_desc": "1 plato",
-    "kcal": 1100.0,
-    "proteina_g": 38.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Tallarín Saltado de Pollo (Menu)",
-    "porcion_desc": "1 plato",
-    "kcal": 400.0,
-    "proteina_g": 16.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Tallarín Saltado de Pollo (Carta)",
-    "porcion_desc": "1 plato",
-    "kcal": 700.0,
-    "proteina_g": 30.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Tallarín Taypa (Menu)",
-    "porcion_desc": "1 plato",
-    "kcal": 500.0,
-    "proteina_g": 23.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Tallarín Taypa (Carta)",
-    "porcion_desc": "1 plato",
-    "kcal": 900.0,
-    "proteina_g": 42.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Juane",
-    "porcion_desc": "1 unidad",
-    "kcal": 407.0,
-    "proteina_g": 20.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Pollo Chi Jau Kay (Menu)",
-    "porcion_desc": "1 plato",
-    "kcal": 400.0,
-    "proteina_g": 26.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Pollo Chi Jau Kay (Carta)",
-    "porcion_desc": "1 plato",
-    "kcal": 800.0,
-    "proteina_g": 45.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Pollo TiPaKay (Menu)",
-    "porcion_desc": "1 plato",
-    "kcal": 420.0,
-    "proteina_g": 25.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Pollo TiPaKay (Carta)",
-    "porcion_desc": "1 plato",
-    "kcal": 850.0,
-    "proteina_g": 42.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Chancho con tamarindo (Menu)",
-    "porcion_desc": "1 plato",
-    "kcal": 410.0,
-    "proteina_g": 23.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Chancho con tamarindo (Carta)",
-    "porcion_desc": "1 plato",
-    "kcal": 780.0,
-    "proteina_g": 38.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Pollo Enrollado (Menu)",
-    "porcion_desc": "1 plato",
-    "kcal": 450.0,
-    "proteina_g": 30.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Pollo Enrollado (Carta)",
-    "porcion_desc": "1 plato",
-    "kcal": 650.0,
-    "proteina_g": 45.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Lomo en Ostión (Menu)",
-    "porcion_desc": "1 plato",
-    "kcal": 380.0,
-    "proteina_g": 25.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Lomo en Ostión (Carta)",
-    "porcion_desc": "1 plato",
-    "kcal": 720.0,
-    "proteina_g": 40.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Sopa Wantan (Menu)",
-    "porcion_desc": "1 plato",
-    "kcal": 130.0,
-    "proteina_g": 6.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Sopa Wantan (Carta)",
-    "porcion_desc": "1 plato",
-    "kcal": 250.0,
-    "proteina_g": 12.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Ceviche (Completo)",
-    "porcion_desc": "1 plato",
-    "kcal": 450.0,
-    "proteina_g": 38.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Ceviche (Sin Guarniciones)",
-    "porcion_desc": "1 plato",
-    "kcal": 200.0,
-    "proteina_g": 35.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Chifa Casa",
-    "porcion_desc": "1 unidad",
-    "kcal": 450.0,
-    "proteina_g": 28.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Whopper BK",
-    "porcion_desc": "1 unidad",
-    "kcal": 556.0,
-    "proteina_g": 22.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Whopper Cheese BK",
-    "porcion_desc": "1 unidad",
-    "kcal": 594.0,
-    "proteina_g": 26.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Whopper Doble BK",
-    "porcion_desc": "1 unidad",
-    "kcal": 899.0,
-    "proteina_g": 53.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Whopper Doble Cheese BK",
-    "porcion_desc": "1 unidad",
-    "kcal": 937.0,
-    "proteina_g": 57.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Chicken Burger BK",
-    "porcion_desc": "1 unidad",
-    "kcal": 453.0,
-    "proteina_g": 15.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Stacker BK",
-    "porcion_desc": "1 unidad",
-    "kcal": 462.0,
-    "proteina_g": 22.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Papas Fritas BK",
-    "porcion_desc": "1 unidad",
-    "kcal": 328.0,
-    "proteina_g": 4.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Papas Fritas Grandes BK",
-    "porcion_desc": "1 unidad",
-    "kcal": 430.0,
-    "proteina_g": 5.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Gaseosa 21oz",
-    "porcion_desc": "1 unidad",
-    "kcal": 242.0,
-    "proteina_g": 0.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Gaseosa 16oz",
-    "porcion_desc": "1 unidad",
-    "kcal": 184.0,
-    "proteina_g": 0.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Gaseosa 20oz",
-    "porcion_desc": "1 unidad",
-    "kcal": 230.0,
-    "proteina_g": 0.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "MC Donalds Classic",
-    "porcion_desc": "1 unidad",
-    "kcal": 390.0,
-    "proteina_g": 12.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Mc Donalds Cheese",
-    "porcion_desc": "1 unidad",
-    "kcal": 320.0,
-    "proteina_g": 13.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Mc Donalds Doble Cheese",
-    "porcion_desc": "1 unidad",
-    "kcal": 450.0,
-    "proteina_g": 23.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Mc Donalds Doble con Queso",
-    "porcion_desc": "1 unidad",
-    "kcal": 410.0,
-    "proteina_g": 22.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Mc Donalds Chicken",
-    "porcion_desc": "1 unidad",
-    "kcal": 470.0,
-    "proteina_g": 15.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Mc Donalds Nuggets 10",
-    "porcion_desc": "1 unidad",
-    "kcal": 530.0,
-    "proteina_g": 26.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Mc Donalds Papas",
-    "porcion_desc": "1 unidad",
-    "kcal": 340.0,
-    "proteina_g": 3.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Pollo a la brasa (1/4 sin guarnición)",
-    "porcion_desc": "1 unidad",
-    "kcal": 350.0,
-    "proteina_g": 20.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Pollo a la brasa 1/4 (completo)",
-    "porcion_desc": "1 unidad",
-    "kcal": 1500.0,
-    "proteina_g": 20.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Chicharrones Caseros",
-    "porcion_desc": "1 unidad",
-    "kcal": 680.0,
-    "proteina_g": 45.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Tocino",
-    "porcion_desc": "1 unidad",
-    "kcal": 45.0,
-    "proteina_g": 3.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Limonada (con azucar)",
-    "porcion_desc": "1 vaso (250ml)",
-    "kcal": 120.0,
-    "proteina_g": 0.5,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Limonada (sin azucar)",
-    "porcion_desc": "1 vaso (250ml)",
-    "kcal": 30.0,
-    "proteina_g": 0.5,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Chicha (sin azucar)",
-    "porcion_desc": "1 vaso (250ml)",
-    "kcal": 35.0,
-    "proteina_g": 0.5,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Chicha (Con azucar)",
-    "porcion_desc": "1 vaso (250ml)",
-    "kcal": 100.0,
-    "proteina_g": 0.5,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Maracuya (sin azucar)",
-    "porcion_desc": "1 vaso (250ml)",
-    "kcal": 35.0,
-    "proteina_g": 0.5,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Maracuya (con azucar)",
-    "porcion_desc": "1 vaso (250ml)",
-    "kcal": 110.0,
-    "proteina_g": 0.5,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Emoliente (sin azucar)",
-    "porcion_desc": "1 vaso (250ml)",
-    "kcal": 15.0,
-    "proteina_g": 0.5,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Emoliente (con azucar)",
-    "porcion_desc": "1 vaso (250ml)",
-    "kcal": 15.0,
-    "proteina_g": 0.5,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Wantan Frito",
-    "porcion_desc": "1 unidad",
-    "kcal": 45.0,
-    "proteina_g": 1.2,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Siu Mai",
-    "porcion_desc": "1 unidad",
-    "kcal": 45.0,
-    "proteina_g": 2.5,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Palta",
-    "porcion_desc": "1 unidad (200g)",
-    "kcal": 200.0,
-    "proteina_g": 2.5,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Tamal",
-    "porcion_desc": "1 unidad (200g)",
-    "kcal": 400.0,
-    "proteina_g": 10.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Arroz con pato",
-    "porcion_desc": "1 plato",
-    "kcal": 850.0,
-    "proteina_g": 35.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Cabrito",
-    "porcion_desc": "1 plato",
-    "kcal": 950.0,
-    "proteina_g": 45.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Arroz con pollo",
-    "porcion_desc": "1 plato",
-    "kcal": 750.0,
-    "proteina_g": 30.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Aji de gallina",
-    "porcion_desc": "1 plato",
-    "kcal": 750.0,
-    "proteina_g": 28.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Seco de Chabelo",
-    "porcion_desc": "1 plato",
-    "kcal": 1000.0,
-    "proteina_g": 40.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Sudado",
-    "porcion_desc": "1 plato",
-    "kcal": 550.0,
-    "proteina_g": 38.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Queso Fresco",
-    "porcion_desc": "1 tajada (30g)",
-    "kcal": 75.0,
-    "proteina_g": 5.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Yuca sancochada",
-    "porcion_desc": "1 unidad (100g)",
-    "kcal": 120.0,
-    "proteina_g": 1.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Yuca frita",
-    "porcion_desc": "1 unidad (100g)",
-    "kcal": 250.0,
-    "proteina_g": 1.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Jamon de cerdo",
-    "porcion_desc": "1 tajada (15g)",
-    "kcal": 25.0,
-    "proteina_g": 2.5,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Jamon de Pavo",
-    "porcion_desc": "1 tajada (15g)",
-    "kcal": 15.0,
-    "proteina_g": 2.5,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Frijoles cocidos",
-    "porcion_desc": "1 plato (200g)",
-    "kcal": 345.0,
-    "proteina_g": 16.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Anticucho",
-    "porcion_desc": "1 palo (sin acompañamiento)",
-    "kcal": 150.0,
-    "proteina_g": 15.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Maca (Carretilla)",
-    "porcion_desc": "1 vaso",
-    "kcal": 215.0,
-    "proteina_g": 6.5,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Soya (Carretilla)",
-    "porcion_desc": "1 vaso",
-    "kcal": 150.0,
-    "proteina_g": 9.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Kiwicha (Carretilla)",
-    "porcion_desc": "1 vaso",
-    "kcal": 185.0,
-    "proteina_g": 6.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Fibra Activa",
-    "porcion_desc": "1 scoop",
-    "kcal": 27.0,
-    "proteina_g": 0.2,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Champiñon",
-    "porcion_desc": "1 unidad",
-    "kcal": 5.0,
-    "proteina_g": 0.7,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Ciruela",
-    "porcion_desc": "1 unidad",
-    "kcal": 23.0,
-    "proteina_g": 0.3,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Pierna de pollo",
-    "porcion_desc": "1 unidad",
-    "kcal": 360.0,
-    "proteina_g": 34.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Granola",
-    "porcion_desc": "1 taza",
-    "kcal": 360.0,
-    "proteina_g": 8.0,
-    "hidr_ml": 0
-  },
-  {
-    "nombre": "Granola",
-    "porcion_desc": "1 cda",
-    "kcal": 45.0,
-    "proteina_g": 1.0,
-    "hidr_ml": 0
-  },
-]
-
 # =========================
 # Estado inicial
 # =========================
-if "fecha" not in st.session_state:
-    st.session_state.fecha = date.today()
+@st.cache_resource
+def obtener_repositorio() -> almacen.RepositorioDiario:
+    # Una sola instancia por proceso (bitacora.EscrituraDiferida). Las escrituras se
+    # encolan y las aplica un hilo de fondo en lotes: los formularios no esperan al disco.
+    return bitacora.EscrituraDiferida(almacen.RepositorioSQLite())
+
+def usuario_actual() -> str:
+    # Identificador en la URL (?u=...): sobrevive a un refresh del navegador
+    u = st.query_params.get("u")
+    if not u:
+        u = uuid.uuid4().hex[:12]
+        st.query_params["u"] = u
+    return u
+
+repo = obtener_repositorio()
+usuario = usuario_actual()
+
+def cargar_dia(fecha: date):
+    st.session_state.fecha = fecha
+    st.session_state.diario = Diario.desde_registros(repo.cargar_dia(usuario, fecha))
+    # Deshacer / rehacer sobreviven a un refresh: se rearman desde el registro de eventos
+    st.session_state.historial = eventos.Historial(repo.leer_eventos(usuario, fecha))
+    # El último perfil guardado en o antes de ese día: un día nuevo arranca con los objetivos de ayer
+    guardado = repo.leer_perfil_vigente(usuario, fecha)
+    if guardado:
+        st.session_state.perfil, st.session_state.requerimientos = guardado
+    else:
+        st.session_state.perfil = None
+        st.session_state.requerimientos = {n.objetivo: 0.0 for n in CON_OBJETIVO}
+
+def cargar_preferencias():
+    # Plantillas, favoritos y recientes: una lectura por sesión, luego se mantienen en memoria
+    st.session_state.plantillas = repo.leer_plantillas(usuario)
+    st.session_state.favoritos = set(repo.leer_favoritos(usuario))
+    st.session_state.recientes = Recientes(repo.leer_recientes(usuario))
 
-if "perfil" not in st.session_state:
-    st.session_state.perfil = None
+if st.session_state.get("usuario") != usuario:
+    st.session_state.usuario = usuario
+    cargar_dia(date.today())
+    cargar_preferencias()
 
-if "requerimientos" not in st.session_state:
-    st.session_state.requerimientos = {"kcal_obj": 0.0, "prot_obj": 0.0, "agua_obj": 0.0}
+if "export_cache" not in st.session_state:
+    st.session_state.export_cache = exportar.ExportCache()
 
-if "diario" not in st.session_state:
-    st.session_state.diario = []  # {hora,nombre,porciones,porcion_desc,kcal,proteina_g,hidr_ml}
+def al_dia() -> bool:
+    """Pasa a hoy si cambió la fecha (lo anterior ya está en la base con la suya); True si cambió.
 
-# Reset automático si cambia el día
-if st.session_state.fecha != date.today():
-    st.session_state.perfil = None
-    st.session_state.requerimientos = {"kcal_obj": 0.0, "prot_obj": 0.0, "agua_obj": 0.0}
-    st.session_state.diario = []
-    st.session_state.fecha = date.today()
+    Lo llama cada escritura y no solo el rerun completo: un fragmento o un
+    callback no vuelve a pasar por el chequeo de arriba de la página.
+    """
+    if st.session_state.fecha == date.today():
+        return False
+    cargar_dia(date.today())
+    st.session_state.dia_cambiado = True  # el resto de la página todavía muestra el día anterior
+    return True
+
+def refrescar_si_cambio_el_dia():
+    # Al principio de cada fragmento del día: rerun completo (totales, barras, objetivos del día nuevo)
+    if al_dia() or st.session_state.pop("dia_cambiado", False):
+        st.rerun()
+
+def registrar_evento(evento: Dict, ops: List[tuple] = ()):
+    """Persiste un cambio ya aplicado al diario de la sesión (y ``ops`` en la misma escritura)."""
+    repo.aplicar([almacen.op_evento(usuario, st.session_state.fecha, evento), *ops])
+    st.session_state.historial.registrar(evento)
+
+def vaciar_diario():
+    al_dia()
+    diario = st.session_state.diario
+    registros = diario.registros()  # para poder deshacerlo
+    diario.vaciar()
+    registrar_evento(eventos.vaciar(registros))
+
+def eliminar_filas(ids):
+    # Por id, no por posición: la tabla pudo reordenarse entre reruns
+    # (si cambió el día, los ids de ayer no están en el diario de hoy)
+    al_dia()
+    diario = st.session_state.diario
+    pos = diario.posiciones(ids).tolist()
+    registros = [diario.registro(i) for i in pos]
+    if registros:
+        diario.eliminar(pos)
+        registrar_evento(eventos.eliminar(registros))
+
+def editar_porciones(cambios: Dict[int, float]):
+    """Porciones editadas en la tabla (id -> porciones): recalcula desde el catálogo y persiste."""
+    al_dia()
+    diario = st.session_state.diario
+    antes, despues = [], []
+    for id_, p in cambios.items():
+        pos = diario.posiciones([id_])
+        if pos.size:
+            antes.append(diario.registro(int(pos[0])))
+            despues.append(diario.actualizar_porciones(id_, p, cat))
+    if despues:
+        registrar_evento(eventos.editar(antes, despues))
+
+def deshacer(rehacer: bool = False):
+    al_dia()
+    historial = st.session_state.historial
+    evento = historial.siguiente_rehacer() if rehacer else historial.siguiente_deshacer()
+    if evento is not None:
+        eventos.aplicar_a_diario(st.session_state.diario, evento)
+        registrar_evento(evento)
+
+# Cambio de día: lo anterior queda archivado en la base con su fecha
+al_dia()
+st.session_state.pop("dia_cambiado", None)  # este rerun ya es completo
 
 # =========================
 # Helpers
 # =========================
-OBJETIVOS = [
-    "Perder peso",
-    "Tonificar",
-    "Aumentar masa muscular",
-    "Mejorar rendimiento físico",
-    "Mejorar salud",
-]
-
-def es_objetivo_alto(obj: str) -> bool:
-    normal = obj.strip().lower()
-    return normal in {"aumentar masa muscular", "mejorar rendimiento físico", "mejorar rendimiento fisico"}
-
-def calcular_requerimientos(peso_kg: float, altura_cm: float, edad: int, genero: str, objetivo: str):
-    # Proteína
-    if genero == "Hombre":
-        prot = peso_kg * (2.0 if es_objetivo_alto(objetivo) else 1.6)
-    else:
-        prot = peso_kg * (1.8 if es_objetivo_alto(objetivo) else 1.4)
-
-    # Calorías (Mifflin-St Jeor) +/- 250 con piso 1200 cuando aplica
-    if genero == "Hombre":
-        bmr = (10 * peso_kg) + (6.25 * altura_cm) - (5 * edad) + 5
-    else:
-        bmr = (10 * peso_kg) + (6.25 * altura_cm) - (5 * edad) - 161
-
-    if es_objetivo_alto(objetivo):
-        kcal = bmr + 250
-    else:
-        kcal = bmr - 250
-        if kcal < 1200:
-            kcal = 1200
-
-    agua_ml = (peso_kg / 7.0) * 250.0
-    return round(kcal, 0), round(prot, 1), round(agua_ml, 0)
-
-def totales_diarios():
-    kcal = sum(x["kcal"] for x in st.session_state.diario)
-    prot = sum(x["proteina_g"] for x in st.session_state.diario)
-    agua = sum(x["hidr_ml"] for x in st.session_state.diario)
-    return kcal, prot, agua
-
-def etiqueta_color(valor: float, objetivo: float, regla: str) -> str:
-    if objetivo <= 0:
-        return "⚪"
-    if regla == "menor_mejor":
-        return "🟢" if valor <= objetivo else "🔴"
-    else:
-        return "🟢" if valor >= objetivo else "🔴"
-
-# Color para pintar números (verde si cumple, rojo si no)
-def color_hex(valor: float, objetivo: float, regla: str) -> str:
-    if objetivo <= 0:
-        return "#ffffff"
-    if regla == "menor_mejor":
-        return "#2ecc71" if valor <= objetivo else "#e74c3c"
-    else:
-        return "#2ecc71" if valor >= objetivo else "#e74c3c"
+def totales_diarios() -> Dict[str, float]:
+    """Total del día por nutriente (clave del registro -> valor)."""
+    tot = st.session_state.diario.totales
+    if DEBUG:
+        # Comprobación: los acumulados deben coincidir con una suma completa
+        esperado = st.session_state.diario.recalcular_totales()
+        assert all(abs(tot[k] - esperado[k]) < 1e-6 or math.isnan(tot[k]) and math.isnan(esperado[k])
+                   for k in tot), (tot, esperado)
+    return tot
+
+def totales_sin_objetivo(totales: Dict[str, float]) -> str:
+    # Nutrientes sin requerimiento diario: solo el acumulado ("—" si algún alimento no trae el dato).
+    # Los que no trae ningún alimento del catálogo no se muestran ("" si no queda ninguno).
+    visibles = [n for n in SIN_OBJETIVO if n in cat.nutrientes]
+    texto = " · ".join(f"{n.nombre}: **{n.formatear(totales[n.clave])}**" for n in visibles)
+    if any(math.isnan(totales[n.clave]) for n in visibles):
+        texto += " · — = algún alimento del día no trae el dato en el catálogo"
+    return texto
+
+def resumen_nutrientes(valores: Dict[str, float]) -> str:
+    # Una línea con los nutrientes que trae el catálogo ("—" si falta el dato)
+    return " · ".join(f"{n.nombre}: {n.formatear(valores[n.clave])}" for n in cat.nutrientes)
+
+def columnas_ocultas() -> Dict[str, None]:
+    # column_config que oculta los nutrientes que no trae ningún alimento del catálogo
+    # (el modo coach lo usa antes de que la página cargue ``cat``)
+    visibles = catalogo.nutrientes_visibles()
+    return {n.clave: None for n in NUTRIENTES if n not in visibles}
+
+def agregar_filas(filas: List[tuple]):
+    """Agrega varias filas (nombre, porciones, item, hidr_ml_override) con una sola escritura."""
+    al_dia()
+    diario = st.session_state.diario
+    registros = []
+    for nombre, porciones, item, hidr_ml_override in filas:
+        diario.agregar_fila(nombre, porciones, item, hidr_ml_override)
+        registros.append(diario.registro(len(diario) - 1))
+    usados = [item["id"] for _, _, item, _ in reversed(filas) if item]
+    recientes = st.session_state.recientes
+    for item_id in reversed(usados):
+        recientes.usar(item_id)
+    ops = [almacen.op_recientes(usuario, usados, time.time_ns() // 1000)] if usados else []
+    registrar_evento(eventos.agregar(registros), ops)
 
 def agregar_fila(nombre: str, porciones: float, item: Dict|None, hidr_ml_override: float | None = None):
-    ahora = datetime.now().strftime(HORA_FMT)
-    kcal = (item["kcal"] * porciones) if item else 0.0
-    prot = (item["proteina_g"] * porciones) if item else 0.0
-    hidr = (item["hidr_ml"] * porciones) if item else 0.0
-    if hidr_ml_override is not None:
-        hidr = float(hidr_ml_override)
-    st.session_state.diario.append({
-        "hora": ahora,
-        "nombre": nombre,
-        "porciones": porciones,
-        "porcion_desc": (item["porcion_desc"] if item else f"{int(hidr)} ml"),
-        "kcal": round(kcal, 1),
-        "proteina_g": round(prot, 1),
-        "hidr_ml": round(hidr, 0),
-    })
+    agregar_filas([(nombre, porciones, item, hidr_ml_override)])
 
 def construir_df_diario() -> pd.DataFrame:
-    if not st.session_state.diario:
-        return pd.DataFrame(columns=["hora","nombre","porciones","porcion_desc","kcal","proteina_g","hidr_ml"])
-    return pd.DataFrame(st.session_state.diario)
+    return st.session_state.diario.a_dataframe()
+
+def formulario_importar(destino: str, clave: str):
+    """Sube exports anteriores (xlsx / zip) y los carga al historial de ``destino``."""
+    resultado = st.session_state.pop(f"resultado_import_{clave}", None)
+    if resultado is not None:
+        st.success(f"{len(resultado.fechas)} días importados ({resultado.filas} filas) de {resultado.archivos} archivos.")
+        if resultado.sin_catalogo:
+            st.info(f"{resultado.sin_catalogo} filas con alimentos que ya no están en el catálogo: "
+                    "se guardaron con los valores del archivo.")
+        if resultado.omitidos:
+            st.warning(f"{len(resultado.omitidos)} días ya tenían registros y no se tocaron.")
+        if resultado.errores:
+            st.error("No se importaron:\n\n" + "\n\n".join(resultado.errores[:20]))
+
+    with st.form(f"importar_{clave}", clear_on_submit=True):
+        subidos = st.file_uploader("Exports del diario (.xlsx o .zip)", type=["xlsx", "zip"],
+                                   accept_multiple_files=True, key=f"archivos_{clave}")
+        reemplazar = st.checkbox("Reemplazar los días que ya tienen registros", key=f"reemplazar_{clave}")
+        enviar = st.form_submit_button("📤 Importar")
+    if not (enviar and subidos):
+        return
+    from foodtrappcker import importar  # lectores de xlsx/zip y pool de procesos: solo al importar
+
+    with st.spinner(f"Importando {len(subidos)} archivos..."):
+        resultado = importar.importar(destino, [(f.name, f.getvalue()) for f in subidos], repo,
+                                      reemplazar=reemplazar)
+    st.session_state[f"resultado_import_{clave}"] = resultado
+    if destino == usuario and st.session_state.fecha.isoformat() in resultado.fechas:
+        cargar_dia(st.session_state.fecha)  # el día abierto cambió en la base
+    st.rerun()
 
 # =========================
 # UI - Título
 # =========================
-st.markdown(
-    """
-    <h1 style='text-align: center; color: white; font-weight: 800; margin-top: 10px; margin-bottom: 25px;'>
-        📒 Diario de Comidas
-    </h1>
-    """,
-    unsafe_allow_html=True
-)
+st.markdown(activos.TITULO_HTML, unsafe_allow_html=True)
+
+# =========================
+# Modo coach: tablero con todos los clientes
+# =========================
+@st.cache_resource
+def obtener_tablero() -> coach.TableroCoach:
+    # Caché por cliente compartida entre sesiones del proceso
+    from foodtrappcker import coach
+
+    return coach.TableroCoach(obtener_repositorio())
+
+def actividad_cliente(clientes: List[tuple]):
+    """Auditoría: últimos cambios del diario de un cliente y cómo quedó el día tras cada uno."""
+    alias_por_id = dict(clientes)
+    cliente = st.selectbox("Cliente", list(alias_por_id), format_func=lambda c: alias_por_id[c] or c,
+                           key="cliente_actividad")
+    actividad = repo.leer_actividad(cliente, limite=200)
+    if not actividad:
+        st.info("Este cliente todavía no tiene cambios registrados.")
+        return
+    import pandas as pd
+
+    st.dataframe(
+        pd.DataFrame({
+            "Cuándo": [time.strftime("%Y-%m-%d %H:%M", time.localtime(ev["instante"])) for ev in actividad],
+            "Día": [ev["fecha"] for ev in actividad],
+            "#": [ev["seq"] for ev in actividad],
+            "Cambio": [eventos.describir(ev) for ev in actividad],
+            "Origen": [ev["origen"].capitalize() for ev in actividad],
+        }),
+        use_container_width=True, hide_index=True,
+    )
+    i = st.selectbox("Ver el día como quedó tras el cambio", range(len(actividad)),
+                     format_func=lambda i: f"{actividad[i]['fecha']} #{actividad[i]['seq']} · {eventos.describir(actividad[i])}",
+                     key="evento_actividad")
+    ev = actividad[i]
+    df = Diario.desde_registros(repo.leer_estado(cliente, date.fromisoformat(ev["fecha"]), ev["seq"])).a_dataframe()
+    st.dataframe(df, use_container_width=True, hide_index=True, column_config=columnas_ocultas())
+
+def vista_coach():
+    from foodtrappcker import coach  # solo en modo coach
+
+    with st.expander("Clientes", expanded=False):
+        st.caption(f"Cada cliente usa su propio enlace (?u=…). Tu id de coach es **{usuario}**.")
+        with st.form("form_cliente", clear_on_submit=True):
+            cc1, cc2, cc3 = st.columns([2,2,1])
+            with cc1:
+                id_cliente = st.text_input("Id del cliente (?u=)")
+            with cc2:
+                alias = st.text_input("Nombre")
+            with cc3:
+                st.write(" ")
+                agregar = st.form_submit_button("➕ Agregar", use_container_width=True)
+            if agregar and id_cliente.strip():
+                repo.aplicar([almacen.op_cliente(usuario, id_cliente.strip(), alias.strip())])
+        clientes = repo.leer_clientes(usuario)
+        for cid, nombre in clientes:
+            cl1, cl2 = st.columns([6,1])
+            with cl1:
+                st.write(f"{nombre or cid} · `{cid}`")
+            with cl2:
+                if st.button("✖", key=f"quitar_cliente_{cid}", use_container_width=True):
+                    repo.aplicar([almacen.op_cliente(usuario, cid, nombre, activo=False)])
+                    st.rerun()
+
+    if not clientes:
+        st.info("Agrega clientes para ver su cumplimiento.")
+        return
+
+    with st.expander("📤 Importar exports de un cliente"):
+        alias_por_id = dict(clientes)
+        cliente = st.selectbox("Cliente", list(alias_por_id), format_func=lambda c: alias_por_id[c] or c,
+                               key="cliente_import")
+        formulario_importar(cliente, "coach")
+
+    with st.expander("🕒 Actividad de un cliente"):
+        actividad_cliente(clientes)
+
+    orden = st.radio("Ordenar por", ["Semana", "Hoy"], horizontal=True, key="orden_coach")
+    filas = obtener_tablero().tablero(clientes, orden="desvio_semana" if orden == "Semana" else "desvio_hoy")
+    import pandas as pd
+
+    tabla = pd.DataFrame(filas).set_index("cliente")
+    tabla["desvio_hoy"] *= 100
+    tabla["desvio_semana"] *= 100
+    st.dataframe(
+        tabla.drop(columns="usuario"),
+        use_container_width=True,
+        column_config={
+            **{k: st.column_config.NumberColumn(f"{n.nombre} {sufijo} ({n.unidad})", format=f"%.{n.decimales_total}f")
+               for n in CON_OBJETIVO for k, sufijo in ((f"{n.clave}_hoy", "hoy"), (n.objetivo, "obj."))},
+            "desvio_hoy": st.column_config.NumberColumn("Desvío hoy", format="%.0f%%"),
+            "dias_registrados": st.column_config.NumberColumn(f"Días registrados ({coach.DIAS_SEMANA})"),
+            "dias_en_objetivo": st.column_config.NumberColumn("Días en objetivo"),
+            "desvio_semana": st.column_config.NumberColumn("Desvío semana", format="%.0f%%"),
+        },
+    )
+    st.caption("Desvío: cuánto falta (o sobra en calorías) para cumplir cada objetivo, en promedio.")
+
+    hasta = date.today()
+    desde = hasta - timedelta(days=coach.DIAS_SEMANA - 1)
+    engine = exportar.detectar_engine()
+    st.download_button(
+        "📥 Exportar la semana de todos los clientes",
+        data=lambda: exportar.exportar_rango(repo, clientes, desde, hasta, engine).data,
+        file_name=exportar.nombre_archivo_rango(desde, hasta, engine),
+        mime=exportar.mime_archivo(engine),
+        on_click="ignore",
+    )
+
+if st.sidebar.toggle("🧑‍🏫 Modo coach", key="modo_coach"):
+    vista_coach()
+    st.stop()
 
 # =========================
 # 1) Perfil y requerimientos
@@ -1535,21 +373,17 @@ with st.expander("1) Datos de la persona y requerimientos", expanded=True):
         with col3:
             edad = st.number_input("Edad (años)", min_value=10, max_value=100, step=1, value=30)
         with col4:
-            genero = st.selectbox("Género", ["Hombre", "Mujer"])
+            genero = st.selectbox("Género", GENEROS)
         with col5:
             objetivo = st.selectbox("Objetivo", OBJETIVOS)
 
         submit = st.form_submit_button("Calcular requerimientos")
         if submit:
-            kcal_obj, prot_obj, agua_obj = calcular_requerimientos(peso, altura, edad, genero, objetivo)
             st.session_state.perfil = {
                 "peso_kg": peso, "altura_cm": altura, "edad": edad, "genero": genero, "objetivo": objetivo
             }
-            st.session_state.requerimientos = {
-                "kcal_obj": float(kcal_obj),
-                "prot_obj": float(prot_obj),
-                "agua_obj": float(agua_obj),
-            }
+            st.session_state.requerimientos = requerimientos_perfil(st.session_state.perfil)
+            repo.guardar_perfil(usuario, st.session_state.fecha, st.session_state.perfil, st.session_state.requerimientos)
 
     if st.session_state.perfil:
         c1, c2, c3, c4, c5 = st.columns(5)
@@ -1563,242 +397,422 @@ with st.expander("1) Datos de la persona y requerimientos", expanded=True):
             st.write(" ")
         with c5:
             if st.button("🔄 Reiniciar día", use_container_width=True, type="secondary"):
-                st.session_state.diario = []
-                st.session_state.fecha = date.today()
+                vaciar_diario()
+
+# Roster de un coach: CSV con varias personas -> objetivos de cada una
+@st.fragment
+def requerimientos_grupo():
+    with st.expander("👥 Requerimientos de un grupo (CSV)"):
+        st.caption("Columnas: peso, altura, edad, genero (Hombre/Mujer) y objetivo. "
+                   "Las demás columnas (id, nombre…) se conservan.")
+        archivo = st.file_uploader("Roster CSV", type=["csv"], key="roster_csv")
+        if archivo is None:
+            return
+        from foodtrappcker import roster
+
+        try:
+            df_roster = roster.requerimientos_roster(roster.leer_roster(archivo))
+        except ValueError as e:
+            st.error(str(e))
+            return
+        st.dataframe(df_roster, use_container_width=True, hide_index=True)
+        st.download_button(
+            "📥 Descargar objetivos (CSV)",
+            data=df_roster.to_csv(index=False).encode("utf-8"),
+            file_name="requerimientos_grupo.csv",
+            mime="text/csv",
+            on_click="ignore",
+        )
+
+requerimientos_grupo()
 
 # =========================
 # 2) Barras de progreso (número acumulado coloreado)
 # =========================
-if st.session_state.perfil:
-    kcal_tot, prot_tot, agua_tot = totales_diarios()
-    kcal_obj = st.session_state.requerimientos["kcal_obj"]
-    prot_obj = st.session_state.requerimientos["prot_obj"]
-    agua_obj = st.session_state.requerimientos["agua_obj"]
-
-    st.subheader("Progreso del día")
-    pc1, pc2, pc3 = st.columns(3)
-
-    with pc1:
-        ratio = min(1.0, (kcal_tot / kcal_obj) if kcal_obj > 0 else 0.0)
-        st.progress(ratio, text=f"Calorías: {kcal_tot:.0f}/{kcal_obj:.0f} kcal ({ratio*100:.0f}%)")
-        col = color_hex(kcal_tot, kcal_obj, "menor_mejor")
-        st.markdown(
-            f"**Acumulado:** <span style='color:{col};font-weight:700'>{kcal_tot:.0f}</span> kcal",
-            unsafe_allow_html=True
-        )
-
-    with pc2:
-        ratio = min(1.0, (prot_tot / prot_obj) if prot_obj > 0 else 0.0)
-        st.progress(ratio, text=f"Proteína: {prot_tot:.1f}/{prot_obj:.1f} g ({ratio*100:.0f}%)")
-        col = color_hex(prot_tot, prot_obj, "mayor_mejor")
-        st.markdown(
-            f"**Acumulado:** <span style='color:{col};font-weight:700'>{prot_tot:.1f}</span> g",
-            unsafe_allow_html=True
-        )
+def progreso():
+    if st.session_state.perfil:
+        totales = totales_diarios()
+        requerimientos = st.session_state.requerimientos
+
+        st.subheader("Progreso del día")
+        # Una barra por nutriente con objetivo, en el orden del registro
+        for col_st, n in zip(st.columns(len(CON_OBJETIVO)), CON_OBJETIVO):
+            total, obj, d = totales[n.clave], requerimientos[n.objetivo], n.decimales_total
+            with col_st:
+                ratio = min(1.0, (total / obj) if obj > 0 else 0.0)
+                st.progress(ratio, text=f"{n.nombre}: {total:.{d}f}/{obj:.{d}f} {n.unidad} ({ratio*100:.0f}%)")
+                col = color_hex(total, obj, n.regla)
+                st.markdown(
+                    f"**Acumulado:** <span style='color:{col};font-weight:700'>{total:.{d}f}</span> {n.unidad}",
+                    unsafe_allow_html=True
+                )
+        if texto := totales_sin_objetivo(totales):
+            st.caption(texto)
 
-    with pc3:
-        ratio = min(1.0, (agua_tot / agua_obj) if agua_obj > 0 else 0.0)
-        st.progress(ratio, text=f"Hidratación: {agua_tot:.0f}/{agua_obj:.0f} ml ({ratio*100:.0f}%)")
-        col = color_hex(agua_tot, agua_obj, "mayor_mejor")
-        st.markdown(
-            f"**Acumulado:** <span style='color:{col};font-weight:700'>{agua_tot:.0f}</span> ml",
-            unsafe_allow_html=True
-        )
 
 # =========================
 # 3) Registro de comidas (solo select + porciones)
 # =========================
-st.subheader("Registro de comidas")
-
-def etiqueta_item(it: Dict) -> str:
-    return f"{it['nombre']} — {it['porcion_desc']} · {it['kcal']} kcal · {it['proteina_g']} g prot"
-
-lista_items = BASE_INTERNA[:]
-labels = [etiqueta_item(it) for it in lista_items]
-
-with st.form("form_comida", clear_on_submit=True):
-    col_a, col_b, col_c = st.columns([3,1,1])
-    with col_a:
-        sel_label = st.selectbox("Elige un alimento/bebida", labels)
-        idx = labels.index(sel_label)
-        item = lista_items[idx]
-        st.caption(f"Porción base: **{item['porcion_desc']}**")
-    with col_b:
-        porciones = st.number_input("Cant. porciones", min_value=0.25, max_value=20.0, step=0.25, value=1.0)
-    with col_c:
-        st.write(" ")
-        add_food = st.form_submit_button("➕ Agregar", use_container_width=True)
-
-    if add_food and item:
-        agregar_fila(nombre=item["nombre"], porciones=porciones, item=item)
-        st.rerun()  # <-- fuerza actualización inmediata
+cat = catalogo.cargar_catalogo()  # compartido entre sesiones, etiquetas ya precalculadas
+indice = busqueda.indice_busqueda(cat)  # se construye una vez por carga de catálogo
+
+if "canasta" not in st.session_state:
+    st.session_state.canasta = []  # [(item_id, porciones)] aún sin registrar
+
+# Fragmento: buscar, elegir y armar la canasta solo re-ejecuta esta parte de la página.
+# Registrar (una fila o la canasta completa) hace un único rerun de toda la app.
+@st.fragment
+def registro_comidas():
+    refrescar_si_cambio_el_dia()
+    # Fuera del form para que cada búsqueda actualice las opciones; solo se envían los top-k
+    consulta = st.text_input("🔎 Buscar alimento", placeholder="Ej.: salmon, pollo, avena…", key="busqueda_alimento")
+    opciones = indice.buscar(consulta, k=MAX_OPCIONES)
+    if consulta and not opciones:
+        st.caption("Sin coincidencias en el catálogo.")
+    if not consulta.strip():
+        # Sin búsqueda: primero favoritos y recientes, luego el catálogo
+        primero = sorted(st.session_state.favoritos) + st.session_state.recientes.lista()
+        primero = [i for i in dict.fromkeys(primero) if i in cat]
+        vistos = set(primero)
+        opciones = (primero + [i for i in opciones if i not in vistos])[:MAX_OPCIONES]
+
+    with st.form("form_comida", clear_on_submit=True):
+        col_a, col_b, col_c = st.columns([3,1,1])
+        with col_a:
+            item_id = st.selectbox("Elige un alimento/bebida", opciones, format_func=cat.etiqueta)
+            item = cat.item(item_id) if item_id is not None else None
+            if item:
+                st.caption(f"Porción base: **{item['porcion_desc']}**")
+        with col_b:
+            porciones = st.number_input("Cant. porciones", min_value=0.25, max_value=20.0, step=0.25, value=1.0)
+        with col_c:
+            st.write(" ")
+            add_food = st.form_submit_button("➕ Agregar", use_container_width=True)
+            a_canasta = st.form_submit_button("🧺 A la canasta", use_container_width=True)
+            favorito = st.form_submit_button("⭐ Favorito", use_container_width=True,
+                                             help="Marca o desmarca el alimento elegido como favorito.")
+
+        if add_food and item:
+            agregar_fila(nombre=item["nombre"], porciones=porciones, item=item)
+            st.rerun()  # <-- fuerza actualización inmediata
+        if a_canasta and item:
+            st.session_state.canasta.append((item["id"], porciones))
+        if favorito and item:
+            favoritos = st.session_state.favoritos
+            activo = item["id"] not in favoritos
+            (favoritos.add if activo else favoritos.discard)(item["id"])
+            repo.aplicar([almacen.op_favorito(usuario, item["id"], activo)])
+            st.toast(("⭐ Agregado a favoritos: " if activo else "Quitado de favoritos: ") + item["nombre"])
+
+    canasta = st.session_state.canasta
+    if canasta:
+        st.markdown("**🧺 Canasta**")
+        for i, (cid, porc) in enumerate(canasta):
+            it = cat.item(cid)
+            val = dict(zip(CLAVES, valores_fila(porc, it)))
+            cc1, cc2 = st.columns([6,1])
+            with cc1:
+                st.write(f"{porc:g} × {it['nombre']} — {it['porcion_desc']} · {resumen_nutrientes(val)}")
+            with cc2:
+                if st.button("✖", key=f"quitar_canasta_{i}", use_container_width=True):
+                    canasta.pop(i)
+                    st.rerun(scope="fragment")
+        # Porciones por alimento × matriz de nutrientes del catálogo
+        tot_c = dict(zip(CLAVES, cat.totales(canasta).tolist()))
+        st.caption(f"Total de la canasta: **{resumen_nutrientes(tot_c)}**")
+
+        cb1, cb2, _ = st.columns([1,1,2])
+        with cb1:
+            if st.button(f"✅ Registrar comida ({len(canasta)})", use_container_width=True, type="primary"):
+                agregar_filas([(cat.item(c)["nombre"], p, cat.item(c), None) for c, p in canasta])
+                st.session_state.canasta = []
+                st.rerun()
+        with cb2:
+            if st.button("Vaciar canasta", use_container_width=True, type="secondary"):
+                st.session_state.canasta = []
+                st.rerun(scope="fragment")
+
+        with st.form("form_guardar_plantilla", clear_on_submit=True):
+            cp1, cp2 = st.columns([3,1])
+            with cp1:
+                nombre_plantilla = st.text_input("Nombre de la plantilla", placeholder="Ej.: Desayuno habitual")
+            with cp2:
+                st.write(" ")
+                guardar = st.form_submit_button("💾 Guardar como plantilla", use_container_width=True)
+            if guardar and nombre_plantilla.strip():
+                # Los totales se calculan una vez al guardar, no cada vez que se muestra la lista
+                plantilla = nueva_plantilla(cat, nuevo_id(), nombre_plantilla, canasta)
+                repo.aplicar([almacen.op_plantilla(usuario, plantilla)])
+                st.session_state.plantillas = sorted(
+                    st.session_state.plantillas + [plantilla], key=lambda p: (p.nombre, p.id)
+                )
+
+    plantillas = st.session_state.plantillas
+    if plantillas:
+        with st.expander(f"📋 Plantillas ({len(plantillas)})"):
+            for p in plantillas:
+                cq1, cq2, cq3 = st.columns([5,1,1])
+                with cq1:
+                    st.write(f"**{p.nombre}** · {len(p.items)} alimentos · {resumen_nutrientes(p.por_clave())}")
+                with cq2:
+                    if st.button("Usar", key=f"usar_plantilla_{p.id}", use_container_width=True):
+                        # Alimentos que ya no están en el catálogo se omiten
+                        agregar_filas([(cat.item(c)["nombre"], porc, cat.item(c), None)
+                                       for c, porc in p.items if c in cat])
+                        st.rerun()
+                with cq3:
+                    if st.button("🗑️", key=f"borrar_plantilla_{p.id}", use_container_width=True):
+                        repo.aplicar([almacen.op_borrar_plantilla(usuario, p.id)])
+                        st.session_state.plantillas = [x for x in plantillas if x.id != p.id]
+                        st.rerun(scope="fragment")
+
 
 # Registro rápido de agua
-with st.form("form_agua", clear_on_submit=True):
-    colx, coly = st.columns([2,1])
-    with colx:
-        agua_ml_in = st.number_input("Registrar agua (ml)", min_value=0, max_value=5000, step=50, value=0)
-    with coly:
-        st.write(" ")
-        add_agua = st.form_submit_button("💧 Agregar agua", use_container_width=True)
-    if add_agua and agua_ml_in > 0:
-        agregar_fila(nombre="Agua (ml)", porciones=1.0, item=None, hidr_ml_override=agua_ml_in)
-        st.rerun()  # <-- fuerza actualización inmediata
+def _agregar_agua():
+    # Callback: corre antes de re-ejecutar el panel, así las barras ya salen actualizadas
+    agua_ml_in = st.session_state.agua_ml
+    if agua_ml_in > 0:
+        agregar_fila(nombre=NOMBRE_AGUA, porciones=1.0, item=None, hidr_ml_override=agua_ml_in)
+
+def registro_agua():
+    with st.form("form_agua", clear_on_submit=True):
+        colx, coly = st.columns([2,1])
+        with colx:
+            st.number_input("Registrar agua (ml)", min_value=0, max_value=5000, step=50, value=0, key="agua_ml")
+        with coly:
+            st.write(" ")
+            st.form_submit_button("💧 Agregar agua", use_container_width=True, on_click=_agregar_agua)
+
 
 # =========================
 # 4) Tabla del día y acciones (selección de filas)
 # =========================
-df = construir_df_diario()
-
-sel_rows = []
-if not df.empty:
-    # ---- NUEVO: agregar ratio kcal/g proteína (None si prot <= 0) ----
-    df = df.copy()
-    df["kcal_por_g_prot"] = df.apply(
-        lambda r: round(r["kcal"] / r["proteina_g"], 2) if r["proteina_g"] and r["proteina_g"] > 0 else None,
-        axis=1
-    )
-    # ------------------------------------------------------------------
-
-    df_display = df.copy()
-    df_display.insert(0, "Seleccionar", False)
-
-    edited = st.data_editor(
-        df_display,
-        use_container_width=True,
-        hide_index=True,
-        disabled={
-            "hora": True,
-            "nombre": True,
-            "porciones": True,
-            "porcion_desc": True,
-            "kcal": True,
-            "proteina_g": True,
-            "hidr_ml": True,
-            "kcal_por_g_prot": True,  # <- NUEVO: columna calculada bloqueada
-        },
-        key="editor_diario"
-    )
-    sel_rows = edited.index[edited["Seleccionar"] == True].tolist()
-else:
-    st.dataframe(df, use_container_width=True, hide_index=True)
-
-col_btn1, col_btn2, _ = st.columns([1,1,2])
-with col_btn1:
-    if st.button("🗑️ Eliminar fila seleccionada", use_container_width=True, type="secondary", disabled=(len(sel_rows)==0)):
-        for i in sorted(sel_rows, reverse=True):
-            if 0 <= i < len(st.session_state.diario):
-                st.session_state.diario.pop(i)
-        st.rerun()
+# Fragmento: marcar filas solo re-ejecuta la tabla.
+@st.fragment
+def tabla_diario():
+    refrescar_si_cambio_el_dia()
+    diario = st.session_state.diario
+
+    sel_ids = []
+    if len(diario):
+        # Tabla con "Seleccionar" y ratio kcal/g proteína: se calcula una vez por versión del diario.
+        # El índice (oculto) es el id de cada entrada; la clave cambia con la versión para que
+        # ediciones pendientes de una versión anterior no caigan sobre otra fila.
+        tabla = diario.vista_tabla()
+        edited = st.data_editor(
+            tabla,
+            use_container_width=True,
+            hide_index=True,
+            disabled=["hora", "nombre", "porcion_desc", *CLAVES, "kcal_por_g_prot"],
+            column_config={
+                "porciones": st.column_config.NumberColumn("porciones", min_value=0.25, max_value=20.0, step=0.25),
+                **columnas_ocultas(),
+            },
+            key=f"editor_diario_{diario.version}"
+        )
+        sel_ids = edited.index[edited["Seleccionar"]].tolist()
+        cambiadas = edited["porciones"].ne(tabla["porciones"]) & edited["porciones"].notna()
+        if cambiadas.any():
+            editar_porciones(edited.loc[cambiadas, "porciones"].to_dict())
+            st.rerun()
+    else:
+        st.dataframe(construir_df_diario(), use_container_width=True, hide_index=True,
+                     column_config=columnas_ocultas())
+
+    historial = st.session_state.historial
+    col_btn1, col_btn2, col_btn3, col_btn4 = st.columns([1,1,1,1])
+    with col_btn1:
+        if st.button("🗑️ Eliminar fila seleccionada", use_container_width=True, type="secondary", disabled=(len(sel_ids)==0)):
+            eliminar_filas(sel_ids)
+            st.rerun()
+
+    with col_btn2:
+        if st.button("🗑️ Vaciar diario", use_container_width=True, type="secondary", disabled=not len(diario)):
+            vaciar_diario()
+            st.rerun()
+
+    with col_btn3:
+        cambio = historial.descripcion()
+        if st.button("↩️ Deshacer", use_container_width=True, type="secondary", disabled=cambio is None, help=cambio):
+            deshacer()
+            st.rerun()
+
+    with col_btn4:
+        cambio = historial.descripcion(rehacer=True)
+        if st.button("↪️ Rehacer", use_container_width=True, type="secondary", disabled=cambio is None, help=cambio):
+            deshacer(rehacer=True)
+            st.rerun()
 
-with col_btn2:
-    if st.button("🗑️ Vaciar diario", use_container_width=True, type="secondary", disabled=df.empty):
-        st.session_state.diario = []
-        st.rerun()
 
 # =========================
 # 5) Resumen + Exportar (número acumulado coloreado)
 # =========================
-if st.session_state.perfil:
-    kcal_tot, prot_tot, agua_tot = totales_diarios()
-    kcal_obj = st.session_state.requerimientos["kcal_obj"]
-    prot_obj = st.session_state.requerimientos["prot_obj"]
-    agua_obj = st.session_state.requerimientos["agua_obj"]
-
-    st.markdown("---")
-    c1, c2, c3 = st.columns(3)
-    with c1:
-        col = color_hex(kcal_tot, kcal_obj, "menor_mejor")
-        st.markdown(
-            f"### Calorías\n<span style='font-weight:700;color:{col}'>{kcal_tot:.0f}</span> / {kcal_obj:.0f} kcal",
-            unsafe_allow_html=True
-        )
-    with c2:
-        col = color_hex(prot_tot, prot_obj, "mayor_mejor")
-        st.markdown(
-            f"### Proteína\n<span style='font-weight:700;color:{col}'>{prot_tot:.1f}</span> / {prot_obj:.1f} g",
-            unsafe_allow_html=True
-        )
-    with c3:
-        col = color_hex(agua_tot, agua_obj, "mayor_mejor")
-        st.markdown(
-            f"### Hidratación\n<span style='font-weight:700;color:{col}'>{agua_tot:.0f}</span> / {agua_obj:.0f} ml",
-            unsafe_allow_html=True
+def resumen_export():
+    if st.session_state.perfil:
+        from foodtrappcker import columnar  # export Parquet (pyarrow se importa al generarlo)
+
+        totales = totales_diarios()
+        requerimientos = st.session_state.requerimientos
+
+        st.markdown("---")
+        for col_st, n in zip(st.columns(len(CON_OBJETIVO)), CON_OBJETIVO):
+            total, obj, d = totales[n.clave], requerimientos[n.objetivo], n.decimales_total
+            with col_st:
+                col = color_hex(total, obj, n.regla)
+                st.markdown(
+                    f"### {n.nombre}\n<span style='font-weight:700;color:{col}'>{total:.{d}f}</span> / {obj:.{d}f} {n.unidad}",
+                    unsafe_allow_html=True
+                )
+        if texto := totales_sin_objetivo(totales):
+            st.markdown(texto)
+
+        # Exportación diferida: el libro se construye solo al pulsar el botón y
+        # se reutiliza mientras no cambien el diario ni el perfil.
+        excel_engine = exportar.detectar_engine()
+        clave_export = (
+            usuario,
+            st.session_state.diario.version,
+            st.session_state.fecha,
+            tuple(st.session_state.perfil.items()),
+            tuple(st.session_state.requerimientos.items()),
         )
-
-    # Datos para exportar
-    df_export = construir_df_diario()
-    resumen = pd.DataFrame({
-        "Métrica": ["Calorías (kcal)", "Proteína (g)", "Hidratación (ml)"],
-        "Total del día": [round(kcal_tot,0), round(prot_tot,1), round(agua_tot,0)],
-        "Objetivo": [round(kcal_obj,0), round(prot_obj,1), round(agua_obj,0)],
-    })
-    perfil = pd.DataFrame([{
-        "Peso (kg)": st.session_state.perfil["peso_kg"],
-        "Altura (cm)": st.session_state.perfil["altura_cm"],
-        "Edad": st.session_state.perfil["edad"],
-        "Género": st.session_state.perfil["genero"],
-        "Objetivo": st.session_state.perfil["objetivo"],
-        "Fecha": st.session_state.fecha.strftime("%Y-%m-%d"),
-    }])
-
-    # Detectar engine disponible para Excel
-    excel_engine = None
-    try:
-        import xlsxwriter  # noqa: F401
-        excel_engine = "xlsxwriter"
-    except Exception:
-        try:
-            import openpyxl  # noqa: F401
-            excel_engine = "openpyxl"
-        except Exception:
-            excel_engine = None
-
-    if excel_engine:
-        buffer = io.BytesIO()
-        with pd.ExcelWriter(buffer, engine=excel_engine) as writer:
-            df_export.to_excel(writer, index=False, sheet_name="Diario")
-            resumen.to_excel(writer, index=False, sheet_name="Resumen")
-
-            ws = writer.sheets["Resumen"]
-            start_row = len(resumen) + 2
-
-            if excel_engine == "xlsxwriter":
-                for col_idx, col_name in enumerate(perfil.columns):
-                    ws.write(start_row, col_idx, col_name)
-                for row_idx in range(len(perfil)):
-                    for col_idx, col_name in enumerate(perfil.columns):
-                        ws.write(start_row + 1 + row_idx, col_idx, perfil.iloc[row_idx][col_name])
-            else:
-                from openpyxl.utils import get_column_letter  # noqa: F401
-                for j, col_name in enumerate(perfil.columns, start=1):
-                    ws.cell(row=start_row+1, column=j, value=col_name)
-                for r in range(len(perfil)):
-                    for j, col_name in enumerate(perfil.columns, start=1):
-                        ws.cell(row=start_row+2+r, column=j, value=perfil.iloc[r][col_name])
+        diario_snapshot = construir_df_diario()
+        totales_snapshot = dict(totales)
+        requerimientos_snapshot = dict(st.session_state.requerimientos)
+        perfil_snapshot = dict(st.session_state.perfil)
+        fecha_snapshot = st.session_state.fecha
+        export_cache = st.session_state.export_cache
+
+        # Se ejecuta en otro hilo al hacer clic: no debe leer st.session_state
+        def _construir_export() -> bytes:
+            def construir():
+                return exportar.construir_export(
+                    diario_snapshot, totales_snapshot, requerimientos_snapshot, perfil_snapshot, fecha_snapshot, excel_engine
+                )
+            return export_cache.obtener(clave_export, construir).data
+
+        if excel_engine:
+            label_export = "📥 Exportar Diario (Excel)"
+        else:
+            st.warning("No se encontró `xlsxwriter` ni `openpyxl`. Se exportará un ZIP con CSVs.")
+            label_export = "📥 Exportar Diario (ZIP con CSVs)"
 
         st.download_button(
-            label="📥 Exportar Diario (Excel)",
-            data=buffer.getvalue(),
-            file_name=f"diario_comidas_{st.session_state.fecha.isoformat()}.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            label=label_export,
+            data=_construir_export,
+            file_name=exportar.nombre_archivo(st.session_state.fecha, excel_engine),
+            mime=exportar.mime_archivo(excel_engine),
+            on_click="ignore",
             use_container_width=True
         )
+        if columnar.disponible():
+            st.download_button(
+                label="📥 Exportar Diario (Parquet, para análisis)",
+                data=lambda: columnar.construir_export(
+                    diario_snapshot, totales_snapshot, requerimientos_snapshot, perfil_snapshot, fecha_snapshot
+                ).data,
+                file_name=columnar.nombre_archivo(st.session_state.fecha, "parquet"),
+                mime=exportar.MIME_ZIP,
+                on_click="ignore",
+                use_container_width=True
+            )
     else:
-        # Fallback: ZIP con CSVs si no hay engines de Excel
-        import zipfile
-        zip_buffer = io.BytesIO()
-        with zipfile.ZipFile(zip_buffer, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
-            zf.writestr("Diario.csv", df_export.to_csv(index=False))
-            zf.writestr("Resumen.csv", resumen.to_csv(index=False))
-            zf.writestr("Perfil.csv", perfil.to_csv(index=False))
-        st.warning("No se encontró `xlsxwriter` ni `openpyxl`. Se exportará un ZIP con CSVs.")
+        st.info("Primero completa tus datos y calcula tus requerimientos para activar el seguimiento y la exportación.")
+
+
+# =========================
+# Panel del día: progreso, registro, tabla y resumen
+# =========================
+# Un fragmento con fragmentos anidados. Lo que no cambia el diario (buscar,
+# armar la canasta, marcar filas) re-ejecuta solo su fragmento. Agregar agua
+# re-ejecuta el panel; perfil, estilos e historial no se vuelven a enviar.
+# Streamlit no permite que un fragmento anidado pida re-ejecutar a su padre:
+# agregar comidas y borrar filas siguen haciendo un rerun completo.
+@st.fragment
+def panel_dia():
+    refrescar_si_cambio_el_dia()
+    progreso()
+    st.subheader("Registro de comidas")
+    registro_comidas()
+    registro_agua()
+    tabla_diario()
+    resumen_export()
+
+panel_dia()
+
+# =========================
+# 6) Historial (tendencias de varios días desde los rollups diarios)
+# =========================
+st.markdown("---")
+
+# Fragmento: abrir el historial o cambiar de periodo no re-ejecuta el día
+@st.fragment
+def historial_dias():
+    if not st.toggle("📈 Ver historial", key="ver_historial"):
+        return
+    from foodtrappcker import columnar, historial  # pandas + resample: solo si se abre el historial
+
+    periodo = st.radio("Periodo", list(historial.PERIODOS), horizontal=True, key="periodo_historial")
+    desde, hasta = historial.rango(historial.PERIODOS[periodo])
+    df_hist = historial.tabla_diaria(repo.leer_rollups(usuario, desde, hasta))
+
+    if df_hist.empty:
+        st.info("Todavía no hay días registrados en este periodo.")
+    else:
+        hc = st.columns(len(historial.METRICAS))
+        for col_st, (nombre, (total, obj, _)) in zip(hc, historial.METRICAS.items()):
+            with col_st:
+                st.markdown(f"**{nombre}**")
+                st.line_chart(df_hist[[total, obj]].rename(columns={total: "Total", obj: "Objetivo"}), height=220)
+
+        dc = st.columns(len(historial.METRICAS))
+        for col_st, (nombre, (en_obj, con_obj)) in zip(dc, historial.dias_en_objetivo(df_hist).items()):
+            with col_st:
+                st.metric(f"Días en objetivo · {nombre}", f"{en_obj} / {con_obj}")
+
+        if historial.PERIODOS[periodo] > 7:
+            freq = "W" if historial.PERIODOS[periodo] <= 90 else "MS"
+            st.caption("Promedio diario por " + ("semana" if freq == "W" else "mes"))
+            st.dataframe(historial.por_periodo(df_hist, freq), use_container_width=True,
+                         column_config=columnas_ocultas())
+
+        # Se genera al hacer clic, leyendo la base por lotes (no desde la sesión)
+        engine = exportar.detectar_engine()
         st.download_button(
-            label="📥 Exportar Diario (ZIP con CSVs)",
-            data=zip_buffer.getvalue(),
-            file_name=f"diario_comidas_{st.session_state.fecha.isoformat()}.zip",
-            mime="application/zip",
-            use_container_width=True
+            f"📥 Exportar {periodo}",
+            data=lambda: exportar.exportar_rango(repo, [(usuario, "")], desde, hasta, engine).data,
+            file_name=exportar.nombre_archivo_rango(desde, hasta, engine),
+            mime=exportar.mime_archivo(engine),
+            on_click="ignore",
         )
-else:
-    st.info("Primero completa tus datos y calcula tus requerimientos para activar el seguimiento y la exportación.")
+        if columnar.disponible():
+            st.download_button(
+                f"📦 Dataset Parquet ({periodo})",
+                data=lambda: columnar.exportar_dataset(repo, [(usuario, "")], desde, hasta).data,
+                file_name=columnar.nombre_archivo_rango(desde, hasta, "parquet"),
+                mime=exportar.MIME_ZIP,
+                on_click="ignore",
+            )
+
+    if columnar.disponible():
+        with st.expander("📂 Abrir un export Parquet / Feather"):
+            subido = st.file_uploader("ZIP exportado desde la app", type=["zip"], key="abrir_columnar")
+            if subido is not None:
+                try:
+                    tablas = columnar.leer_export(subido.getvalue())
+                except (ValueError, OSError) as e:
+                    st.error(str(e))
+                else:
+                    for nombre, tabla in tablas.items():
+                        st.markdown(f"**{nombre}** · {tabla.num_rows} filas")
+                        st.dataframe(columnar.a_pandas(tabla), use_container_width=True, hide_index=True)
+
+historial_dias()
+
+@st.fragment
+def importar_historial():
+    with st.expander("📤 Importar exports anteriores"):
+        st.caption("Archivos descargados desde esta app (Excel, ZIP con CSVs o Parquet/Feather).")
+        formulario_importar(usuario, "propio")
+
+importar_historial()
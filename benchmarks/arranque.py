@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""Presupuesto de arranque en frío (python -X importtime).
+
+Mide en procesos nuevos cuánto tardan los imports del núcleo y de la app, y
+opcionalmente el primer render completo de la interfaz. Sale con código 1 si
+algún escenario se pasa de su presupuesto.
+
+    python benchmarks/arranque.py
+    python benchmarks/arranque.py --render --repeticiones 5 --json arranque.json
+"""
+
+from __future__ import annotations
+from pathlib import Path
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = Path(__file__).resolve().parent.parent
+APP = RAIZ / "Foodtrappcker V5.py"
+
+
+def imports_app(ruta: Path = APP) -> tuple:
+    """Módulos que el script importa al cargar (imports de primer nivel), sin repetir.
+
+    Los imports dentro de funciones (perezosos) y los de TYPE_CHECKING no cuentan.
+    """
+    modulos = []
+    for nodo in ast.parse(ruta.read_text(encoding="utf-8")).body:
+        if isinstance(nodo, ast.Import):
+            modulos += [a.name for a in nodo.names]
+        elif isinstance(nodo, ast.ImportFrom) and nodo.level == 0 and nodo.module != "__future__":
+            # from foodtrappcker import almacen, ...: cada nombre es un módulo del paquete
+            if nodo.module == "foodtrappcker":
+                modulos += [f"foodtrappcker.{a.name}" for a in nodo.names]
+            else:
+                modulos.append(nodo.module)
+    return tuple(dict.fromkeys(modulos))
+
+
+# Se sacan del script para que sigan a la app cuando cambian sus imports
+APP_IMPORTS = imports_app()
+NUCLEO = tuple(m for m in APP_IMPORTS if m.startswith("foodtrappcker."))
+
+# Escenario -> (módulos, presupuesto en ms)
+ESCENARIOS = {
+    "nucleo": (NUCLEO, 250.0),
+    "app": (APP_IMPORTS, 900.0),
+}
+PRESUPUESTO_RENDER_MS = 3000.0
+# Módulos que no deberían cargarse al importar (se importan en el camino que los usa)
+PEREZOSOS = ("pandas", "pyarrow", "xlsxwriter", "openpyxl", "zipfile", "PIL")
+
+_RENDER = f"""
+import time
+t = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({str(APP)!r}, default_timeout=60)
+at.run()
+assert not at.exception, at.exception
+print((time.perf_counter() - t) * 1000)
+"""
+
+
+def _codigo(modulos) -> str:
+    return "; ".join(f"import {m}" for m in modulos) or "pass"
+
+
+def _importtime(modulos) -> tuple:
+    """(total ms, {dependencia: ms acumulados}) en un proceso nuevo.
+
+    El total suma los imports de primer nivel que no hace el intérprete al
+    arrancar (site, encodings...); el detalle baja un nivel para ver qué
+    arrastra cada módulo propio (numpy, sqlite3, ...).
+    """
+    res = subprocess.run([sys.executable, "-X", "importtime", "-c", _codigo(modulos)],
+                         cwd=RAIZ, capture_output=True, text=True, check=True)
+    filas = []
+    for linea in res.stderr.splitlines():
+        if not linea.startswith("import time:") or "cumulative" in linea:
+            continue
+        _, acumulado, nombre = linea[len("import time:"):].split("|")
+        nivel = (len(nombre) - len(nombre.lstrip()) - 1) // 2
+        filas.append((nivel, nombre.strip(), int(acumulado) / 1000))
+    # -X importtime lista cada módulo después de sus dependencias
+    total, detalle, padre = 0.0, {}, None
+    for nivel, nombre, ms in reversed(filas):
+        if nivel == 0:
+            padre = nombre if nombre.split(".")[0] in _raices(modulos) else None
+            if padre:
+                total += ms
+        elif nivel == 1 and padre:
+            raiz = nombre.split(".")[0]
+            detalle[raiz] = detalle.get(raiz, 0.0) + ms
+    return total, detalle
+
+
+def _raices(modulos) -> set:
+    return {m.split(".")[0] for m in modulos}
+
+
+def _cargados(modulos) -> set:
+    codigo = _codigo(modulos) + "; import sys; print(' '.join(sys.modules))"
+    res = subprocess.run([sys.executable, "-c", codigo], cwd=RAIZ, capture_output=True, text=True, check=True)
+    return set(res.stdout.split())
+
+
+def _render_ms(env) -> float:
+    res = subprocess.run([sys.executable, "-c", _RENDER], cwd=RAIZ, capture_output=True,
+                         text=True, check=True, env=env)
+    return float(res.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--repeticiones", type=int, default=3)
+    ap.add_argument("--render", action="store_true", help="medir también el primer render (AppTest)")
+    ap.add_argument("--top", type=int, default=8, help="módulos más lentos a listar por escenario")
+    ap.add_argument("--json", type=Path, help="guardar el resultado en este archivo")
+    args = ap.parse_args(argv)
+
+    informe = {"python": sys.version.split()[0], "escenarios": {}}
+    pasado = False
+    for nombre, (modulos, presupuesto) in ESCENARIOS.items():
+        tomas = sorted((_importtime(modulos) for _ in range(args.repeticiones)), key=lambda t: t[0])
+        total, detalle = tomas[len(tomas) // 2]  # mediana
+        # Lo que ya trae el intérprete al arrancar (p. ej. zipfile por site) no cuenta
+        nuevos = _cargados(modulos) - _cargados(())
+        perezosos = sorted(m for m in PEREZOSOS if m in nuevos)
+        ok = total <= presupuesto
+        pasado |= not ok
+        informe["escenarios"][nombre] = {
+            "ms": round(total, 1), "presupuesto_ms": presupuesto, "ok": ok,
+            "perezosos_cargados": perezosos,
+            "top": {m: round(ms, 1) for m, ms in sorted(detalle.items(), key=lambda x: -x[1])[:args.top]},
+        }
+        print(f"{nombre:8s} {total:8.1f} ms  (presupuesto {presupuesto:.0f} ms)  {'OK' if ok else 'EXCEDIDO'}")
+        for m, ms in informe["escenarios"][nombre]["top"].items():
+            print(f"    {m:28s} {ms:8.1f} ms")
+        if perezosos:
+            print(f"    ! cargados al importar: {', '.join(perezosos)}")
+
+    if args.render:
+        # Base temporal: no tocar el diario real
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, DIARIO_DB=str(Path(tmp) / "diario.sqlite3"))
+            total = statistics.median(_render_ms(env) for _ in range(args.repeticiones))
+        ok = total <= PRESUPUESTO_RENDER_MS
+        pasado |= not ok
+        informe["primer_render"] = {"ms": round(total, 1), "presupuesto_ms": PRESUPUESTO_RENDER_MS, "ok": ok}
+        print(f"{'render':8s} {total:8.1f} ms  (presupuesto {PRESUPUESTO_RENDER_MS:.0f} ms)  {'OK' if ok else 'EXCEDIDO'}")
+
+    informe["fecha"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+    if args.json:
+        args.json.write_text(json.dumps(informe, indent=2, ensure_ascii=False), encoding="utf-8")
+    return 1 if pasado else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
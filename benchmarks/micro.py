@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""Micro-benchmarks de las funciones calientes, con historial en JSON.
+
+Tamaños de diario 10 / 1k / 100k filas y de catálogo 192 / 50k alimentos
+(sintéticos a partir de data/base_interna.json, con semilla fija). Cada caso
+se mide con timeit: ``autorange`` elige el número de llamadas y se guarda la
+mediana por llamada de varias repeticiones.
+
+Cada corrida se agrega a benchmarks/historial.json junto con el commit; si un
+caso empeora más que ``--tolerancia`` respecto de la corrida anterior se
+marca como regresión y el script sale con código 1.
+
+    python benchmarks/micro.py
+    python benchmarks/micro.py --filtro export --rapido --sin-guardar
+"""
+
+from __future__ import annotations
+from datetime import date
+from pathlib import Path
+import argparse
+import json
+import random
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+from foodtrappcker import busqueda, catalogo, exportar, nutricion  # noqa: E402
+from foodtrappcker.diario import Diario  # noqa: E402
+
+HISTORIAL = Path(__file__).resolve().parent / "historial.json"
+TAMANOS_DIARIO = (10, 1_000, 100_000)
+TAMANOS_CATALOGO = (192, 50_000)
+SEMILLA = 1234
+
+PERFIL = {"peso_kg": 70.0, "altura_cm": 170.0, "edad": 30, "genero": "Mujer", "objetivo": "Tonificar"}
+REQUERIMIENTOS = nutricion.requerimientos_perfil(PERFIL)
+
+
+# =========================
+# Datos sintéticos
+# =========================
+def items_catalogo(n: int) -> list:
+    """n alimentos: los reales y, si faltan, variantes con nombre y valores distintos."""
+    base = [dict(catalogo.cargar_catalogo().item(i)) for i in catalogo.cargar_catalogo().ids.tolist()]
+    rnd = random.Random(SEMILLA)
+    items = []
+    for i in range(n):
+        it = dict(base[i % len(base)])
+        if i >= len(base):
+            it["nombre"] = f"{it['nombre']} variante {i // len(base)}"
+            for c in catalogo.NUMERICOS:
+                it[c] = round(it[c] * rnd.uniform(0.8, 1.2), 1)
+        it["id"] = i
+        items.append(it)
+    return items
+
+
+def diario_sintetico(cat: catalogo.FoodCatalog, n: int) -> Diario:
+    rnd = random.Random(SEMILLA)
+    ids = cat.ids.tolist()
+    d = Diario()
+    for k in range(n):
+        if k % 10 == 9:
+            d.agregar_fila("Agua (ml)", 1, None, hidr_ml_override=250)
+        else:
+            it = cat.item(rnd.choice(ids))
+            d.agregar_fila(it["nombre"], rnd.choice((0.5, 1.0, 1.5, 2.0)), it)
+    return d
+
+
+def _reconstruir(d: Diario):
+    # Invalida las vistas memoizadas para medir la construcción, no el memo
+    d._modificado()
+
+
+# =========================
+# Casos
+# =========================
+def casos(rapido: bool):
+    """Genera (nombre, función sin argumentos)."""
+    tam_diario = TAMANOS_DIARIO[:-1] if rapido else TAMANOS_DIARIO
+    tam_catalogo = TAMANOS_CATALOGO[:-1] if rapido else TAMANOS_CATALOGO
+
+    yield "requerimientos/escalar", lambda: nutricion.calcular_requerimientos(70.0, 170.0, 30, "Hombre", "Tonificar")
+
+    for n in tam_catalogo:
+        items = items_catalogo(n)
+        cat = catalogo.FoodCatalog(items)
+        ids = cat.ids.tolist()
+        rnd = random.Random(SEMILLA)
+        muestra = [rnd.choice(ids) for _ in range(1000)]
+        claves = [(cat.item(i)["nombre"], cat.item(i)["porcion_desc"]) for i in muestra]
+        indice = busqueda.IndiceBusqueda(cat)
+
+        yield f"catalogo/construir[n={n}]", lambda items=items: catalogo.FoodCatalog(items)
+        yield f"catalogo/etiquetas[n={n}]", lambda items=items: [catalogo.etiqueta_item(it) for it in items]
+        yield f"catalogo/item_x1000[n={n}]", lambda cat=cat, m=muestra: [cat.item(i) for i in m]
+        yield f"catalogo/etiqueta_x1000[n={n}]", lambda cat=cat, m=muestra: [cat.etiqueta(i) for i in m]
+        yield f"catalogo/buscar_id_x1000[n={n}]", lambda cat=cat, c=claves: [cat.buscar_id(*k) for k in c]
+        yield f"busqueda/indice[n={n}]", lambda cat=cat: busqueda.IndiceBusqueda(cat)
+        for consulta in ("s", "pollo", "huevo frtio"):
+            yield f"busqueda/{consulta.replace(' ', '_')}[n={n}]", lambda ix=indice, q=consulta: ix.buscar(q, k=50)
+
+    cat = catalogo.cargar_catalogo()
+    hoy = date.today()
+    for n in tam_diario:
+        d = diario_sintetico(cat, n)
+        totales = d.totales
+
+        def df(d=d):
+            _reconstruir(d)
+            return d.a_dataframe()
+
+        def tabla(d=d):
+            _reconstruir(d)
+            return d.vista_tabla()
+
+        yield f"diario/totales[n={n}]", lambda d=d: dict(d.totales)
+        yield f"diario/recalcular_totales[n={n}]", d.recalcular_totales
+        yield f"diario/a_dataframe[n={n}]", df
+        yield f"diario/vista_tabla_kcal_por_g_prot[n={n}]", tabla
+
+        df_diario = d.a_dataframe()
+        for engine in ("xlsxwriter", "openpyxl", None):
+            yield (f"export/{engine or 'zip'}[n={n}]",
+                   lambda e=engine, df_diario=df_diario, t=totales:
+                   exportar.construir_export(df_diario, t, REQUERIMIENTOS, PERFIL, hoy, e))
+
+
+def medir(funcion, repeticiones: int, min_s: float) -> dict:
+    t = timeit.Timer(funcion)
+    numero, _ = t.autorange()
+    # autorange apunta a ~0.2 s por toma; escalar para llegar a min_s
+    numero = max(1, int(numero * max(1.0, min_s / 0.2)))
+    tomas = [x / numero for x in t.repeat(repeat=repeticiones, number=numero)]
+    return {"mediana_s": statistics.median(tomas), "min_s": min(tomas), "llamadas": numero}
+
+
+def _commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _formato(s: float) -> str:
+    for unidad, factor in (("s", 1), ("ms", 1e-3), ("µs", 1e-6)):
+        if s >= factor:
+            return f"{s / factor:8.2f} {unidad}"
+    return f"{s / 1e-9:8.0f} ns"
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--filtro", default="", help="solo casos cuyo nombre contenga este texto")
+    ap.add_argument("--rapido", action="store_true", help="sin los tamaños más grandes (100k filas, 50k alimentos)")
+    ap.add_argument("--repeticiones", type=int, default=5)
+    ap.add_argument("--min-s", type=float, default=0.2, help="tiempo mínimo por repetición")
+    ap.add_argument("--tolerancia", type=float, default=0.25, help="empeoramiento relativo que cuenta como regresión")
+    ap.add_argument("--historial", type=Path, default=HISTORIAL)
+    ap.add_argument("--sin-guardar", action="store_true", help="no agregar la corrida al historial")
+    args = ap.parse_args(argv)
+
+    previo = {}
+    corridas = []
+    if args.historial.exists():
+        corridas = json.loads(args.historial.read_text(encoding="utf-8"))
+        # Último resultado de cada caso (una corrida --rapido no borra los grandes)
+        for corrida in corridas:
+            previo.update(corrida["resultados"])
+
+    resultados, regresiones = {}, []
+    for nombre, funcion in casos(args.rapido):
+        if args.filtro not in nombre:
+            continue
+        r = resultados[nombre] = medir(funcion, args.repeticiones, args.min_s)
+        nota = ""
+        if nombre in previo:
+            cambio = r["mediana_s"] / previo[nombre]["mediana_s"] - 1
+            nota = f"{cambio:+7.1%}"
+            if cambio > args.tolerancia:
+                regresiones.append(nombre)
+                nota += "  REGRESIÓN"
+        print(f"{nombre:48s} {_formato(r['mediana_s'])}  {nota}", flush=True)
+
+    if not args.sin_guardar and resultados:
+        corridas.append({
+            "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": _commit(),
+            "python": sys.version.split()[0],
+            "rapido": args.rapido,
+            "resultados": resultados,
+        })
+        args.historial.write_text(json.dumps(corridas, indent=1, ensure_ascii=False) + "\n", encoding="utf-8")
+
+    if regresiones:
+        print(f"\n{len(regresiones)} regresiones (> {args.tolerancia:.0%}): {', '.join(regresiones)}")
+    return 1 if regresiones else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""Lógica del Diario de Comidas separada de la interfaz Streamlit.
+
+Ningún módulo del paquete importa Streamlit: catálogo, diario, requerimientos
+(``nutricion``), almacenamiento y export se pueden usar desde scripts, tareas
+por lotes o una API. ``Foodtrappcker V5.py`` es solo la interfaz encima.
+"""
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""Recursos estáticos (CSS y logo) preparados una sola vez por proceso."""
+
+from __future__ import annotations
+from functools import lru_cache
+from pathlib import Path
+import base64
+import io
+import re
+
+LOGO_PATH = Path(__file__).resolve().parent.parent / "Logohorizontal.png"
+
+# El logo se muestra a 180px; 2x cubre pantallas retina sin mandar el original de 1536px
+LOGO_ANCHO_PX = 360
+
+# =========================
+# Estilos responsivos (móvil/tablet/desktop)
+# =========================
+CSS_BASE = """
+.block-container {
+    padding-top: 2.2rem;       /* antes .5rem → más espacio superior */
+    padding-bottom: 2rem;
+    max-width: 1200px;
+}
+h1 {
+    line-height: 1.25;         /* evita que el emoji se recorte */
+    overflow: visible !important;
+}
+.stProgress > div > div { height: 16px; border-radius: 12px; }
+.stButton > button { padding: .65rem 1rem; border-radius: 12px; }
+.stNumberInput input, .stTextInput input { border-radius: 10px; }
+
+/* Móvil */
+@media (max-width: 480px) {
+  .block-container { padding-left: .6rem; padding-right: .6rem; padding-top: 1.5rem; }
+  .stProgress > div > div { height: 22px; }
+  .stButton > button { width: 100%; font-size: 1rem; }
+  .stNumberInput label, .stTextInput label, .stSelectbox label { font-size: 0.95rem; }
+  .stDataFrame { font-size: .92rem; }
+  .st-emotion-cache-ocqkz7, .st-emotion-cache-1wmy9hl { display: block !important; }
+}
+
+/* Tablet */
+@media (min-width: 481px) and (max-width: 1024px) {
+  .stProgress > div > div { height: 20px; }
+  .stButton > button { font-size: .95rem; }
+}
+"""
+
+# =========================
+# Logo superior derecho
+# =========================
+CSS_LOGO = """
+[data-testid="stAppViewContainer"] {
+    position: relative;
+}
+.logo-tribu {
+    position: absolute;
+    top: 10px;
+    right: 25px;
+    width: 180px;
+    z-index: 999;
+}
+"""
+
+TITULO_HTML = (
+    "<h1 style='text-align: center; color: white; font-weight: 800; margin-top: 10px; margin-bottom: 25px;'>"
+    "📒 Diario de Comidas</h1>"
+)
+
+
+def minificar_css(css: str) -> str:
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};:,>])\s*", r"\1", css)
+    return css.replace(";}", "}").strip()
+
+
+def _logo_png(ancho_px: int) -> bytes:
+    data = LOGO_PATH.read_bytes()
+    try:
+        from PIL import Image
+    except Exception:
+        return data
+    with Image.open(io.BytesIO(data)) as im:
+        if im.width <= ancho_px:
+            return data
+        alto = round(im.height * ancho_px / im.width)
+        out = io.BytesIO()
+        im.resize((ancho_px, alto), Image.LANCZOS).save(out, format="PNG", optimize=True)
+    return out.getvalue()
+
+
+@lru_cache(maxsize=None)
+def logo_base64(ancho_px: int = LOGO_ANCHO_PX) -> str:
+    return base64.b64encode(_logo_png(ancho_px)).decode()
+
+
+@lru_cache(maxsize=None)
+def chrome_html() -> str:
+    # Un solo bloque (estilos + logo) ya minificado, compartido por todas las sesiones
+    css = minificar_css(CSS_BASE + CSS_LOGO)
+    return (
+        f"<style>{css}</style>"
+        f'<img src="data:image/png;base64,{logo_base64()}" class="logo-tribu">'
+    )
+
+
+@lru_cache(maxsize=None)
+def bytes_chrome() -> int:
+    """Bytes de chrome estático que se envían al navegador en cada rerun."""
+    return len(chrome_html().encode()) + len(TITULO_HTML.encode())
@@ -0,0 +1,661 @@
+# -*- coding: utf-8 -*-
+"""Persistencia del diario en SQLite (una fila por entrada, por usuario y día).
+
+- WAL: las lecturas de otras sesiones no bloquean a quien escribe.
+- Una conexión por hilo (cada sesión de Streamlit corre en su propio hilo).
+- Sentencias constantes: sqlite3 las guarda preparadas en su caché por conexión.
+- Cambio de día: las entradas anteriores se quedan archivadas con su fecha;
+  nada se borra al pasar la medianoche.
+- ``rollup_diario`` guarda los totales por usuario y día. Lo mantienen
+  triggers en cada alta/baja/cambio de entrada, así el historial lee una fila
+  por día en lugar de recorrer todas las entradas.
+- ``eventos`` es el registro (solo se agrega) de los cambios del diario y
+  ``snapshots`` el estado de un día cada tantos eventos (ver eventos.py).
+  ``op_evento`` guarda el evento y actualiza ``entradas`` en la misma
+  transacción, así la proyección nunca se separa del registro.
+"""
+
+from __future__ import annotations
+from datetime import date
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Protocol
+import json
+import math
+import os
+import sqlite3
+import threading
+
+from foodtrappcker import eventos
+from foodtrappcker.diario import ID_AGUA
+from foodtrappcker.nutricion import CLAVES, OPCIONALES
+from foodtrappcker.plantillas import MAX_RECIENTES, Plantilla
+
+RUTA_DEFECTO = Path(__file__).resolve().parent.parent / "data" / "diario.sqlite3"
+
+# Una columna REAL por nutriente del registro (nutricion.NUTRIENTES), en entradas y en rollup_diario.
+# Los opcionales son NULL en entradas si el alimento no trae el dato; el rollup
+# suma los valores conocidos y cuenta en sin_<nutriente> las entradas sin dato.
+_NUT = ", ".join(CLAVES)
+_SIN = ", ".join(f"sin_{c}" for c in OPCIONALES)
+
+COLUMNAS_RANGO = ("fecha", "minuto", "nombre", "porciones", "porcion_desc", *CLAVES)
+LOTE_LECTURA = 5000
+
+COLUMNAS_ENTRADA = ("id", "minuto", "item_id", "nombre", "porcion_desc", "porciones", *CLAVES)
+
+
+def _lista(plantilla: str, sep: str = ",\n    ", claves=CLAVES) -> str:
+    return sep.join(plantilla.format(c=c) for c in claves)
+
+
+def _lista_nut(requerido: str, opcional: str, sep: str = ", ") -> str:
+    # Como _lista, con otra plantilla para los nutrientes opcionales (que pueden ser NULL)
+    return sep.join((opcional if c in OPCIONALES else requerido).format(c=c) for c in CLAVES)
+
+
+def _columna_entrada(c: str) -> str:
+    return f"{c} REAL" if c in OPCIONALES else f"{c} REAL NOT NULL DEFAULT 0"
+
+
+_COLUMNAS_ENTRADAS = ",\n    ".join(map(_columna_entrada, CLAVES))
+_SEP_SET = ",\n        "
+
+
+# Triggers que mantienen rollup_diario; se regeneran al agregar un nutriente
+TRIGGERS = ("tr_entradas_alta", "tr_entradas_baja", "tr_entradas_cambio")
+_SUMAR_NEW = f"""INSERT INTO rollup_diario (usuario, fecha, {_NUT}, {_SIN}, entradas)
+    VALUES (NEW.usuario, NEW.fecha, {_lista_nut("NEW.{c}", "COALESCE(NEW.{c}, 0)")}, {_lista("NEW.{c} IS NULL", ", ", OPCIONALES)}, 1)
+    ON CONFLICT (usuario, fecha) DO UPDATE SET
+        {_lista("{c} = {c} + excluded.{c}", _SEP_SET)},
+        {_lista("sin_{c} = sin_{c} + excluded.sin_{c}", _SEP_SET, OPCIONALES)},
+        entradas = entradas + 1;"""
+_RESTAR_OLD = f"""UPDATE rollup_diario SET
+        {_lista_nut("{c} = {c} - OLD.{c}", "{c} = {c} - COALESCE(OLD.{c}, 0)", _SEP_SET)},
+        {_lista("sin_{c} = sin_{c} - (OLD.{c} IS NULL)", _SEP_SET, OPCIONALES)},
+        entradas = entradas - 1
+    WHERE usuario = OLD.usuario AND fecha = OLD.fecha;"""
+SQL_TRIGGERS = f"""
+CREATE TRIGGER IF NOT EXISTS tr_entradas_alta AFTER INSERT ON entradas BEGIN
+    {_SUMAR_NEW}
+END;
+
+CREATE TRIGGER IF NOT EXISTS tr_entradas_baja AFTER DELETE ON entradas BEGIN
+    {_RESTAR_OLD}
+END;
+
+CREATE TRIGGER IF NOT EXISTS tr_entradas_cambio AFTER UPDATE ON entradas BEGIN
+    {_RESTAR_OLD}
+    {_SUMAR_NEW}
+END;
+"""
+
+ESQUEMA = f"""
+CREATE TABLE IF NOT EXISTS entradas (
+    id INTEGER PRIMARY KEY,
+    usuario TEXT NOT NULL,
+    fecha TEXT NOT NULL,
+    minuto INTEGER NOT NULL,
+    item_id INTEGER NOT NULL,
+    nombre TEXT NOT NULL,
+    porcion_desc TEXT NOT NULL,
+    porciones REAL NOT NULL,
+    {_COLUMNAS_ENTRADAS}
+);
+CREATE INDEX IF NOT EXISTS ix_entradas_usuario_fecha ON entradas(usuario, fecha, minuto);
+
+CREATE TABLE IF NOT EXISTS perfiles (
+    usuario TEXT NOT NULL,
+    fecha TEXT NOT NULL,
+    peso_kg REAL NOT NULL,
+    altura_cm REAL NOT NULL,
+    edad INTEGER NOT NULL,
+    genero TEXT NOT NULL,
+    objetivo TEXT NOT NULL,
+    kcal_obj REAL NOT NULL,
+    prot_obj REAL NOT NULL,
+    agua_obj REAL NOT NULL,
+    PRIMARY KEY (usuario, fecha)
+);
+
+CREATE TABLE IF NOT EXISTS rollup_diario (
+    usuario TEXT NOT NULL,
+    fecha TEXT NOT NULL,
+    {_lista("{c} REAL NOT NULL DEFAULT 0")},
+    {_lista("sin_{c} INTEGER NOT NULL DEFAULT 0", claves=OPCIONALES)},
+    entradas INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (usuario, fecha)
+) WITHOUT ROWID;
+{SQL_TRIGGERS}
+CREATE TABLE IF NOT EXISTS plantillas (
+    id INTEGER PRIMARY KEY,
+    usuario TEXT NOT NULL,
+    nombre TEXT NOT NULL,
+    {_COLUMNAS_ENTRADAS}
+);
+CREATE INDEX IF NOT EXISTS ix_plantillas_usuario ON plantillas(usuario);
+
+CREATE TABLE IF NOT EXISTS plantilla_items (
+    plantilla_id INTEGER NOT NULL REFERENCES plantillas(id) ON DELETE CASCADE,
+    orden INTEGER NOT NULL,
+    item_id INTEGER NOT NULL,
+    porciones REAL NOT NULL,
+    PRIMARY KEY (plantilla_id, orden)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS favoritos (
+    usuario TEXT NOT NULL,
+    item_id INTEGER NOT NULL,
+    PRIMARY KEY (usuario, item_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS clientes (
+    coach TEXT NOT NULL,
+    usuario TEXT NOT NULL,
+    alias TEXT NOT NULL,
+    PRIMARY KEY (coach, usuario)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS recientes (
+    usuario TEXT NOT NULL,
+    item_id INTEGER NOT NULL,
+    usado INTEGER NOT NULL,
+    PRIMARY KEY (usuario, item_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS eventos (
+    usuario TEXT NOT NULL,
+    fecha TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    id INTEGER NOT NULL UNIQUE,
+    instante REAL NOT NULL,
+    tipo TEXT NOT NULL,
+    origen TEXT NOT NULL,
+    ref INTEGER,
+    datos TEXT NOT NULL,
+    PRIMARY KEY (usuario, fecha, seq)
+);
+CREATE INDEX IF NOT EXISTS ix_eventos_usuario_instante ON eventos(usuario, instante);
+
+CREATE TABLE IF NOT EXISTS snapshots (
+    usuario TEXT NOT NULL,
+    fecha TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    registros TEXT NOT NULL,
+    PRIMARY KEY (usuario, fecha, seq)
+);
+"""
+
+# Bases creadas antes de existir rollup_diario (o de un nutriente): se rellena desde las entradas
+SQL_RELLENAR_ROLLUPS = f"""
+INSERT INTO rollup_diario (usuario, fecha, {_NUT}, {_SIN}, entradas)
+SELECT usuario, fecha, {_lista_nut("SUM({c})", "TOTAL({c})")}, {_lista("COUNT(*) - COUNT({c})", ", ", OPCIONALES)}, COUNT(*)
+FROM entradas GROUP BY usuario, fecha
+"""
+
+# UPSERT (no INSERT OR REPLACE): REPLACE borra sin disparar el trigger de baja
+SQL_INSERTAR = (
+    f"INSERT INTO entradas (id, usuario, fecha, minuto, item_id, nombre, porcion_desc, porciones, {_NUT}) "
+    f"VALUES ({', '.join('?' * (8 + len(CLAVES)))}) "
+    "ON CONFLICT (id) DO UPDATE SET usuario = excluded.usuario, fecha = excluded.fecha, "
+    "minuto = excluded.minuto, item_id = excluded.item_id, nombre = excluded.nombre, "
+    "porcion_desc = excluded.porcion_desc, porciones = excluded.porciones, "
+    + _lista("{c} = excluded.{c}", ", ")
+)
+SQL_ELIMINAR = "DELETE FROM entradas WHERE id = ? AND usuario = ?"
+SQL_VACIAR_DIA = "DELETE FROM entradas WHERE usuario = ? AND fecha = ?"
+SQL_CARGAR_DIA = (
+    f"SELECT id, minuto, item_id, nombre, porcion_desc, porciones, {_NUT} "
+    "FROM entradas WHERE usuario = ? AND fecha = ? ORDER BY minuto, id"
+)
+SQL_GUARDAR_PERFIL = (
+    "INSERT OR REPLACE INTO perfiles (usuario, fecha, peso_kg, altura_cm, edad, genero, objetivo, "
+    "kcal_obj, prot_obj, agua_obj) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+# Perfiles importados: no pisan el que ya se guardó ese día
+SQL_PERFIL_SI_FALTA = (
+    "INSERT INTO perfiles (usuario, fecha, peso_kg, altura_cm, edad, genero, objetivo, "
+    "kcal_obj, prot_obj, agua_obj) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT (usuario, fecha) DO NOTHING"
+)
+SQL_CARGAR_PERFIL = (
+    "SELECT peso_kg, altura_cm, edad, genero, objetivo, kcal_obj, prot_obj, agua_obj "
+    "FROM perfiles WHERE usuario = ? AND fecha = ?"
+)
+# Objetivo de cada día: el último perfil guardado en o antes de esa fecha
+SQL_ROLLUPS = f"""
+SELECT r.fecha, {_lista_nut("r.{c}", "CASE WHEN r.sin_{c} = 0 THEN r.{c} END")}, r.entradas,
+       p.kcal_obj, p.prot_obj, p.agua_obj
+FROM rollup_diario r
+LEFT JOIN perfiles p ON p.usuario = r.usuario AND p.fecha = (
+    SELECT MAX(p2.fecha) FROM perfiles p2 WHERE p2.usuario = r.usuario AND p2.fecha <= r.fecha
+)
+WHERE r.usuario = ? AND r.fecha BETWEEN ? AND ? AND r.entradas > 0
+ORDER BY r.fecha
+"""
+SQL_GUARDAR_PLANTILLA = (
+    f"INSERT OR REPLACE INTO plantillas (id, usuario, nombre, {_NUT}) VALUES (?, ?, ?, {', '.join('?' * len(CLAVES))})"
+)
+SQL_GUARDAR_PLANTILLA_ITEM = (
+    "INSERT OR REPLACE INTO plantilla_items (plantilla_id, orden, item_id, porciones) VALUES (?, ?, ?, ?)"
+)
+SQL_BORRAR_PLANTILLA_ITEMS = "DELETE FROM plantilla_items WHERE plantilla_id = ?"
+SQL_BORRAR_PLANTILLA = "DELETE FROM plantillas WHERE id = ? AND usuario = ?"
+SQL_LEER_PLANTILLAS = (
+    f"SELECT p.id, p.nombre, {_lista('p.{c}', ', ')}, i.item_id, i.porciones "
+    "FROM plantillas p JOIN plantilla_items i ON i.plantilla_id = p.id "
+    "WHERE p.usuario = ? ORDER BY p.nombre, p.id, i.orden"
+)
+SQL_FAVORITO_ALTA = "INSERT OR IGNORE INTO favoritos (usuario, item_id) VALUES (?, ?)"
+SQL_FAVORITO_BAJA = "DELETE FROM favoritos WHERE usuario = ? AND item_id = ?"
+SQL_LEER_FAVORITOS = "SELECT item_id FROM favoritos WHERE usuario = ? ORDER BY item_id"
+SQL_RECIENTE = (
+    "INSERT INTO recientes (usuario, item_id, usado) VALUES (?, ?, ?) "
+    "ON CONFLICT (usuario, item_id) DO UPDATE SET usado = excluded.usado"
+)
+SQL_RECORTAR_RECIENTES = (
+    "DELETE FROM recientes WHERE usuario = ? AND item_id NOT IN "
+    "(SELECT item_id FROM recientes WHERE usuario = ? ORDER BY usado DESC LIMIT ?)"
+)
+SQL_LEER_RECIENTES = "SELECT item_id FROM recientes WHERE usuario = ? ORDER BY usado DESC LIMIT ?"
+
+SQL_ENTRADAS_RANGO = (
+    f"SELECT fecha, minuto, nombre, porciones, porcion_desc, {_NUT} "
+    "FROM entradas WHERE usuario = ? AND fecha BETWEEN ? AND ? ORDER BY fecha, minuto, id"
+)
+SQL_PERFIL_VIGENTE = (
+    "SELECT peso_kg, altura_cm, edad, genero, objetivo, kcal_obj, prot_obj, agua_obj "
+    "FROM perfiles WHERE usuario = ? AND fecha <= ? ORDER BY fecha DESC LIMIT 1"
+)
+SQL_OBJETIVO_VIGENTE = (
+    "SELECT kcal_obj, prot_obj, agua_obj FROM perfiles "
+    "WHERE usuario = ? AND fecha <= ? ORDER BY fecha DESC LIMIT 1"
+)
+SQL_CLIENTE_ALTA = (
+    "INSERT INTO clientes (coach, usuario, alias) VALUES (?, ?, ?) "
+    "ON CONFLICT (coach, usuario) DO UPDATE SET alias = excluded.alias"
+)
+SQL_CLIENTE_BAJA = "DELETE FROM clientes WHERE coach = ? AND usuario = ?"
+SQL_LEER_CLIENTES = "SELECT usuario, alias FROM clientes WHERE coach = ? ORDER BY alias, usuario"
+
+SQL_SIGUIENTE_SEQ = "SELECT COALESCE(MAX(seq), 0) + 1 FROM eventos WHERE usuario = ? AND fecha = ?"
+# Solo se ignora un id repetido (bitácora reaplicada); un seq repetido es un error
+SQL_GUARDAR_EVENTO = (
+    "INSERT INTO eventos (usuario, fecha, seq, id, instante, tipo, origen, ref, datos) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (id) DO NOTHING"
+)
+SQL_GUARDAR_SNAPSHOT = "INSERT OR REPLACE INTO snapshots (usuario, fecha, seq, registros) VALUES (?, ?, ?, ?)"
+SQL_LEER_SNAPSHOT = (
+    "SELECT seq, registros FROM snapshots WHERE usuario = ? AND fecha = ? AND seq <= ? "
+    "ORDER BY seq DESC LIMIT 1"
+)
+SQL_EVENTOS_TRAMO = (
+    "SELECT seq, id, instante, tipo, origen, ref, datos FROM eventos "
+    "WHERE usuario = ? AND fecha = ? AND seq > ? AND seq <= ? ORDER BY seq"
+)
+SQL_ULTIMOS_EVENTOS = (
+    "SELECT seq, id, instante, tipo, origen, ref, datos FROM eventos "
+    "WHERE usuario = ? AND fecha = ? ORDER BY seq DESC LIMIT ?"
+)
+SQL_ACTIVIDAD = (
+    "SELECT fecha, seq, id, instante, tipo, origen, ref, datos FROM eventos "
+    "WHERE usuario = ? ORDER BY instante DESC LIMIT ?"
+)
+MAX_SEQ = 2**62
+
+COLUMNAS_ROLLUP = ("fecha", *CLAVES, "entradas", "kcal_obj", "prot_obj", "agua_obj")
+COLUMNAS_EVENTO = ("seq", "id", "instante", "tipo", "origen", "ref", "datos")
+
+
+class RepositorioDiario(Protocol):
+    """Lo que la app, los exports y los imports usan de un repositorio.
+
+    Lo cumplen ``RepositorioSQLite`` y ``bitacora.EscrituraDiferida`` (que
+    encola las escrituras y delega las lecturas).
+    """
+
+    def aplicar(self, operaciones: Iterable[tuple]) -> None: ...
+    def aplicar_sincrono(self, operaciones: Iterable[tuple]) -> None: ...
+    def vaciar(self, timeout: float | None = 10.0) -> bool: ...
+    def generacion(self, usuario: str) -> int: ...
+    def cargar_dia(self, usuario: str, fecha: date) -> List[Dict]: ...
+    def guardar_perfil(self, usuario: str, fecha: date, perfil: Dict, requerimientos: Dict) -> None: ...
+    def cargar_perfil(self, usuario: str, fecha: date) -> tuple | None: ...
+    def leer_rollups(self, usuario: str, desde: date, hasta: date) -> List[Dict]: ...
+    def leer_entradas(self, usuario: str, desde: date, hasta: date, lote: int = LOTE_LECTURA) -> Iterator[tuple]: ...
+    def leer_perfil_vigente(self, usuario: str, fecha: date) -> tuple | None: ...
+    def leer_plantillas(self, usuario: str) -> List[Plantilla]: ...
+    def leer_favoritos(self, usuario: str) -> List[int]: ...
+    def leer_recientes(self, usuario: str, limite: int = MAX_RECIENTES) -> List[int]: ...
+    def leer_objetivo(self, usuario: str, fecha: date) -> Dict | None: ...
+    def leer_clientes(self, coach: str) -> List[tuple]: ...
+    def leer_eventos(self, usuario: str, fecha: date, ultimos: int = eventos.VENTANA_HISTORIAL) -> List[Dict]: ...
+    def leer_actividad(self, usuario: str, limite: int = 100) -> List[Dict]: ...
+    def leer_estado(self, usuario: str, fecha: date, seq: int | None = None) -> List[Dict]: ...
+
+
+def op_evento(usuario: str, fecha: date, evento: Dict) -> tuple:
+    """Registra un evento del diario (eventos.py) y lo aplica a ``entradas``.
+
+    Es la única escritura de entradas: todo cambio del diario queda en el
+    registro de eventos (auditoría, deshacer / rehacer).
+    """
+    return ("evento", usuario, fecha.isoformat(), dict(evento))
+
+
+def op_perfil(usuario: str, fecha: date, perfil: Dict, requerimientos: Dict, reemplazar: bool = True) -> tuple:
+    """Perfil del día; con ``reemplazar`` False solo se guarda si ese día no tiene uno."""
+    return ("perfil", usuario, fecha.isoformat(), dict(perfil), dict(requerimientos), bool(reemplazar))
+
+
+def op_plantilla(usuario: str, plantilla: Plantilla) -> tuple:
+    # Totales en el orden de CLAVES; sin dato (NaN) va como None
+    return ("plantilla", usuario, plantilla.id, plantilla.nombre,
+            [None if math.isnan(v) else v for v in plantilla.totales], [list(x) for x in plantilla.items])
+
+
+def op_borrar_plantilla(usuario: str, plantilla_id: int) -> tuple:
+    return ("borrar_plantilla", usuario, int(plantilla_id))
+
+
+def op_favorito(usuario: str, item_id: int, activo: bool) -> tuple:
+    return ("favorito", usuario, int(item_id), bool(activo))
+
+
+def op_recientes(usuario: str, item_ids: Iterable[int], usado: int, limite: int = MAX_RECIENTES) -> tuple:
+    return ("recientes", usuario, [int(i) for i in item_ids], int(usado), int(limite))
+
+
+def op_cliente(coach: str, usuario: str, alias: str, activo: bool = True) -> tuple:
+    return ("cliente", coach, usuario, alias, bool(activo))
+
+
+def ruta_db() -> Path:
+    return Path(os.environ.get("DIARIO_DB", RUTA_DEFECTO))
+
+
+class RepositorioSQLite:
+    def __init__(self, ruta: Path | str | None = None):
+        self.ruta = str(ruta if ruta is not None else ruta_db())
+        self._local = threading.local()
+        # Contador de escrituras por usuario: permite cachear lecturas derivadas
+        # (p. ej. el tablero del coach) e invalidarlas al escribir
+        self._generaciones: Dict[str, int] = {}
+        self._lock_generaciones = threading.Lock()
+        with self._conexion() as con:
+            nueva = con.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'rollup_diario'"
+            ).fetchone() is None
+            con.executescript(ESQUEMA)
+            if self._migrar_nutrientes(con) or nueva:
+                con.execute("DELETE FROM rollup_diario")
+                con.execute(SQL_RELLENAR_ROLLUPS)
+
+    @staticmethod
+    def _migrar_nutrientes(con: sqlite3.Connection) -> bool:
+        """Bases anteriores a un nutriente: columnas nuevas (entradas, rollups, plantillas) y triggers regenerados.
+
+        Las entradas existentes quedan sin dato (NULL) en el nutriente nuevo,
+        salvo el agua, que no aporta más que hidratación (0). Una columna
+        opcional creada como NOT NULL (con 0 en lugar de "sin dato") se vuelve a
+        crear vacía. Devuelve True si hay que rehacer los rollups.
+        """
+        # Plantillas: solo guardan totales, sin triggers; a las anteriores les falta el dato
+        plantillas = {fila[1] for fila in con.execute("PRAGMA table_info(plantillas)")}
+        for c in CLAVES:
+            if c not in plantillas:
+                con.execute(f"ALTER TABLE plantillas ADD COLUMN {_columna_entrada(c)}")
+        entradas = {fila[1]: fila[3] for fila in con.execute("PRAGMA table_info(entradas)")}  # columna -> notnull
+        rollup = {fila[1] for fila in con.execute("PRAGMA table_info(rollup_diario)")}
+        cambiar = [c for c in CLAVES if c not in entradas or (c in OPCIONALES and entradas[c])]
+        faltan_rollup = [c for c in CLAVES if c not in rollup]
+        faltan_rollup += [f"sin_{c}" for c in OPCIONALES if f"sin_{c}" not in rollup]
+        if not cambiar and not faltan_rollup:
+            return False
+        # Los triggers nombran las columnas: se quitan antes de tocarlas
+        for trigger in TRIGGERS:
+            con.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        for c in cambiar:
+            if c in entradas:
+                con.execute(f"ALTER TABLE entradas DROP COLUMN {c}")
+            con.execute(f"ALTER TABLE entradas ADD COLUMN {_columna_entrada(c)}")
+            con.execute(f"UPDATE entradas SET {c} = 0 WHERE item_id = ? AND {c} IS NULL", (ID_AGUA,))
+        for c in faltan_rollup:
+            tipo = "INTEGER" if c.startswith("sin_") else "REAL"
+            con.execute(f"ALTER TABLE rollup_diario ADD COLUMN {c} {tipo} NOT NULL DEFAULT 0")
+        con.executescript(SQL_TRIGGERS)
+        return True
+
+    def _conexion(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.ruta, timeout=10.0, cached_statements=64)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            con.execute("PRAGMA busy_timeout=10000")
+            self._local.con = con
+        return con
+
+    def cerrar(self):
+        con = getattr(self._local, "con", None)
+        if con is not None:
+            con.close()
+            self._local.con = None
+
+    # Escrituras como tuplas serializables (tipo, *args): así se pueden encolar,
+    # anotar en la bitácora y aplicar varias en una sola transacción.
+    def aplicar(self, operaciones: Iterable[tuple]) -> None:
+        usuarios = set()
+        with self._conexion() as con:
+            # IMMEDIATE: el lock de escritura se toma antes de leer (p. ej. el
+            # siguiente seq de un evento), no en el primer INSERT; otro escritor
+            # (otra conexión u otro proceso) no puede colarse entre medio
+            con.execute("BEGIN IMMEDIATE")
+            for tipo, *args in operaciones:
+                getattr(self, f"_op_{tipo}")(con, *args)
+                usuarios.add(args[0])
+        with self._lock_generaciones:
+            for u in usuarios:
+                self._generaciones[u] = self._generaciones.get(u, 0) + 1
+
+    def aplicar_sincrono(self, operaciones: Iterable[tuple]) -> None:
+        """Como ``aplicar``; aquí toda escritura ya es síncrona."""
+        self.aplicar(operaciones)
+
+    def vaciar(self, timeout: float | None = 10.0) -> bool:
+        """Nada pendiente: las escrituras de este repositorio no se encolan."""
+        return True
+
+    def generacion(self, usuario: str) -> int:
+        """Cambia cada vez que este proceso escribe algo del usuario."""
+        return self._generaciones.get(usuario, 0)
+
+    # Proyección de un evento sobre entradas (no son operaciones: solo las usa _op_evento)
+    @staticmethod
+    def _guardar_filas(con: sqlite3.Connection, usuario: str, fecha: str, registros: List[Dict]):
+        # Registros anteriores a un nutriente (bitácora, eventos) no lo traen: NULL (sin dato)
+        con.executemany(SQL_INSERTAR, [
+            (r["id"], usuario, fecha, r["minuto"], r["item_id"], r["nombre"], r["porcion_desc"],
+             r["porciones"], *[r.get(c) for c in CLAVES])
+            for r in registros
+        ])
+
+    @staticmethod
+    def _eliminar_filas(con: sqlite3.Connection, usuario: str, ids: List[int]):
+        con.executemany(SQL_ELIMINAR, [(int(i), usuario) for i in ids])
+
+    @staticmethod
+    def _vaciar_filas(con: sqlite3.Connection, usuario: str, fecha: str):
+        con.execute(SQL_VACIAR_DIA, (usuario, fecha))
+
+    @classmethod
+    def _op_evento(cls, con: sqlite3.Connection, usuario: str, fecha: str, evento: Dict):
+        seq = con.execute(SQL_SIGUIENTE_SEQ, (usuario, fecha)).fetchone()[0]
+        if seq == 1:
+            # Primer evento del día: lo que ya había (entradas anteriores al
+            # registro de eventos) queda como snapshot 0
+            cls._snapshot(con, usuario, fecha, 0)
+        cur = con.execute(SQL_GUARDAR_EVENTO, (
+            usuario, fecha, seq, evento["id"], evento["instante"], evento["tipo"],
+            evento["origen"], evento["ref"], json.dumps(evento["datos"], ensure_ascii=False),
+        ))
+        if not cur.rowcount:
+            return  # ya estaba registrado (bitácora reaplicada)
+        tipo, datos = evento["tipo"], evento["datos"]
+        if tipo in ("vaciar", "reemplazar"):
+            cls._vaciar_filas(con, usuario, fecha)
+        if tipo == "eliminar":
+            cls._eliminar_filas(con, usuario, [r["id"] for r in datos["registros"]])
+        elif tipo != "vaciar":
+            cls._guardar_filas(con, usuario, fecha, eventos.registros_afectados(evento))
+        if seq % eventos.SNAPSHOT_CADA == 0:
+            cls._snapshot(con, usuario, fecha, seq)
+
+    @staticmethod
+    def _snapshot(con: sqlite3.Connection, usuario: str, fecha: str, seq: int):
+        # Filas como listas (COLUMNAS_ENTRADA): sin repetir los nombres de columna
+        filas = con.execute(SQL_CARGAR_DIA, (usuario, fecha)).fetchall()
+        con.execute(SQL_GUARDAR_SNAPSHOT, (usuario, fecha, seq, json.dumps(filas, ensure_ascii=False)))
+
+    @staticmethod
+    def _op_perfil(con: sqlite3.Connection, usuario: str, fecha: str, perfil: Dict, requerimientos: Dict,
+                   reemplazar: bool = True):
+        con.execute(SQL_GUARDAR_PERFIL if reemplazar else SQL_PERFIL_SI_FALTA, (
+            usuario, fecha, perfil["peso_kg"], perfil["altura_cm"], perfil["edad"],
+            perfil["genero"], perfil["objetivo"],
+            requerimientos["kcal_obj"], requerimientos["prot_obj"], requerimientos["agua_obj"],
+        ))
+
+    @staticmethod
+    def _op_plantilla(con: sqlite3.Connection, usuario: str, plantilla_id: int, nombre: str,
+                      totales: List[float], items: List[List]):
+        # Operaciones anteriores a un nutriente no traen su total: NULL (sin dato)
+        totales = list(totales) + [None] * (len(CLAVES) - len(totales))
+        con.execute(SQL_GUARDAR_PLANTILLA, (plantilla_id, usuario, nombre, *totales))
+        con.execute(SQL_BORRAR_PLANTILLA_ITEMS, (plantilla_id,))
+        con.executemany(SQL_GUARDAR_PLANTILLA_ITEM, [
+            (plantilla_id, orden, item_id, porciones) for orden, (item_id, porciones) in enumerate(items)
+        ])
+
+    @staticmethod
+    def _op_borrar_plantilla(con: sqlite3.Connection, usuario: str, plantilla_id: int):
+        if con.execute(SQL_BORRAR_PLANTILLA, (plantilla_id, usuario)).rowcount:
+            con.execute(SQL_BORRAR_PLANTILLA_ITEMS, (plantilla_id,))
+
+    @staticmethod
+    def _op_favorito(con: sqlite3.Connection, usuario: str, item_id: int, activo: bool):
+        con.execute(SQL_FAVORITO_ALTA if activo else SQL_FAVORITO_BAJA, (usuario, item_id))
+
+    @staticmethod
+    def _op_cliente(con: sqlite3.Connection, coach: str, usuario: str, alias: str, activo: bool):
+        if activo:
+            con.execute(SQL_CLIENTE_ALTA, (coach, usuario, alias))
+        else:
+            con.execute(SQL_CLIENTE_BAJA, (coach, usuario))
+
+    @staticmethod
+    def _op_recientes(con: sqlite3.Connection, usuario: str, item_ids: List[int], usado: int, limite: int):
+        # El primero de la lista es el más reciente
+        con.executemany(SQL_RECIENTE, [(usuario, i, usado - k) for k, i in enumerate(item_ids)])
+        con.execute(SQL_RECORTAR_RECIENTES, (usuario, usuario, limite))
+
+    def guardar_perfil(self, usuario: str, fecha: date, perfil: Dict, requerimientos: Dict) -> None:
+        self.aplicar([op_perfil(usuario, fecha, perfil, requerimientos)])
+
+    def cargar_dia(self, usuario: str, fecha: date) -> List[Dict]:
+        cur = self._conexion().execute(SQL_CARGAR_DIA, (usuario, fecha.isoformat()))
+        return [dict(zip(COLUMNAS_ENTRADA, fila)) for fila in cur]
+
+    def cargar_perfil(self, usuario: str, fecha: date) -> tuple | None:
+        """(perfil, requerimientos) guardados para ese día, o None."""
+        return self._perfil(SQL_CARGAR_PERFIL, usuario, fecha)
+
+    def leer_perfil_vigente(self, usuario: str, fecha: date) -> tuple | None:
+        """(perfil, requerimientos) del último perfil guardado en o antes de la fecha."""
+        return self._perfil(SQL_PERFIL_VIGENTE, usuario, fecha)
+
+    def _perfil(self, sql: str, usuario: str, fecha: date) -> tuple | None:
+        fila = self._conexion().execute(sql, (usuario, fecha.isoformat())).fetchone()
+        if fila is None:
+            return None
+        peso, altura, edad, genero, objetivo, kcal_obj, prot_obj, agua_obj = fila
+        perfil = {"peso_kg": peso, "altura_cm": altura, "edad": edad, "genero": genero, "objetivo": objetivo}
+        return perfil, {"kcal_obj": kcal_obj, "prot_obj": prot_obj, "agua_obj": agua_obj}
+
+    def leer_rollups(self, usuario: str, desde: date, hasta: date) -> List[Dict]:
+        """Totales diarios (con el objetivo vigente ese día) entre dos fechas."""
+        cur = self._conexion().execute(SQL_ROLLUPS, (usuario, desde.isoformat(), hasta.isoformat()))
+        return [dict(zip(COLUMNAS_ROLLUP, fila)) for fila in cur]
+
+    def leer_entradas(self, usuario: str, desde: date, hasta: date, lote: int = LOTE_LECTURA) -> Iterator[tuple]:
+        """Entradas de un rango de fechas como tuplas (COLUMNAS_RANGO), leídas por lotes.
+
+        Es un generador: no carga el rango completo en memoria.
+        """
+        cur = self._conexion().execute(SQL_ENTRADAS_RANGO, (usuario, desde.isoformat(), hasta.isoformat()))
+        try:
+            while True:
+                filas = cur.fetchmany(lote)
+                if not filas:
+                    return
+                yield from filas
+        finally:
+            cur.close()
+
+    def leer_plantillas(self, usuario: str) -> List[Plantilla]:
+        por_id: Dict[int, tuple] = {}
+        for pid, nombre, *totales, item_id, porciones in self._conexion().execute(SQL_LEER_PLANTILLAS, (usuario,)):
+            fila = por_id.setdefault(pid, (nombre, tuple(math.nan if v is None else v for v in totales), []))
+            fila[2].append((item_id, porciones))
+        return [
+            Plantilla(pid, nombre, tuple(items), totales)
+            for pid, (nombre, totales, items) in por_id.items()
+        ]
+
+    def leer_favoritos(self, usuario: str) -> List[int]:
+        return [i for (i,) in self._conexion().execute(SQL_LEER_FAVORITOS, (usuario,))]
+
+    def leer_recientes(self, usuario: str, limite: int = MAX_RECIENTES) -> List[int]:
+        return [i for (i,) in self._conexion().execute(SQL_LEER_RECIENTES, (usuario, limite))]
+
+    def leer_objetivo(self, usuario: str, fecha: date) -> Dict | None:
+        """Requerimientos vigentes ese día (último perfil guardado en o antes de la fecha)."""
+        fila = self._conexion().execute(SQL_OBJETIVO_VIGENTE, (usuario, fecha.isoformat())).fetchone()
+        if fila is None:
+            return None
+        return dict(zip(("kcal_obj", "prot_obj", "agua_obj"), fila))
+
+    def leer_clientes(self, coach: str) -> List[tuple]:
+        """[(usuario, alias)] de un coach."""
+        return self._conexion().execute(SQL_LEER_CLIENTES, (coach,)).fetchall()
+
+    @staticmethod
+    def _evento(fila: tuple, columnas: tuple = COLUMNAS_EVENTO) -> Dict:
+        ev = dict(zip(columnas, fila))
+        ev["datos"] = json.loads(ev["datos"])
+        return ev
+
+    def leer_eventos(self, usuario: str, fecha: date, ultimos: int = eventos.VENTANA_HISTORIAL) -> List[Dict]:
+        """Los últimos eventos de un día, del más antiguo al más nuevo."""
+        cur = self._conexion().execute(SQL_ULTIMOS_EVENTOS, (usuario, fecha.isoformat(), ultimos))
+        return [self._evento(fila) for fila in reversed(cur.fetchall())]
+
+    def leer_actividad(self, usuario: str, limite: int = 100) -> List[Dict]:
+        """Los últimos eventos del usuario en cualquier día (con su fecha), del más nuevo al más antiguo."""
+        cur = self._conexion().execute(SQL_ACTIVIDAD, (usuario, limite))
+        return [self._evento(fila, ("fecha", *COLUMNAS_EVENTO)) for fila in cur]
+
+    def leer_estado(self, usuario: str, fecha: date, seq: int | None = None) -> List[Dict]:
+        """Registros del día justo después del evento ``seq`` (por defecto, el último).
+
+        Snapshot más cercano + los eventos posteriores, como mucho
+        ``eventos.SNAPSHOT_CADA``. Un día sin eventos se lee de ``entradas``.
+        """
+        con = self._conexion()
+        hasta = MAX_SEQ if seq is None else seq
+        snap = con.execute(SQL_LEER_SNAPSHOT, (usuario, fecha.isoformat(), hasta)).fetchone()
+        if snap is None:
+            return self.cargar_dia(usuario, fecha) if seq is None else []
+        desde, filas = snap
+        cur = con.execute(SQL_EVENTOS_TRAMO, (usuario, fecha.isoformat(), desde, hasta))
+        return eventos.plegar((dict(zip(COLUMNAS_ENTRADA, f)) for f in json.loads(filas)),
+                              (self._evento(fila) for fila in cur))
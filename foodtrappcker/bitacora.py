@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""Escritura diferida (write-behind) del diario.
+
+Los envíos de formularios no esperan al disco: cada escritura se anota en una
+bitácora (archivo JSONL, sin fsync) y se encola. Un hilo en segundo plano
+vacía la cola en lotes, cada lote en una sola transacción de SQLite, y
+después de cada lote reescribe la bitácora con lo que sigue en la cola (así
+no crece sin límite aunque nunca quede vacía).
+
+- La cola es acotada: si el disco se queda muy atrás, el productor espera.
+- Se vacía por tiempo (``intervalo``), al cerrar el proceso (atexit) y antes
+  de cada lectura, para que una sesión siempre lea lo que escribió.
+- Si el proceso muere con escrituras pendientes, la bitácora se reaplica al
+  arrancar. Las operaciones son idempotentes (UPSERT / DELETE por id).
+- Solo se reintenta lo que se arregla esperando (base bloqueada u ocupada).
+  Si un lote falla por otra cosa se aplica operación por operación, y las
+  que fallan se registran en el log y se apartan en ``descartadas.jsonl``:
+  una operación mala no frena las demás.
+"""
+
+from __future__ import annotations
+from datetime import date
+from pathlib import Path
+from typing import Dict, Iterable, List
+import atexit
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+
+from foodtrappcker import almacen
+
+logger = logging.getLogger(__name__)
+
+MAX_COLA = 10_000
+MAX_LOTE = 500
+INTERVALO_S = 0.5
+
+
+def _proceso_vivo(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _es_transitorio(e: Exception) -> bool:
+    # Otra conexión o proceso tiene la base tomada: basta con esperar
+    return isinstance(e, sqlite3.OperationalError) and any(m in str(e) for m in ("locked", "busy"))
+
+
+def _leer_bitacora(ruta: Path) -> List[tuple]:
+    ops = []
+    with open(ruta, encoding="utf-8") as f:
+        for linea in f:
+            try:
+                ops.append(tuple(json.loads(linea)))
+            except json.JSONDecodeError:
+                # Última línea a medio escribir cuando el proceso murió
+                break
+    return ops
+
+
+class EscrituraDiferida:
+    """Envuelve un repositorio: escrituras asíncronas, lecturas directas.
+
+    Cumple ``almacen.RepositorioDiario``: las escrituras se encolan (salvo
+    ``aplicar_sincrono``) y el resto (lecturas, ``generacion``) se delega en
+    ``repo`` vía ``__getattr__``.
+    """
+
+    def __init__(self, repo: almacen.RepositorioSQLite, dir_bitacora: Path | str | None = None,
+                 max_cola: int = MAX_COLA, max_lote: int = MAX_LOTE, intervalo: float = INTERVALO_S):
+        self.repo = repo
+        self.max_lote = max_lote
+        self.intervalo = intervalo
+        self.dir_bitacora = Path(dir_bitacora) if dir_bitacora is not None else Path(repo.ruta).parent / "bitacora"
+        self.dir_bitacora.mkdir(parents=True, exist_ok=True)
+        self.ruta_bitacora = self.dir_bitacora / f"pendientes-{os.getpid()}.jsonl"
+        self.ruta_descartadas = self.dir_bitacora / "descartadas.jsonl"
+
+        self._cola: queue.Queue = queue.Queue(maxsize=max_cola)
+        self._lock = threading.Lock()
+        self._pendientes = 0
+        self._vacio = threading.Condition(self._lock)
+        self._parar = threading.Event()
+
+        self.reaplicar_bitacoras()
+        self._archivo = open(self.ruta_bitacora, "a", encoding="utf-8")
+        self._hilo = threading.Thread(target=self._bucle, name="diario-write-behind", daemon=True)
+        self._hilo.start()
+        atexit.register(self.cerrar)
+
+    # ---- recuperación ----
+    def reaplicar_bitacoras(self):
+        """Aplica las bitácoras que dejaron procesos ya terminados (o este mismo pid)."""
+        for ruta in sorted(self.dir_bitacora.glob("pendientes-*.jsonl")):
+            try:
+                pid = int(ruta.stem.split("-", 1)[1])
+            except ValueError:
+                continue
+            if pid != os.getpid() and _proceso_vivo(pid):
+                continue
+            ops = _leer_bitacora(ruta)
+            if ops:
+                logger.warning("reaplicando %d escrituras pendientes de %s", len(ops), ruta.name)
+                self._aplicar(ops)
+            ruta.unlink()
+
+    # ---- escritura ----
+    def _encolar(self, op: tuple):
+        linea = json.dumps(op, ensure_ascii=False)
+        with self._lock:
+            # Sin fsync: basta con que llegue al sistema operativo para sobrevivir
+            # a la caída del proceso; el coste es el de un write() pequeño.
+            self._archivo.write(linea + "\n")
+            self._archivo.flush()
+            self._pendientes += 1
+            # Con su línea: después de cada lote la bitácora se reescribe con lo que queda
+            self._cola.put((op, linea))
+
+    def aplicar(self, operaciones: Iterable[tuple]) -> None:
+        for op in operaciones:
+            self._encolar(op)
+
+    def aplicar_sincrono(self, operaciones: Iterable[tuple]) -> None:
+        """Aplica ya, en una transacción y después de lo pendiente; los errores se lanzan.
+
+        Para quien espera el resultado (un import): no pasa por la cola ni por
+        la bitácora, que solo protegen lo que todavía no llegó a la base.
+        """
+        self.vaciar()
+        self.repo.aplicar(operaciones)
+
+    def guardar_perfil(self, usuario: str, fecha: date, perfil: Dict, requerimientos: Dict) -> None:
+        self._encolar(almacen.op_perfil(usuario, fecha, perfil, requerimientos))
+
+    # ---- lectura (después de vaciar lo pendiente) ----
+    def __getattr__(self, nombre):
+        # Lecturas del repositorio (cargar_*, leer_*): primero se vacía la cola
+        # para que la sesión lea lo que acaba de escribir.
+        atributo = getattr(self.repo, nombre)
+        if not nombre.startswith(("cargar_", "leer_")):
+            return atributo
+
+        def leer(*args, **kwargs):
+            self.vaciar()
+            return atributo(*args, **kwargs)
+        return leer
+
+    # ---- hilo de fondo ----
+    def _aplicar_reintentando(self, lote: List[tuple]) -> bool:
+        """Aplica ``lote``; con la base bloqueada espera y reintenta. False si se pidió parar."""
+        espera = self.intervalo
+        while True:
+            try:
+                self.repo.aplicar(lote)
+                return True
+            except sqlite3.OperationalError as e:
+                if not _es_transitorio(e):
+                    raise
+                # Mientras tanto el lote sigue en la bitácora por si el proceso se cae
+                logger.warning("base ocupada, se reintenta un lote de %d operaciones: %s", len(lote), e)
+                if self._parar.wait(espera):
+                    return False
+                espera = min(espera * 2, 30.0)
+
+    def _aplicar(self, lote: List[tuple]) -> bool:
+        """Aplica un lote; si falla, de a una operación, apartando las que no se pueden aplicar.
+
+        Nunca lanza: un error que mate el hilo dejaría todo sin escribir y cada
+        lectura esperando el timeout de ``vaciar``. False si se pidió parar.
+        """
+        try:
+            return self._aplicar_reintentando(lote)
+        except Exception:
+            logger.exception("falló un lote de %d operaciones; se aplican de a una", len(lote))
+        for op in lote:
+            try:
+                if not self._aplicar_reintentando([op]):
+                    return False
+            except Exception:
+                logger.exception("operación descartada (queda en %s): %.200r", self.ruta_descartadas.name, op)
+                self._descartar(op)
+        return True
+
+    def _descartar(self, op: tuple):
+        try:
+            with open(self.ruta_descartadas, "a", encoding="utf-8") as f:
+                f.write(json.dumps(op, ensure_ascii=False) + "\n")
+        except (OSError, TypeError, ValueError):
+            logger.exception("no se pudo apartar la operación descartada")
+
+    def _recortar_bitacora(self):
+        # Con el lock tomado: la bitácora queda con las líneas de lo que sigue en la cola
+        with self._cola.mutex:
+            restantes = [linea for _, linea in self._cola.queue]
+        try:
+            self._archivo.seek(0)
+            self._archivo.truncate()
+            if restantes:
+                self._archivo.write("\n".join(restantes) + "\n")
+            self._archivo.flush()
+        except OSError:
+            logger.exception("no se pudo recortar la bitácora %s", self.ruta_bitacora.name)
+
+    def _bucle(self):
+        while not self._parar.is_set() or not self._cola.empty():
+            try:
+                lote = [self._cola.get(timeout=self.intervalo)]
+            except queue.Empty:
+                continue
+            while len(lote) < self.max_lote:
+                try:
+                    lote.append(self._cola.get_nowait())
+                except queue.Empty:
+                    break
+            if not self._aplicar([op for op, _ in lote]):
+                return  # cerrando: lo que falta sigue en la bitácora
+            with self._lock:
+                self._pendientes -= len(lote)
+                self._recortar_bitacora()
+                if self._pendientes == 0:
+                    self._vacio.notify_all()
+
+    def vaciar(self, timeout: float | None = 10.0) -> bool:
+        """Espera a que todo lo encolado esté en la base."""
+        with self._lock:
+            return self._vacio.wait_for(lambda: self._pendientes == 0, timeout=timeout)
+
+    def cerrar(self):
+        if self._parar.is_set():
+            return
+        self._parar.set()
+        self._hilo.join(timeout=30)
+        with self._lock:
+            self._archivo.close()
+            if self._pendientes == 0:
+                self.ruta_bitacora.unlink(missing_ok=True)
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""Búsqueda incremental de alimentos sobre el catálogo.
+
+El índice se construye una vez por carga de catálogo y combina:
+- normalización (minúsculas, sin tildes): "salmon" encuentra "Salmón";
+- prefijos por palabra con búsqueda binaria sobre los tokens ordenados;
+- trigramas para tolerar errores de tipeo ("Huevo Frtio" ↔ "frito").
+"""
+
+from __future__ import annotations
+from bisect import bisect_left
+from difflib import SequenceMatcher
+from functools import lru_cache
+from typing import Dict, List, Tuple
+import re
+import unicodedata
+
+import numpy as np
+
+from foodtrappcker.catalogo import FoodCatalog
+
+K_DEFECTO = 20
+# Cuántos candidatos por trigramas se re-puntúan con SequenceMatcher
+CANDIDATOS_DIFUSOS = 24
+UMBRAL_DIFUSO = 0.75
+
+_NO_ALNUM = re.compile(r"[^0-9a-zñ]+")
+
+
+def normalizar(texto: str) -> str:
+    texto = texto.lower().replace("ñ", "\0")
+    texto = "".join(c for c in unicodedata.normalize("NFKD", texto) if not unicodedata.combining(c))
+    texto = texto.replace("\0", "ñ")
+    return _NO_ALNUM.sub(" ", texto).strip()
+
+
+def _trigramas(token: str) -> List[str]:
+    t = f"  {token} "
+    return [t[i:i+3] for i in range(len(t) - 2)]
+
+
+class IndiceBusqueda:
+    def __init__(self, cat: FoodCatalog):
+        self.ids = cat.ids
+        textos = [normalizar(f"{n} {p}") for n, p in zip(cat.nombre, cat.porcion_desc)]
+        self._nombres = [normalizar(n) for n in cat.nombre]
+        self._tokens_fila: List[Tuple[str, ...]] = [tuple(t.split()) for t in textos]
+
+        # Prefijos: lista ordenada de (token, fila) para bisect
+        pares = sorted({(tok, fila) for fila, toks in enumerate(self._tokens_fila) for tok in toks})
+        self._tokens = [tok for tok, _ in pares]
+        self._filas_token = np.array([fila for _, fila in pares], dtype=np.int32)
+
+        # Nombres completos ordenados: "empieza por la consulta" es un rango contiguo
+        orden_nombre = sorted(range(len(textos)), key=lambda f: self._nombres[f])
+        self._nombres_ord = [self._nombres[f] for f in orden_nombre]
+        self._filas_nombre = np.array(orden_nombre, dtype=np.int32)
+
+        # Rango de presentación: nombres cortos primero, luego alfabético
+        orden = sorted(range(len(textos)), key=lambda f: (len(self._nombres[f]), self._nombres[f], f))
+        self._rango = np.empty(len(textos), dtype=np.int64)
+        self._rango[orden] = np.arange(len(textos))
+
+        # Trigramas: trigrama -> filas (listas de posteo)
+        posteo: Dict[str, set] = {}
+        for fila, toks in enumerate(self._tokens_fila):
+            for tok in toks:
+                for g in _trigramas(tok):
+                    posteo.setdefault(g, set()).add(fila)
+        self._posteo = {g: np.fromiter(sorted(f), dtype=np.int32, count=len(f)) for g, f in posteo.items()}
+        self._n = len(textos)
+
+    @staticmethod
+    def _rango_prefijo(lista: List[str], prefijo: str) -> Tuple[int, int]:
+        i = bisect_left(lista, prefijo)
+        return i, bisect_left(lista, prefijo + "\uffff", lo=i)
+
+    def _similitud(self, fila: int, tokens_q: List[str], sm: List[SequenceMatcher]) -> float:
+        toks = self._tokens_fila[fila]
+        total = 0.0
+        for m in sm:
+            mejor = 0.0
+            for t in toks:
+                m.set_seq1(t)
+                if m.real_quick_ratio() > mejor and m.quick_ratio() > mejor:
+                    mejor = max(mejor, m.ratio())
+            total += mejor
+        return total / len(sm)
+
+    def buscar(self, consulta: str, k: int = K_DEFECTO) -> List[int]:
+        q = normalizar(consulta)
+        if not q:
+            return [int(i) for i in self.ids[:k]]
+        tokens_q = q.split()
+
+        # 1) Todas las palabras de la consulta son prefijo de alguna palabra del alimento
+        filas = None
+        for tok in tokens_q:
+            i, j = self._rango_prefijo(self._tokens, tok)
+            f = np.unique(self._filas_token[i:j])
+            filas = f if filas is None else np.intersect1d(filas, f, assume_unique=True)
+            if filas.size == 0:
+                break
+        exactas = np.empty(0, dtype=np.int32)
+        if filas is not None and filas.size:
+            # Primero los nombres que empiezan por la consulta, luego los más cortos
+            i, j = self._rango_prefijo(self._nombres_ord, q)
+            empieza = np.zeros(self._n, dtype=bool)
+            empieza[self._filas_nombre[i:j]] = True
+            clave = self._rango[filas] + np.where(empieza[filas], 0, self._n)
+            if filas.size > k:
+                top = np.argpartition(clave, k - 1)[:k]
+                filas, clave = filas[top], clave[top]
+            exactas = filas[np.argsort(clave, kind="stable")]
+        if exactas.size >= k:
+            return [int(self.ids[f]) for f in exactas]
+
+        # 2) Tolerancia a errores: candidatos por trigramas compartidos, re-puntuados
+        listas = [self._posteo[g] for tok in tokens_q for g in _trigramas(tok) if g in self._posteo]
+        if not listas:
+            return [int(self.ids[f]) for f in exactas]
+        conteo = np.bincount(np.concatenate(listas), minlength=self._n)
+        conteo[exactas] = 0
+        m = min(CANDIDATOS_DIFUSOS, int(np.count_nonzero(conteo)))
+        if m == 0:
+            return [int(self.ids[f]) for f in exactas]
+        cand = np.argpartition(-conteo, m - 1)[:m]
+        sm = []
+        for tok in tokens_q:
+            matcher = SequenceMatcher(None, autojunk=False)
+            matcher.set_seq2(tok)
+            sm.append(matcher)
+        puntuados = [(self._similitud(int(f), tokens_q, sm), int(self._rango[f]), int(f)) for f in cand]
+        difusas = [f for s, _, f in sorted(puntuados, key=lambda x: (-x[0], x[1])) if s >= UMBRAL_DIFUSO]
+        return [int(self.ids[f]) for f in exactas.tolist() + difusas][:k]
+
+
+@lru_cache(maxsize=4)
+def indice_busqueda(cat: FoodCatalog) -> IndiceBusqueda:
+    # Un índice por objeto catálogo: al recargar el JSON se construye otro
+    return IndiceBusqueda(cat)
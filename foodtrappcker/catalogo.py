@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""Catálogo de alimentos: se lee de data/base_interna.json una vez por proceso.
+
+La ruta se puede cambiar con la variable de entorno DIARIO_CATALOGO. Si el
+archivo se modifica (mtime distinto) la siguiente lectura lo recarga, así el
+equipo de nutrición puede actualizar alimentos sin redeploy.
+
+Los valores nutricionales forman una matriz alimentos × nutrientes (columnas
+en el orden de ``nutricion.NUTRIENTES``). Solo kcal, proteína e hidratación
+son obligatorios; un nutriente que el alimento no trae es NaN ("sin dato"),
+no 0. Un nutriente opcional que no trae ningún alimento no se muestra ni se
+exporta (``FoodCatalog.nutrientes``): sería siempre "sin dato".
+"""
+
+from __future__ import annotations
+from pathlib import Path
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Mapping, Tuple
+import json
+import math
+import os
+import threading
+
+import numpy as np
+
+from foodtrappcker.nutricion import CLAVES, NUTRIENTES, Nutriente
+
+RUTA_DEFECTO = Path(__file__).resolve().parent.parent / "data" / "base_interna.json"
+CAMPOS = ("nombre", "porcion_desc") + tuple(n.clave for n in NUTRIENTES if n.requerido)
+NUMERICOS = CLAVES
+
+_lock = threading.Lock()
+_cache: dict = {}  # ruta -> (firma, FoodCatalog)
+
+
+def ruta_catalogo() -> Path:
+    return Path(os.environ.get("DIARIO_CATALOGO", RUTA_DEFECTO))
+
+
+def etiqueta_item(it: Mapping) -> str:
+    return f"{it['nombre']} — {it['porcion_desc']} · {it['kcal']} kcal · {it['proteina_g']} g prot"
+
+
+def _solo_lectura(arr: np.ndarray) -> np.ndarray:
+    arr.setflags(write=False)
+    return arr
+
+
+class FoodCatalog:
+    """Catálogo columnar e indexado, inmutable y compartido entre sesiones.
+
+    Cada alimento tiene un id entero estable (campo ``id`` del JSON). Las
+    columnas son arrays de NumPy alineados por fila; ``fila(id)`` traduce un
+    id a su posición en O(1). ``matriz`` tiene una fila por alimento y una
+    columna por nutriente; ``kcal``, ``proteina_g``, etc. son vistas de sus
+    columnas.
+    """
+
+    def __init__(self, items: List[Dict]):
+        ids = [int(it["id"]) for it in items]
+        self.ids = _solo_lectura(np.array(ids, dtype=np.int64))
+        self.nombre = _solo_lectura(np.array([it["nombre"] for it in items], dtype=object))
+        self.porcion_desc = _solo_lectura(np.array([it["porcion_desc"] for it in items], dtype=object))
+        self.matriz = _solo_lectura(np.array(
+            [[it.get(c, math.nan) for c in CLAVES] for it in items], dtype=np.float64
+        ).reshape(len(items), len(CLAVES)))
+        for k, c in enumerate(CLAVES):
+            setattr(self, c, self.matriz[:, k])
+        # Los que trae al menos un alimento (los obligatorios siempre), en el orden del registro
+        con_dato = ~np.isnan(self.matriz).all(axis=0)
+        self.nutrientes: Tuple[Nutriente, ...] = tuple(
+            n for n, hay in zip(NUTRIENTES, con_dato) if n.requerido or hay
+        )
+
+        # Etiquetas precalculadas a partir de los valores originales (mantiene "120.0" vs "45")
+        self.etiquetas: Tuple[str, ...] = tuple(etiqueta_item(it) for it in items)
+        self._items: Tuple[Mapping, ...] = tuple(
+            MappingProxyType({"id": it["id"], "nombre": it["nombre"], "porcion_desc": it["porcion_desc"],
+                              **{c: it.get(c, math.nan) for c in CLAVES}}) for it in items
+        )
+
+        self._fila_por_id: Dict[int, int] = {i: fila for fila, i in enumerate(ids)}
+        self._ids_por_nombre: Dict[str, Tuple[int, ...]] = {}
+        for i, it in zip(ids, items):
+            self._ids_por_nombre[it["nombre"]] = self._ids_por_nombre.get(it["nombre"], ()) + (i,)
+        self._id_por_clave: Dict[Tuple[str, str], int] = {
+            (it["nombre"], it["porcion_desc"]): i for i, it in zip(ids, items)
+        }
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, item_id: int) -> bool:
+        return item_id in self._fila_por_id
+
+    def fila(self, item_id: int) -> int:
+        return self._fila_por_id[item_id]
+
+    def item(self, item_id: int) -> Mapping:
+        return self._items[self._fila_por_id[item_id]]
+
+    def etiqueta(self, item_id: int) -> str:
+        return self.etiquetas[self._fila_por_id[item_id]]
+
+    def ids_por_nombre(self, nombre: str) -> Tuple[int, ...]:
+        # Un mismo nombre puede tener varias porciones (p. ej. Granola: taza y cda)
+        return self._ids_por_nombre.get(nombre, ())
+
+    def totales(self, items: Iterable[Tuple[int, float]]) -> np.ndarray:
+        """Nutrientes de una lista (item_id, porciones) como un producto matriz-vector.
+
+        Las porciones se acumulan por alimento (ids desconocidos se ignoran) y
+        el resultado, en el orden de CLAVES, es ``porciones @ matriz`` sobre
+        los alimentos de la lista: así un NaN solo cuenta si ese alimento está.
+        """
+        porciones = np.zeros(len(self), dtype=np.float64)
+        for item_id, p in items:
+            fila = self._fila_por_id.get(item_id)
+            if fila is not None:
+                porciones[fila] += p
+        filas = np.flatnonzero(porciones)
+        return porciones[filas] @ self.matriz[filas]
+
+    def buscar_id(self, nombre: str, porcion_desc: str | None = None) -> int | None:
+        if porcion_desc is not None:
+            return self._id_por_clave.get((nombre, porcion_desc))
+        ids = self._ids_por_nombre.get(nombre, ())
+        return ids[0] if ids else None
+
+
+def _validar(i: int, it: dict) -> dict:
+    faltan = [c for c in CAMPOS if c not in it]
+    if faltan:
+        raise ValueError(f"Catálogo: el alimento #{i} no tiene {', '.join(faltan)}")
+    for c in NUMERICOS:
+        if c in it and (not isinstance(it[c], (int, float)) or isinstance(it[c], bool)):
+            raise ValueError(f"Catálogo: {c} de '{it['nombre']}' debe ser numérico")
+    return {c: it[c] for c in ("id", "nombre", "porcion_desc") + NUMERICOS if c in it}
+
+
+def _asignar_ids(items: List[dict]) -> List[dict]:
+    # Alimentos nuevos sin id reciben el siguiente libre, en orden de archivo
+    usados = set()
+    for it in items:
+        if "id" in it:
+            if it["id"] in usados:
+                raise ValueError(f"Catálogo: id {it['id']} repetido")
+            usados.add(it["id"])
+    siguiente = max(usados, default=-1) + 1
+    for it in items:
+        if "id" not in it:
+            it["id"] = siguiente
+            siguiente += 1
+    return items
+
+
+def leer_catalogo(ruta: Path) -> FoodCatalog:
+    with open(ruta, encoding="utf-8") as f:
+        crudo = json.load(f)
+    if not isinstance(crudo, list):
+        raise ValueError("Catálogo: se esperaba una lista de alimentos")
+    return FoodCatalog(_asignar_ids([_validar(i, it) for i, it in enumerate(crudo)]))
+
+
+def cargar_catalogo(ruta: Path | None = None) -> FoodCatalog:
+    ruta = Path(ruta) if ruta is not None else ruta_catalogo()
+    st_ = os.stat(ruta)
+    firma = (st_.st_mtime_ns, st_.st_size)
+    previo = _cache.get(ruta)
+    if previo is not None and previo[0] == firma:
+        return previo[1]
+    with _lock:
+        previo = _cache.get(ruta)
+        if previo is not None and previo[0] == firma:
+            return previo[1]
+        catalogo = leer_catalogo(ruta)
+        _cache[ruta] = (firma, catalogo)
+        return catalogo
+
+
+def nutrientes_visibles() -> Tuple[Nutriente, ...]:
+    """``nutrientes`` del catálogo vigente: los que muestran la app y los exports."""
+    return cargar_catalogo().nutrientes
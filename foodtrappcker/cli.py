@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""Tareas por lotes sin interfaz.
+
+    python -m foodtrappcker.cli requerimientos roster.csv -o objetivos.csv
+    python -m foodtrappcker.cli exportar USUARIO --desde 2025-01-01 --hasta 2025-12-31 -o anual.xlsx
+    python -m foodtrappcker.cli exportar USUARIO OTRO --desde 2025-01-01 --dataset parquet -o datos/
+    python -m foodtrappcker.cli importar USUARIO exports/*.xlsx exports/*.zip
+"""
+
+from __future__ import annotations
+from datetime import date
+from pathlib import Path
+from typing import TYPE_CHECKING
+import argparse
+import sys
+
+if TYPE_CHECKING:
+    from foodtrappcker.almacen import RepositorioDiario
+
+
+def _requerimientos(args) -> int:
+    from foodtrappcker import roster
+
+    df = roster.requerimientos_roster(roster.leer_roster(args.roster))
+    destino = args.salida if args.salida is not None else sys.stdout
+    df.to_csv(destino, index=False, sep=args.separador)
+    if args.salida is not None:
+        print(f"{len(df)} personas -> {args.salida}", file=sys.stderr)
+    return 0
+
+
+def _repositorio(args) -> RepositorioDiario:
+    from foodtrappcker import almacen
+
+    return almacen.RepositorioSQLite(args.db)
+
+
+def _exportar(args) -> int:
+    from foodtrappcker import exportar
+
+    repo = _repositorio(args)
+    usuarios = [(u, "") for u in args.usuarios]
+    if args.dataset:
+        from foodtrappcker import columnar
+
+        columnar.escribir_dataset(args.salida, repo, usuarios, args.desde, args.hasta, args.dataset)
+        print(f"{args.salida}/ ({args.dataset})", file=sys.stderr)
+        return 0
+    engine = None if args.zip else "auto"
+    # Directo al archivo de salida: las filas se leen y escriben por lotes
+    with open(args.salida, "wb") as destino:
+        engine = exportar.escribir_rango(destino, repo, usuarios, args.desde, args.hasta, engine)
+    print(f"{args.salida} ({engine or 'zip'})", file=sys.stderr)
+    return 0
+
+
+def _importar(args) -> int:
+    from foodtrappcker import importar
+
+    archivos = [(ruta.name, ruta.read_bytes()) for ruta in args.archivos]
+    res = importar.importar(args.usuario, archivos, _repositorio(args),
+                            reemplazar=args.reemplazar, procesos=args.procesos)
+    for error in res.errores:
+        print(f"error: {error}", file=sys.stderr)
+    print(f"{res.archivos} archivos, {len(res.fechas)} días, {res.filas} filas "
+          f"({res.sin_catalogo} sin el alimento en el catálogo)", file=sys.stderr)
+    if res.omitidos:
+        print(f"{len(res.omitidos)} días ya tenían registros y se omitieron (usa --reemplazar)", file=sys.stderr)
+    return 1 if res.errores else 0
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m foodtrappcker.cli", description=__doc__.splitlines()[0])
+    sub = ap.add_subparsers(dest="comando", required=True)
+
+    req = sub.add_parser("requerimientos", help="objetivos diarios para cada persona de un roster CSV")
+    req.add_argument("roster", type=Path, help="CSV con peso, altura, edad, genero y objetivo")
+    req.add_argument("-o", "--salida", type=Path, help="CSV de salida (por defecto, la salida estándar)")
+    req.add_argument("--separador", default=",", help="separador del CSV de salida")
+    req.set_defaults(funcion=_requerimientos)
+
+    exp = sub.add_parser("exportar", help="exportar un rango de fechas de uno o varios usuarios")
+    exp.add_argument("usuarios", nargs="+", help="ids de usuario (?u=)")
+    exp.add_argument("--desde", type=date.fromisoformat, required=True)
+    exp.add_argument("--hasta", type=date.fromisoformat, default=date.today())
+    exp.add_argument("-o", "--salida", type=Path, required=True)
+    exp.add_argument("--zip", action="store_true", help="ZIP con CSVs en lugar de Excel")
+    exp.add_argument("--dataset", choices=["parquet", "feather"],
+                     help="dataset particionado por usuario y mes (la salida es un directorio; requiere pyarrow)")
+    exp.add_argument("--db", type=Path, help="base SQLite (por defecto DIARIO_DB o data/diario.sqlite3)")
+    exp.set_defaults(funcion=_exportar)
+
+    imp = sub.add_parser("importar", help="cargar al historial exports anteriores (xlsx o zip)")
+    imp.add_argument("usuario", help="id de usuario (?u=) al que pertenecen los archivos")
+    imp.add_argument("archivos", nargs="+", type=Path)
+    imp.add_argument("--reemplazar", action="store_true", help="reemplazar los días que ya tienen registros")
+    imp.add_argument("--procesos", type=int, help="procesos de lectura (por defecto, uno por CPU)")
+    imp.add_argument("--db", type=Path, help="base SQLite (por defecto DIARIO_DB o data/diario.sqlite3)")
+    imp.set_defaults(funcion=_importar)
+
+    args = ap.parse_args(argv)
+    try:
+        return args.funcion(args)
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""Tablero del coach: cumplimiento de todos sus clientes, hoy y en la semana.
+
+Cada cliente se resume a partir de sus rollups diarios (a lo sumo 7 filas) y
+de su objetivo vigente. Los resúmenes se leen en paralelo con un pool de
+hilos (sqlite3 suelta el GIL mientras consulta; cada hilo tiene su conexión)
+y se cachean por cliente: solo se vuelven a leer los clientes que tuvieron
+escrituras desde la última vez, o cuando vence ``ttl`` (escrituras hechas por
+otros procesos).
+"""
+
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import TYPE_CHECKING, Dict, Iterable, List, Tuple
+import math
+import threading
+import time
+
+from foodtrappcker.nutricion import CON_OBJETIVO, METRICAS
+
+if TYPE_CHECKING:
+    from foodtrappcker.almacen import RepositorioDiario
+
+DIAS_SEMANA = 7
+MAX_HILOS = 8
+TTL_S = 300.0
+
+
+def desvio(total: float, objetivo: float | None, regla: str) -> float:
+    """Cuánto falta (o sobra) para cumplir, relativo al objetivo; 0 si se cumple, NaN sin objetivo."""
+    if not objetivo or objetivo <= 0:
+        return math.nan
+    if regla == "menor_mejor":
+        return max(0.0, (total - objetivo) / objetivo)
+    return max(0.0, (objetivo - total) / objetivo)
+
+
+def _media(valores: Iterable[float]) -> float:
+    v = [x for x in valores if not math.isnan(x)]
+    return sum(v) / len(v) if v else math.nan
+
+
+def desvio_dia(fila: Dict, objetivo: Dict | None = None) -> Tuple[float, bool | None]:
+    """(desvío medio de las métricas, cumple todas) de un rollup; ``objetivo`` reemplaza al del rollup."""
+    objetivo = objetivo or fila
+    desvios = [desvio(fila.get(total, 0.0), objetivo.get(obj), regla) for total, obj, regla in METRICAS.values()]
+    if all(math.isnan(d) for d in desvios):
+        return math.nan, None
+    return _media(desvios), all(d == 0 for d in desvios if not math.isnan(d))
+
+
+def resumir_cliente(usuario: str, alias: str, rollups: List[Dict], objetivo_hoy: Dict | None, hoy: date) -> Dict:
+    hoy_iso = hoy.isoformat()
+    fila_hoy = next((r for r in rollups if r["fecha"] == hoy_iso), {n.clave: 0.0 for n in CON_OBJETIVO})
+    desvio_hoy, _ = desvio_dia(fila_hoy, objetivo_hoy)
+    dias = [desvio_dia(r) for r in rollups]
+    con_objetivo = [(d, ok) for d, ok in dias if ok is not None]
+    objetivo_hoy = objetivo_hoy or {}
+    return {
+        "usuario": usuario,
+        "cliente": alias or usuario,
+        # Por métrica con objetivo: total de hoy (<clave>_hoy) y objetivo (kcal_obj, ...)
+        **{k: v for n in CON_OBJETIVO
+           for k, v in ((f"{n.clave}_hoy", fila_hoy[n.clave]), (n.objetivo, objetivo_hoy.get(n.objetivo)))},
+        "desvio_hoy": desvio_hoy,
+        "dias_registrados": len(rollups),
+        "dias_en_objetivo": sum(1 for _, ok in con_objetivo if ok),
+        "desvio_semana": _media(d for d, _ in con_objetivo),
+    }
+
+
+class TableroCoach:
+    """Un tablero por proceso (compartido entre sesiones), con caché por cliente."""
+
+    def __init__(self, repo: RepositorioDiario, max_hilos: int = MAX_HILOS, ttl: float = TTL_S):
+        self.repo = repo
+        self.ttl = ttl
+        self._pool = ThreadPoolExecutor(max_workers=max_hilos, thread_name_prefix="tablero-coach")
+        self._lock = threading.Lock()
+        # (usuario, hoy) -> (generación, instante, resumen)
+        self._cache: Dict[tuple, tuple] = {}
+
+    def _leer(self, usuario: str, hoy: date) -> tuple:
+        generacion = self.repo.generacion(usuario)
+        desde = hoy - timedelta(days=DIAS_SEMANA - 1)
+        resumen = resumir_cliente(usuario, "", self.repo.leer_rollups(usuario, desde, hoy),
+                                  self.repo.leer_objetivo(usuario, hoy), hoy)
+        return generacion, time.monotonic(), resumen
+
+    def _vigente(self, usuario: str, hoy: date, ahora: float):
+        with self._lock:
+            previo = self._cache.get((usuario, hoy))
+        if previo is None or ahora - previo[1] > self.ttl:
+            return None
+        return previo if previo[0] == self.repo.generacion(usuario) else None
+
+    def tablero(self, clientes: List[Tuple[str, str]], hoy: date | None = None,
+                orden: str = "desvio_semana") -> List[Dict]:
+        """Resumen por cliente, del más alejado de su objetivo al más cercano."""
+        hoy = hoy or date.today()
+        self.repo.vaciar()  # escritura diferida: las generaciones ya cuentan lo pendiente
+        ahora = time.monotonic()
+        datos = {u: self._vigente(u, hoy, ahora) for u, _ in clientes}
+        faltan = [u for u, d in datos.items() if d is None]
+        for u, d in zip(faltan, self._pool.map(lambda u: self._leer(u, hoy), faltan)):
+            datos[u] = d
+        with self._lock:
+            for u in faltan:
+                self._cache[(u, hoy)] = datos[u]
+        filas = [dict(datos[u][2], cliente=alias or u) for u, alias in clientes]
+        # NaN (sin datos) al final
+        return sorted(filas, key=lambda f: (math.isnan(f[orden]), -f[orden] if not math.isnan(f[orden]) else 0))
+
+    def cerrar(self):
+        self._pool.shutdown(wait=False)
@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+"""Export e import columnar (Parquet o Feather) del diario, con pyarrow opcional.
+
+Las mismas tablas que el export de Excel, pero con tipos: Diario (columnas de
+``Diario.a_dataframe``), Resumen y Perfil. Un día sale como ZIP con un archivo
+por tabla; un rango de días, como dataset particionado (hive) por usuario y mes:
+
+    diario/usuario=abc/mes=2025-01/part-0.parquet
+    resumen/usuario=abc/part-0.parquet
+    perfil/usuario=abc/part-0.parquet
+
+Feather (Arrow IPC) se escribe sin comprimir: al leerlo desde disco el archivo
+se mapea en memoria y las columnas se usan sin copiarlas. Parquet ocupa menos,
+pero hay que decodificarlo al leer.
+
+Como en el Excel, los nutrientes que no trae ningún alimento del catálogo no
+se escriben. Al leer, las tablas vuelven con el esquema completo y esas
+columnas nulas.
+"""
+
+from __future__ import annotations
+from datetime import date
+from functools import lru_cache
+from importlib.util import find_spec
+from itertools import islice
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Mapping
+from urllib.parse import unquote
+import io
+
+from foodtrappcker.almacen import LOTE_LECTURA, RepositorioDiario
+from foodtrappcker.exportar import (
+    COLUMNAS_PERFIL_RANGO, COLUMNAS_RESUMEN_RANGO, MIME_ZIP, SPOOL_MAX, ArchivoExport, claves_export,
+    construir_tablas,
+)
+from foodtrappcker.nutricion import CLAVES
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+
+FORMATOS = {"parquet": ".parquet", "feather": ".arrow"}
+PARTICIONES = {"diario": ("usuario", "mes"), "resumen": ("usuario",), "perfil": ("usuario",)}
+
+
+@lru_cache(maxsize=None)
+def disponible() -> bool:
+    # Como los engines de Excel: se comprueba sin importar pyarrow
+    return find_spec("pyarrow") is not None
+
+
+@lru_cache(maxsize=None)
+def esquema(tabla: str) -> pa.Schema:
+    """Esquema de cada tabla; "diario" es el del dataset (con fecha y particiones)."""
+    import pyarrow as pa
+
+    texto, real = pa.string(), pa.float64()
+    dia = [("hora", texto), ("nombre", texto), ("porciones", real), ("porcion_desc", texto)]
+    dia += [(c, real) for c in CLAVES]
+    if tabla == "Diario":
+        return pa.schema(dia)
+    if tabla == "diario":
+        return pa.schema([("fecha", pa.date32())] + dia + [("usuario", texto), ("mes", texto)])
+    if tabla == "resumen":
+        tipos = {"fecha": pa.date32(), "entradas": pa.int64()}
+        return pa.schema([(c, tipos.get(c, real)) for c in COLUMNAS_RESUMEN_RANGO] + [("usuario", texto)])
+    if tabla == "perfil":
+        tipos = {"Edad": pa.int64(), "Género": texto, "Objetivo": texto}
+        return pa.schema([(c, tipos.get(c, real)) for c in COLUMNAS_PERFIL_RANGO] + [("usuario", texto)])
+    raise KeyError(tabla)
+
+
+def _esquema_export(tabla: str, claves) -> pa.Schema:
+    """``esquema(tabla)`` sin los nutrientes que no se exportan."""
+    import pyarrow as pa
+
+    return pa.schema([f for f in esquema(tabla) if f.name not in CLAVES or f.name in claves])
+
+
+def _completar(tabla: pa.Table, sch: pa.Schema) -> pa.Table:
+    """``tabla`` con el esquema completo; las columnas que el export no trae quedan nulas."""
+    import pyarrow as pa
+
+    columnas = [tabla.column(f.name).cast(f.type) if f.name in tabla.column_names
+                else pa.nulls(len(tabla), f.type) for f in sch]
+    return pa.Table.from_arrays(columnas, schema=sch)
+
+
+def _validar(formato: str):
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato desconocido: {formato} (parquet o feather)")
+
+
+def _escribir_tabla(tabla: pa.Table, formato: str) -> bytes:
+    import pyarrow as pa
+
+    sink = pa.BufferOutputStream()
+    if formato == "parquet":
+        import pyarrow.parquet as pq
+        pq.write_table(tabla, sink)
+    else:
+        from pyarrow import feather
+        feather.write_feather(tabla, sink, compression="uncompressed")
+    return sink.getvalue().to_pybytes()
+
+
+def _leer_tabla(buffer, formato: str) -> pa.Table:
+    import pyarrow as pa
+
+    if formato == "parquet":
+        import pyarrow.parquet as pq
+        return pq.read_table(pa.BufferReader(buffer))
+    # IPC sin comprimir: las columnas apuntan al buffer, no se copian
+    return pa.ipc.open_file(buffer).read_all()
+
+
+def a_pandas(tabla: pa.Table) -> pd.DataFrame:
+    """DataFrame con columnas respaldadas por Arrow (sin convertir a numpy/objetos)."""
+    import pandas as pd
+
+    return tabla.to_pandas(types_mapper=pd.ArrowDtype)
+
+
+# ---- un día ----
+
+def nombre_archivo(fecha: date, formato: str) -> str:
+    return f"diario_comidas_{fecha.isoformat()}_{formato}.zip"
+
+
+def construir_export(df_diario: pd.DataFrame, totales: Mapping[str, float], requerimientos: Dict, perfil: Dict,
+                     fecha: date, formato: str = "parquet") -> ArchivoExport:
+    """Mismas tablas que ``exportar.construir_export``, un archivo columnar por tabla."""
+    import pyarrow as pa
+    import zipfile
+
+    _validar(formato)
+    claves = claves_export()
+    df_export, resumen, perfil_df = construir_tablas(df_diario, totales, requerimientos, perfil, fecha, claves)
+    tablas = {
+        "Diario": pa.Table.from_pandas(df_export, schema=_esquema_export("Diario", claves), preserve_index=False),
+        "Resumen": pa.Table.from_pandas(resumen, preserve_index=False),
+        "Perfil": pa.Table.from_pandas(perfil_df, preserve_index=False),
+    }
+    buffer = io.BytesIO()
+    # Sin comprimir el ZIP: Parquet ya está comprimido y Feather se quiere leer tal cual
+    with zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_STORED) as zf:
+        for nombre, tabla in tablas.items():
+            zf.writestr(nombre + FORMATOS[formato], _escribir_tabla(tabla, formato))
+    return ArchivoExport(data=buffer.getvalue(), file_name=nombre_archivo(fecha, formato), mime=MIME_ZIP)
+
+
+# ---- rango de días: dataset particionado ----
+
+def _lotes_diario(repo: RepositorioDiario, usuarios, desde: date, hasta: date, claves):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    sch = _esquema_export("diario", claves)
+    for u, _ in usuarios:
+        filas = repo.leer_entradas(u, desde, hasta)
+        while lote := list(islice(filas, LOTE_LECTURA)):
+            fecha, minuto, nombre, porciones, desc, *valores = zip(*lote)
+            fecha = pa.array(fecha, pa.string()).cast(pa.date32())
+            # minutos desde epoch (hora local) -> "HH:MM", sin recorrer las filas en Python
+            momento = pc.multiply(pa.array(minuto, pa.int64()), 60).cast(pa.timestamp("s"))
+            yield pa.record_batch([
+                fecha, pc.strftime(momento, format="%H:%M"), pa.array(nombre, pa.string()),
+                pa.array(porciones, pa.float64()), pa.array(desc, pa.string()),
+                *[pa.array(v, pa.float64()) for c, v in zip(CLAVES, valores) if c in claves],
+                pa.array([u] * len(lote), pa.string()), pc.strftime(fecha, format="%Y-%m"),
+            ], schema=sch)
+
+
+def _tabla_resumen(repo: RepositorioDiario, usuarios, desde: date, hasta: date, claves) -> pa.Table:
+    import pyarrow as pa
+
+    filas = [dict(r, fecha=date.fromisoformat(r["fecha"]), usuario=u)
+             for u, _ in usuarios for r in repo.leer_rollups(u, desde, hasta)]
+    return pa.Table.from_pylist(filas, schema=_esquema_export("resumen", claves))
+
+
+def _tabla_perfil(repo: RepositorioDiario, usuarios, hasta: date) -> pa.Table:
+    import pyarrow as pa
+
+    filas = []
+    for u, _ in usuarios:
+        vigente = repo.leer_perfil_vigente(u, hasta)
+        if vigente is not None:
+            perfil, req = vigente
+            valores = list(perfil.values()) + list(req.values())
+            filas.append(dict(zip(COLUMNAS_PERFIL_RANGO, valores), usuario=u))
+    return pa.Table.from_pylist(filas, schema=esquema("perfil"))
+
+
+def _escribir_dataset(datos, base: Path, tabla: str, formato: str, sch: pa.Schema):
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    particion = ds.partitioning(pa.schema([sch.field(c) for c in PARTICIONES[tabla]]), flavor="hive")
+    ds.write_dataset(
+        datos, base / tabla, schema=sch, partitioning=particion,
+        format="parquet" if formato == "parquet" else "ipc",
+        basename_template="part-{i}" + FORMATOS[formato],
+        existing_data_behavior="delete_matching",
+    )
+
+
+def escribir_dataset(directorio, repo: RepositorioDiario, usuarios, desde: date, hasta: date, formato: str = "parquet") -> Path:
+    """Escribe diario/, resumen/ y perfil/ bajo ``directorio`` (particiones hive).
+
+    Las entradas se leen de la base por lotes y se escriben a medida que llegan.
+    ``usuarios``: [(usuario, alias)], como en ``exportar.escribir_rango``.
+    """
+    _validar(formato)
+    base = Path(directorio)
+    claves = claves_export()
+    _escribir_dataset(_lotes_diario(repo, usuarios, desde, hasta, claves), base, "diario", formato,
+                      _esquema_export("diario", claves))
+    _escribir_dataset(_tabla_resumen(repo, usuarios, desde, hasta, claves), base, "resumen", formato,
+                      _esquema_export("resumen", claves))
+    _escribir_dataset(_tabla_perfil(repo, usuarios, hasta), base, "perfil", formato, esquema("perfil"))
+    return base
+
+
+def nombre_archivo_rango(desde: date, hasta: date, formato: str) -> str:
+    return f"diario_comidas_{desde.isoformat()}_{hasta.isoformat()}_{formato}.zip"
+
+
+def exportar_dataset(repo: RepositorioDiario, usuarios, desde: date, hasta: date, formato: str = "parquet") -> ArchivoExport:
+    """El dataset de un rango como ZIP (para descargar desde la app)."""
+    import zipfile
+    from tempfile import SpooledTemporaryFile, TemporaryDirectory
+
+    with TemporaryDirectory() as tmp, SpooledTemporaryFile(max_size=SPOOL_MAX) as salida:
+        base = escribir_dataset(tmp, repo, usuarios, desde, hasta, formato)
+        with zipfile.ZipFile(salida, mode="w", compression=zipfile.ZIP_STORED) as zf:
+            for ruta in sorted(base.rglob("*" + FORMATOS[formato])):
+                zf.write(ruta, ruta.relative_to(base).as_posix())
+        salida.seek(0)
+        data = salida.read()
+    return ArchivoExport(data=data, file_name=nombre_archivo_rango(desde, hasta, formato), mime=MIME_ZIP)
+
+
+# ---- import ----
+
+def _formato_de(nombre: str) -> str:
+    for formato, ext in FORMATOS.items():
+        if nombre.endswith(ext):
+            return formato
+    raise ValueError(f"Export: {nombre} no es Parquet ni Feather")
+
+
+def _filtro(usuario: str | None, desde: date | None, hasta: date | None):
+    import pyarrow.dataset as ds
+
+    condiciones = []
+    if usuario is not None:
+        condiciones.append(ds.field("usuario") == usuario)
+    if desde is not None:
+        condiciones.append(ds.field("fecha") >= desde)
+    if hasta is not None:
+        condiciones.append(ds.field("fecha") <= hasta)
+    filtro = None
+    for c in condiciones:
+        filtro = c if filtro is None else filtro & c
+    return filtro
+
+
+def leer_dataset(directorio, usuario: str | None = None, desde: date | None = None,
+                 hasta: date | None = None) -> Dict[str, pa.Table]:
+    """Tablas {"diario", "resumen", "perfil"} de un dataset escrito por ``escribir_dataset``.
+
+    Los filtros por usuario se resuelven con las particiones (no se abren los
+    demás archivos). Los Feather se leen mapeados en memoria, sin copia.
+    """
+    import pyarrow.dataset as ds
+    from pyarrow import fs
+
+    base = Path(directorio)
+    archivos = sorted(p for p in base.rglob("part-*") if p.is_file())
+    if not archivos:
+        raise ValueError(f"Export: {base} no contiene un dataset")
+    formato = _formato_de(archivos[0].name)
+    local = fs.LocalFileSystem(use_mmap=True)
+    tablas = {}
+    for tabla in PARTICIONES:
+        if not (base / tabla).is_dir():  # p. ej. nadie tenía perfil guardado
+            tablas[tabla] = esquema(tabla).empty_table()
+            continue
+        dataset = ds.dataset(str(base / tabla), schema=esquema(tabla), filesystem=local,
+                             format="parquet" if formato == "parquet" else "ipc", partitioning="hive")
+        con_fecha = "fecha" in esquema(tabla).names
+        tablas[tabla] = dataset.to_table(filter=_filtro(usuario, desde if con_fecha else None,
+                                                        hasta if con_fecha else None))
+    return tablas
+
+
+def _claves_particion(nombre: str, ruta: list) -> Dict[str, str]:
+    """Claves usuario= / mes= de la ruta de una parte; ValueError si la ruta no es de un export."""
+    if ruta[0] not in PARTICIONES:
+        raise ValueError(f"Export: {nombre} no es de una tabla conocida ({', '.join(PARTICIONES)})")
+    claves = dict(unquote(p).partition("=")[::2] for p in ruta[1:-1])
+    faltan = [c for c in PARTICIONES[ruta[0]] if not claves.get(c)]
+    if faltan:
+        raise ValueError(f"Export: {nombre} no está en una carpeta {'/'.join(c + '=' for c in faltan)}")
+    return claves
+
+
+def leer_export(fuente) -> Dict[str, pa.Table]:
+    """Tablas de un ZIP exportado por la app (un día o un rango), desde ruta, bytes o archivo.
+
+    Un día devuelve {"Diario", "Resumen", "Perfil"}; un rango, {"diario",
+    "resumen", "perfil"} con las columnas de partición como en ``leer_dataset``.
+    """
+    import pyarrow as pa
+    import zipfile
+
+    if isinstance(fuente, (bytes, bytearray)):
+        fuente = io.BytesIO(fuente)
+    partes: Dict[str, list] = {}
+    try:
+        zf = zipfile.ZipFile(fuente)
+    except zipfile.BadZipFile:
+        raise ValueError("Export: el archivo no es un ZIP") from None
+    with zf:
+        for info in zf.infolist():
+            if info.is_dir():
+                continue
+            formato = _formato_de(info.filename)
+            ruta = info.filename.split("/")
+            tabla = _leer_tabla(pa.py_buffer(zf.read(info)), formato)
+            if len(ruta) > 1:
+                # diario/usuario=abc/mes=2025-01/part-0.parquet: claves de partición desde la ruta
+                claves = _claves_particion(info.filename, ruta)
+                for columna in PARTICIONES[ruta[0]]:
+                    tabla = tabla.append_column(columna, pa.array([claves[columna]] * len(tabla), pa.string()))
+                tabla = _completar(tabla, esquema(ruta[0]))
+            elif ruta[0].rsplit(".", 1)[0] == "Diario":
+                tabla = _completar(tabla, esquema("Diario"))
+            partes.setdefault(ruta[0] if len(ruta) > 1 else ruta[0].rsplit(".", 1)[0], []).append(tabla)
+    if not partes:
+        raise ValueError("Export: el ZIP no contiene tablas")
+    if set(partes) & set(PARTICIONES):
+        for tabla in PARTICIONES:
+            partes.setdefault(tabla, [esquema(tabla).empty_table()])
+    return {nombre: pa.concat_tables(ts) for nombre, ts in partes.items()}
@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+"""Diario del día guardado en columnas (struct-of-arrays).
+
+Cada columna numérica es un ``array`` de tipo fijo (8 bytes por fila). Los
+nutrientes van juntos en un solo ``array`` (fila × nutriente, en el orden de
+``nutricion.NUTRIENTES``) que se ve como matriz: los totales son un vector
+y agregar un nutriente no agrega código por columna. Un nutriente que el
+alimento no trae es NaN en la fila (None en el registro que se persiste), y
+el total del día de ese nutriente es NaN mientras alguna fila no lo tenga. Los textos (nombre y
+porción) no se repiten por fila: se guardan una vez en una tabla de
+referencias y cada fila apunta a ella. La hora se guarda como minutos desde
+epoch (hora local) en lugar de un string "%H:%M".
+
+``version`` cambia en cada cambio; las vistas derivadas (tabla, export, ratio
+kcal/g proteína) se calculan una vez por versión y se reutilizan. El contador
+es único en el proceso (no por diario), así un diario recargado nunca repite
+la versión del que reemplaza y las claves que dependen de ella (caché del
+export, estado del editor) no se confunden.
+"""
+
+from __future__ import annotations
+from array import array
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, Iterable, List, Mapping, Sequence, Tuple
+import itertools
+import os
+import threading
+import time
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+from foodtrappcker.nutricion import CLAVES, I_HIDR, escalar_fila, valores_fila
+
+HORA_FMT = "%H:%M"
+COLUMNAS = ["hora", "nombre", "porciones", "porcion_desc", *CLAVES]
+NUMERICAS = ("porciones",) + CLAVES
+K = len(CLAVES)
+
+ID_AGUA = -1  # registros rápidos de agua (no vienen del catálogo)
+ID_SIN_CATALOGO = -2  # filas importadas cuyo alimento ya no está en el catálogo
+NOMBRE_AGUA = "Agua (ml)"
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def a_minuto(dt: datetime) -> int:
+    delta = dt.replace(tzinfo=None) - _EPOCH
+    return delta.days * 1440 + delta.seconds // 60
+
+
+def minuto_actual() -> int:
+    return a_minuto(datetime.now())
+
+
+_id_lock = threading.Lock()
+_id_ultimo = 0
+
+
+def nuevo_id() -> int:
+    """Id estable de una entrada: ms desde epoch (42 bits) + pid (10) + secuencia (10).
+
+    Se genera en la app (no en la base) para poder persistir en segundo plano
+    y borrar por id sin esperar a la inserción.
+    """
+    global _id_ultimo
+    with _id_lock:
+        candidato = (int(time.time() * 1000) << 20) | ((os.getpid() & 0x3FF) << 10)
+        if candidato <= _id_ultimo:
+            candidato = _id_ultimo + 1
+        _id_ultimo = candidato
+        return candidato
+
+
+# Versiones de todos los diarios del proceso (next() sobre count es atómico)
+_versiones = itertools.count(1)
+
+
+def _valores_registro(r: Mapping) -> List[float]:
+    # Sin dato (None, o un nutriente que no existía al guardar el registro): NaN
+    return [np.nan if r.get(c) is None else r[c] for c in CLAVES]
+
+
+def _np(arr: array, dtype) -> np.ndarray:
+    # Copia (memcpy) para no dejar el array bloqueado por una vista de buffer
+    return np.frombuffer(arr, dtype=dtype).copy() if len(arr) else np.empty(0, dtype=dtype)
+
+
+class Diario:
+    def __init__(self):
+        self.ids = array("q")
+        self.minuto = array("q")
+        self.ref = array("q")
+        self.porciones = array("d")
+        self.valores = array("d")  # K nutrientes por fila
+        # Alimentos internados: ref -> (item_id, nombre, porcion_desc)
+        self._refs: List[Tuple[int, str, str]] = []
+        self._ref_por_clave: Dict[Tuple[int, str, str], int] = {}
+        # Totales acumulados (vector por nutriente): se actualizan en cada cambio.
+        # _suma tiene los valores conocidos y _faltan cuántas filas no traen cada nutriente.
+        self._suma = np.zeros(K)
+        self._faltan = np.zeros(K, dtype=np.int64)
+        self.version = next(_versiones)
+        self._vistas: Dict[str, pd.DataFrame] = {}
+        self._vistas_version = -1
+
+    def __len__(self) -> int:
+        return len(self.minuto)
+
+    def _internar(self, item_id: int, nombre: str, porcion_desc: str) -> int:
+        clave = (item_id, nombre, porcion_desc)
+        ref = self._ref_por_clave.get(clave)
+        if ref is None:
+            ref = len(self._refs)
+            self._refs.append(clave)
+            self._ref_por_clave[clave] = ref
+        return ref
+
+    def _modificado(self):
+        self.version = next(_versiones)
+
+    def _memo(self, nombre: str, construir) -> pd.DataFrame:
+        if self._vistas_version != self.version:
+            self._vistas = {}
+            self._vistas_version = self.version
+        vista = self._vistas.get(nombre)
+        if vista is None:
+            vista = self._vistas[nombre] = construir()
+        return vista
+
+    def _acumular(self, valores, signo: int = 1):
+        """Suma (o resta, con ``signo`` -1) una o varias filas de valores a los totales."""
+        v = np.asarray(valores, dtype=np.float64).reshape(-1, K)
+        sin_dato = np.isnan(v)
+        self._suma += signo * np.where(sin_dato, 0.0, v).sum(axis=0)
+        self._faltan += signo * sin_dato.sum(axis=0)
+
+    @property
+    def totales(self) -> Dict[str, float]:
+        """Total del día por nutriente (clave -> valor; NaN si alguna fila no trae el dato)."""
+        return dict(zip(CLAVES, np.where(self._faltan > 0, np.nan, self._suma).tolist()))
+
+    def matriz(self) -> np.ndarray:
+        """Nutrientes de todas las filas (filas × K), como copia."""
+        return _np(self.valores, np.float64).reshape(len(self), K)
+
+    def _columnas(self):
+        return (self.ids, self.minuto, self.ref, self.porciones)
+
+    def agregar(self, item_id: int, nombre: str, porcion_desc: str, porciones: float,
+                valores: Sequence[float], minuto: int | None = None, id: int | None = None) -> int:
+        """Agrega una fila (``valores`` en el orden de CLAVES) y devuelve su id estable."""
+        id = nuevo_id() if id is None else id
+        self.ids.append(id)
+        self.minuto.append(minuto_actual() if minuto is None else minuto)
+        self.ref.append(self._internar(item_id, nombre, porcion_desc))
+        self.porciones.append(porciones)
+        self.valores.extend(valores)
+        self._acumular(valores)
+        self._modificado()
+        return id
+
+    def agregar_fila(self, nombre: str, porciones: float, item: Mapping | None,
+                     hidr_ml_override: float | None = None) -> int:
+        """Agrega un alimento del catálogo (o agua si ``item`` es None) calculando sus valores."""
+        valores = valores_fila(porciones, item, hidr_ml_override)
+        return self.agregar(
+            item_id=(item["id"] if item else ID_AGUA),
+            nombre=nombre,
+            porcion_desc=(item["porcion_desc"] if item else f"{int(valores[I_HIDR])} ml"),
+            porciones=porciones,
+            valores=valores,
+        )
+
+    def registro(self, i: int) -> Dict:
+        """Fila i como dict (para persistir); un nutriente sin dato va como None."""
+        item_id, nombre, porcion_desc = self._refs[self.ref[i]]
+        r = {
+            "id": self.ids[i],
+            "minuto": self.minuto[i],
+            "item_id": item_id,
+            "nombre": nombre,
+            "porcion_desc": porcion_desc,
+            "porciones": self.porciones[i],
+        }
+        r.update((c, None if np.isnan(v) else v) for c, v in zip(CLAVES, self.valores[i * K:(i + 1) * K]))
+        return r
+
+    def registros(self) -> List[Dict]:
+        return [self.registro(i) for i in range(len(self))]
+
+    def agregar_registro(self, r: Mapping) -> int:
+        return self.agregar(
+            r["item_id"], r["nombre"], r["porcion_desc"], r["porciones"],
+            _valores_registro(r), minuto=r["minuto"], id=r["id"],
+        )
+
+    @classmethod
+    def desde_registros(cls, registros: Iterable[Dict]) -> "Diario":
+        diario = cls()
+        for r in registros:
+            diario.agregar_registro(r)
+        return diario
+
+    def reemplazar(self, r: Mapping) -> None:
+        """Deja la fila con el id de ``r`` igual a ``r`` (la agrega si no está)."""
+        pos = self.posiciones([r["id"]])
+        if pos.size == 0:
+            self.agregar_registro(r)
+            return
+        i = int(pos[0])
+        self.minuto[i] = r["minuto"]
+        self.ref[i] = self._internar(r["item_id"], r["nombre"], r["porcion_desc"])
+        self.porciones[i] = r["porciones"]
+        self._poner_valores(i, _valores_registro(r))
+        self._modificado()
+
+    def _poner_valores(self, i: int, valores: Sequence[float]):
+        tramo = slice(i * K, (i + 1) * K)
+        self._acumular(self.valores[tramo], -1)
+        self._acumular(valores)
+        self.valores[tramo] = array("d", valores)
+
+    def posiciones(self, ids: Iterable[int]) -> np.ndarray:
+        """Posiciones actuales de las filas con esos ids (los que no existen se ignoran)."""
+        buscados = np.fromiter(ids, dtype=np.int64)
+        return np.flatnonzero(np.isin(_np(self.ids, np.int64), buscados))
+
+    def eliminar_ids(self, ids: Iterable[int]) -> List[int]:
+        """Elimina por id (no depende del orden de la tabla) y devuelve los ids eliminados."""
+        return self.eliminar(self.posiciones(ids).tolist())
+
+    def actualizar_porciones(self, id: int, porciones: float, cat=None) -> Dict | None:
+        """Cambia las porciones de una fila y recalcula sus valores; devuelve el registro.
+
+        Si el alimento está en ``cat`` (el catálogo) los valores salen de él,
+        como al agregarlo. Si no (agua, alimentos que ya no están en el
+        catálogo) se escalan los de la fila. None si el id no existe.
+        """
+        pos = self.posiciones([id])
+        if pos.size == 0:
+            return None
+        i = int(pos[0])
+        item_id = self._refs[self.ref[i]][0]
+        item = cat.item(item_id) if cat is not None and item_id in cat else None
+        if item is not None:
+            valores = valores_fila(porciones, item)
+        else:
+            factor = porciones / self.porciones[i] if self.porciones[i] else 0.0
+            valores = escalar_fila(self.valores[i * K:(i + 1) * K], factor)
+        self._poner_valores(i, valores)
+        self.porciones[i] = porciones
+        self._modificado()
+        return self.registro(i)
+
+    def eliminar(self, indices: Iterable[int]) -> List[int]:
+        """Elimina las filas en esas posiciones y devuelve sus ids."""
+        n = len(self)
+        quitar = np.array([i for i in set(indices) if 0 <= i < n], dtype=np.int64)
+        if quitar.size == 0:
+            return []
+        ids = _np(self.ids, np.int64)[quitar].tolist()
+        matriz = np.frombuffer(self.valores, dtype=np.float64).reshape(n, K)
+        self._acumular(matriz[quitar], -1)
+        # Un solo filtrado por columna en lugar de pop() fila a fila
+        mantener = np.ones(n, dtype=bool)
+        mantener[quitar] = False
+        datos_valores = matriz[mantener].tobytes()
+        del matriz
+        del self.valores[:]
+        self.valores.frombytes(datos_valores)
+        for col in self._columnas():
+            datos = np.frombuffer(col, dtype=np.int64 if col.typecode == "q" else np.float64)[mantener].tobytes()
+            del col[:]
+            col.frombytes(datos)
+        self._modificado()
+        return ids
+
+    def vaciar(self):
+        for col in (*self._columnas(), self.valores):
+            del col[:]
+        self._suma = np.zeros(K)
+        self._faltan = np.zeros(K, dtype=np.int64)
+        self._modificado()
+
+    def recalcular_totales(self) -> Dict[str, float]:
+        # Vector de unos por la matriz filas × nutrientes
+        return dict(zip(CLAVES, (np.ones(len(self)) @ self.matriz()).tolist()))
+
+    def a_dataframe(self) -> pd.DataFrame:
+        """Tabla del día con las columnas de siempre, indexada por id (memoizada por versión).
+
+        Se comparte entre llamadas: no modificarla en sitio.
+        """
+        return self._memo("diario", self._construir_dataframe)
+
+    def vista_tabla(self) -> pd.DataFrame:
+        """Tabla para el editor: columna "Seleccionar" + ratio kcal/g proteína."""
+        return self._memo("tabla", self._construir_tabla)
+
+    def _construir_tabla(self) -> pd.DataFrame:
+        df = self.a_dataframe()
+        kcal = df["kcal"].to_numpy(dtype=np.float64)
+        prot = df["proteina_g"].to_numpy(dtype=np.float64)
+        ratio = np.full(len(df), np.nan)
+        np.divide(kcal, prot, out=ratio, where=prot > 0)
+        tabla = df.assign(kcal_por_g_prot=np.round(ratio, 2))  # NaN si prot <= 0
+        tabla.insert(0, "Seleccionar", False)
+        return tabla
+
+    def _construir_dataframe(self) -> pd.DataFrame:
+        import pandas as pd  # solo al mostrar o exportar la tabla
+        if not len(self):
+            return pd.DataFrame(columns=COLUMNAS, index=pd.Index([], dtype="int64", name="id"))
+        refs = _np(self.ref, np.int64)
+        nombres = np.array([r[1] for r in self._refs], dtype=object)
+        porciones_desc = np.array([r[2] for r in self._refs], dtype=object)
+        hora = pd.to_datetime(_np(self.minuto, np.int64), unit="m").strftime(HORA_FMT)
+        matriz = self.matriz()
+        return pd.DataFrame({
+            "hora": np.asarray(hora, dtype=object),
+            "nombre": nombres[refs],
+            "porciones": _np(self.porciones, np.float64),
+            "porcion_desc": porciones_desc[refs],
+            **{c: matriz[:, k] for k, c in enumerate(CLAVES)},
+        }, columns=COLUMNAS, index=pd.Index(_np(self.ids, np.int64), name="id"))
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""Cambios del diario como registro de eventos, con deshacer / rehacer.
+
+Cada cambio (agregar, eliminar, editar porciones, vaciar, reemplazar el día)
+es un evento que se agrega a una tabla y nunca se modifica. El evento lleva
+las filas completas que toca, así tiene un inverso exacto: deshacer es
+registrar el inverso del último cambio, y rehacer, el inverso de ese
+deshacer. Como nada se borra, el registro sirve también de auditoría.
+
+El estado de un día es el pliegue de su último snapshot más los eventos que
+vinieron después. Cada ``SNAPSHOT_CADA`` eventos se guarda un snapshot, así
+reconstruir cualquier punto del día cuesta a lo sumo ese número de eventos.
+La tabla ``entradas`` sigue siendo la proyección del estado actual (la que
+leen el día, el historial y los exports).
+"""
+
+from __future__ import annotations
+from typing import Dict, Iterable, List
+import time
+
+from foodtrappcker.diario import Diario, nuevo_id
+
+TIPOS = ("agregar", "eliminar", "editar", "vaciar", "reemplazar")
+ACCIONES = {
+    "agregar": "Agregar",
+    "eliminar": "Eliminar",
+    "editar": "Editar porciones",
+    "vaciar": "Vaciar diario",
+    "reemplazar": "Reemplazar el día",
+}
+SNAPSHOT_CADA = 50
+MAX_DESHACER = 50
+VENTANA_HISTORIAL = 200  # eventos que se leen al abrir un día para rearmar las pilas
+
+
+def evento(tipo: str, datos: Dict, origen: str = "", ref: int | None = None) -> Dict:
+    """Evento nuevo. ``origen`` es "deshacer" / "rehacer" y ``ref`` el id del evento que revierte."""
+    if tipo not in TIPOS:
+        raise ValueError(f"Tipo de evento desconocido: {tipo!r}")
+    return {"id": nuevo_id(), "instante": time.time(), "tipo": tipo, "datos": datos, "origen": origen, "ref": ref}
+
+
+def agregar(registros: Iterable[Dict]) -> Dict:
+    return evento("agregar", {"registros": list(registros)})
+
+
+def eliminar(registros: Iterable[Dict]) -> Dict:
+    """Las filas completas (no solo sus ids), para poder restaurarlas."""
+    return evento("eliminar", {"registros": list(registros)})
+
+
+def editar(antes: Iterable[Dict], despues: Iterable[Dict]) -> Dict:
+    return evento("editar", {"antes": list(antes), "despues": list(despues)})
+
+
+def vaciar(registros: Iterable[Dict]) -> Dict:
+    return evento("vaciar", {"registros": list(registros)})
+
+
+def reemplazar(antes: Iterable[Dict], despues: Iterable[Dict]) -> Dict:
+    return evento("reemplazar", {"antes": list(antes), "despues": list(despues)})
+
+
+def _invertir(ev: Dict) -> tuple:
+    tipo, datos = ev["tipo"], ev["datos"]
+    if tipo == "agregar":
+        return "eliminar", {"registros": datos["registros"]}
+    if tipo in ("eliminar", "vaciar"):
+        return "agregar", {"registros": datos["registros"]}
+    return tipo, {"antes": datos["despues"], "despues": datos["antes"]}
+
+
+def inverso(ev: Dict, origen: str) -> Dict:
+    """Evento que deja el día como estaba antes de ``ev``."""
+    tipo, datos = _invertir(ev)
+    return evento(tipo, datos, origen, ev["id"])
+
+
+def registros_afectados(ev: Dict) -> List[Dict]:
+    datos = ev["datos"]
+    return datos["despues"] if ev["tipo"] in ("editar", "reemplazar") else datos["registros"]
+
+
+def describir(ev: Dict) -> str:
+    """Texto corto para la auditoría y los botones de deshacer / rehacer."""
+    filas = registros_afectados(ev)
+    if ev["tipo"] == "editar":
+        antes = {r["id"]: r["porciones"] for r in ev["datos"]["antes"]}
+        detalle = ", ".join(f"{r['nombre']} {antes.get(r['id'], 0):g} → {r['porciones']:g}" for r in filas[:3])
+    else:
+        detalle = ", ".join(r["nombre"] for r in filas[:3])
+    if len(filas) > 3:
+        detalle += f" y {len(filas) - 3} más"
+    texto = ACCIONES[ev["tipo"]]
+    return f"{texto}: {detalle}" if detalle else texto
+
+
+# =========================
+# Pliegue (estado = snapshot + eventos)
+# =========================
+def aplicar(estado: Dict[int, Dict], ev: Dict) -> None:
+    """Aplica un evento a ``estado`` (id -> registro), en sitio."""
+    tipo, datos = ev["tipo"], ev["datos"]
+    if tipo in ("vaciar", "reemplazar"):
+        estado.clear()
+    if tipo == "eliminar":
+        for r in datos["registros"]:
+            estado.pop(r["id"], None)
+    elif tipo != "vaciar":
+        # agregar / editar / reemplazar: la fila con ese id queda como indica el evento
+        for r in registros_afectados(ev):
+            estado[r["id"]] = r
+
+
+def plegar(snapshot: Iterable[Dict], eventos: Iterable[Dict]) -> List[Dict]:
+    """Registros del día tras aplicar ``eventos`` (en orden) sobre ``snapshot``, como los da cargar_dia."""
+    estado = {r["id"]: r for r in snapshot}
+    for ev in eventos:
+        aplicar(estado, ev)
+    return sorted(estado.values(), key=lambda r: (r["minuto"], r["id"]))
+
+
+def aplicar_a_diario(diario: Diario, ev: Dict) -> None:
+    """Mismo efecto que ``aplicar`` sobre el diario en memoria de la sesión."""
+    tipo, datos = ev["tipo"], ev["datos"]
+    if tipo in ("vaciar", "reemplazar"):
+        diario.vaciar()
+    if tipo == "eliminar":
+        diario.eliminar_ids(r["id"] for r in datos["registros"])
+    elif tipo != "vaciar":
+        for r in registros_afectados(ev):
+            diario.reemplazar(r)
+
+
+# =========================
+# Deshacer / rehacer
+# =========================
+class Historial:
+    """Pilas de deshacer / rehacer de un día, rearmadas desde sus últimos eventos.
+
+    La pila de deshacer guarda los eventos cuyo inverso se puede registrar; la
+    de rehacer, los "deshacer" todavía no revertidos. Un cambio nuevo vacía la
+    de rehacer.
+    """
+
+    def __init__(self, eventos: Iterable[Dict] = ()):
+        self.deshacer: List[Dict] = []
+        self.rehacer: List[Dict] = []
+        for ev in eventos:
+            self.registrar(ev)
+
+    def registrar(self, ev: Dict) -> None:
+        if ev["origen"] == "deshacer":
+            if self.deshacer and self.deshacer[-1]["id"] == ev["ref"]:
+                self.deshacer.pop()
+            self.rehacer.append(ev)
+        elif ev["origen"] == "rehacer":
+            if self.rehacer and self.rehacer[-1]["id"] == ev["ref"]:
+                self.rehacer.pop()
+            self.deshacer.append(ev)
+        else:
+            self.deshacer.append(ev)
+            self.rehacer.clear()
+        del self.deshacer[:-MAX_DESHACER]
+
+    def descripcion(self, rehacer: bool = False) -> str | None:
+        """Qué cambio se desharía (o rehará), sin crear el evento."""
+        if rehacer:
+            if not self.rehacer:
+                return None
+            tipo, datos = _invertir(self.rehacer[-1])
+            return describir({"tipo": tipo, "datos": datos})
+        return describir(self.deshacer[-1]) if self.deshacer else None
+
+    def siguiente_deshacer(self) -> Dict | None:
+        return inverso(self.deshacer[-1], "deshacer") if self.deshacer else None
+
+    def siguiente_rehacer(self) -> Dict | None:
+        return inverso(self.rehacer[-1], "rehacer") if self.rehacer else None
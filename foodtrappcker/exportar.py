@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+"""Exportación del diario (Excel o ZIP con CSVs).
+
+pandas, el engine de Excel y zipfile se importan al exportar, no al cargar
+el módulo: el primer render de la app no paga por ellos.
+
+Solo se exportan los nutrientes que trae algún alimento del catálogo
+(``claves_export``); los demás serían columnas siempre vacías.
+"""
+
+from __future__ import annotations
+from dataclasses import dataclass
+from datetime import date
+from functools import lru_cache
+from importlib.util import find_spec
+from typing import TYPE_CHECKING, Dict, Iterable, List, Mapping, Sequence
+import io
+import math
+
+from foodtrappcker.nutricion import CLAVES, NUTRIENTES
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+    from foodtrappcker.almacen import RepositorioDiario
+
+COLUMNAS_DIARIO = ["hora", "nombre", "porciones", "porcion_desc", *CLAVES]
+
+MIME_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+MIME_ZIP = "application/zip"
+
+
+@dataclass(frozen=True)
+class ArchivoExport:
+    data: bytes
+    file_name: str
+    mime: str
+
+
+@lru_cache(maxsize=None)
+def detectar_engine() -> str | None:
+    # Engine disponible para Excel. Se comprueba una vez por proceso y sin
+    # importarlo: pandas lo importa al escribir el libro.
+    for engine in ("xlsxwriter", "openpyxl"):
+        if find_spec(engine) is not None:
+            return engine
+    return None
+
+
+def claves_export() -> List[str]:
+    """Nutrientes que se exportan: los que muestra la app (``catalogo.nutrientes_visibles``)."""
+    from foodtrappcker import catalogo
+
+    try:
+        return [n.clave for n in catalogo.nutrientes_visibles()]
+    except (OSError, ValueError):
+        return list(CLAVES)  # sin un catálogo legible (p. ej. la CLI en otra máquina): todos
+
+
+def columnas_export(columnas: Iterable[str], claves: Sequence[str]) -> List[str]:
+    """``columnas`` sin los nutrientes que no están en ``claves``."""
+    return [c for c in columnas if c not in CLAVES or c in claves]
+
+
+def nombre_archivo(fecha: date, engine: str | None) -> str:
+    ext = "xlsx" if engine else "zip"
+    return f"diario_comidas_{fecha.isoformat()}.{ext}"
+
+
+def mime_archivo(engine: str | None) -> str:
+    return MIME_XLSX if engine else MIME_ZIP
+
+
+def construir_tablas(df_diario: pd.DataFrame, totales: Mapping[str, float], requerimientos: Dict,
+                     perfil: Dict, fecha: date, claves: Sequence[str] | None = None):
+    """Tablas Diario, Resumen (una fila por nutriente) y Perfil; ``totales`` es clave -> total.
+
+    Un nutriente sin dato (NaN, en una fila o en el total) queda como celda
+    vacía. ``claves``: nutrientes a exportar (por defecto, ``claves_export()``).
+    """
+    import pandas as pd
+    claves = claves_export() if claves is None else claves
+    nutrientes = [n for n in NUTRIENTES if n.clave in claves]
+    df_export = df_diario[columnas_export(COLUMNAS_DIARIO, claves)]
+    resumen = pd.DataFrame({
+        "Métrica": [n.etiqueta for n in nutrientes],
+        "Total del día": [round(totales.get(n.clave, math.nan), n.decimales_total) for n in nutrientes],
+        # Sin objetivo (nutrientes que no tienen requerimiento): celda vacía
+        "Objetivo": [round(requerimientos[n.objetivo], n.decimales_total) if n.objetivo else None
+                     for n in nutrientes],
+    })
+    perfil_df = pd.DataFrame([{
+        "Peso (kg)": perfil["peso_kg"],
+        "Altura (cm)": perfil["altura_cm"],
+        "Edad": perfil["edad"],
+        "Género": perfil["genero"],
+        "Objetivo": perfil["objetivo"],
+        "Fecha": fecha.strftime("%Y-%m-%d"),
+    }])
+    return df_export, resumen, perfil_df
+
+
+def _excel(df_export: pd.DataFrame, resumen: pd.DataFrame, perfil: pd.DataFrame, engine: str) -> bytes:
+    import pandas as pd
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine=engine) as writer:
+        df_export.to_excel(writer, index=False, sheet_name="Diario")
+        resumen.to_excel(writer, index=False, sheet_name="Resumen")
+
+        ws = writer.sheets["Resumen"]
+        start_row = len(resumen) + 2
+
+        # Bloque de perfil debajo del resumen: una fila por llamada, sin iloc celda a celda
+        filas = [list(perfil.columns)] + [list(f) for f in perfil.itertuples(index=False)]
+        if engine == "xlsxwriter":
+            for i, fila in enumerate(filas):
+                ws.write_row(start_row + i, 0, fila)
+        else:
+            ws.append([])  # la fila en blanco entre el resumen y el perfil
+            for fila in filas:
+                ws.append(fila)
+    return buffer.getvalue()
+
+
+def _zip_csv(df_export: pd.DataFrame, resumen: pd.DataFrame, perfil: pd.DataFrame) -> bytes:
+    # Fallback: ZIP con CSVs si no hay engines de Excel
+    import zipfile
+    zip_buffer = io.BytesIO()
+    with zipfile.ZipFile(zip_buffer, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("Diario.csv", df_export.to_csv(index=False))
+        zf.writestr("Resumen.csv", resumen.to_csv(index=False))
+        zf.writestr("Perfil.csv", perfil.to_csv(index=False))
+    return zip_buffer.getvalue()
+
+
+def construir_archivo(df_export: pd.DataFrame, resumen: pd.DataFrame, perfil: pd.DataFrame,
+                      fecha: date, engine: str | None) -> ArchivoExport:
+    if engine:
+        data = _excel(df_export, resumen, perfil, engine)
+    else:
+        data = _zip_csv(df_export, resumen, perfil)
+    return ArchivoExport(data=data, file_name=nombre_archivo(fecha, engine), mime=mime_archivo(engine))
+
+
+def construir_export(df_diario: pd.DataFrame, totales: Mapping[str, float], requerimientos: Dict, perfil: Dict,
+                     fecha: date, engine: str | None) -> ArchivoExport:
+    df_export, resumen, perfil_df = construir_tablas(df_diario, totales, requerimientos, perfil, fecha)
+    return construir_archivo(df_export, resumen, perfil_df, fecha, engine)
+
+
+def exportar_diario(diario, requerimientos: Dict, perfil: Dict, fecha: date,
+                    engine: str | None = "auto") -> ArchivoExport:
+    """Export de un ``Diario`` completo, para uso fuera de la interfaz.
+
+    ``engine="auto"`` usa el engine de Excel disponible (o ZIP si no hay).
+    """
+    if engine == "auto":
+        engine = detectar_engine()
+    return construir_export(diario.a_dataframe(), diario.totales, requerimientos, perfil, fecha, engine)
+
+
+class ExportCache:
+    """Guarda los bytes del último export por clave (versión del diario + perfil).
+
+    Se construye solo cuando el usuario pulsa descargar; clics repetidos sin
+    cambios en el diario devuelven los mismos bytes sin rehacer el libro.
+    """
+
+    def __init__(self):
+        self.clave = None
+        self.archivo: ArchivoExport | None = None
+
+    def obtener(self, clave, construir) -> ArchivoExport:
+        if self.archivo is None or self.clave != clave:
+            self.archivo = construir()
+            self.clave = clave
+        return self.archivo
+
+
+# ---- export de varios días (streaming) ----
+# Las filas salen de la base por lotes y se escriben a medida que llegan a un
+# archivo temporal (en memoria mientras es chico, en disco después). El libro
+# nunca existe completo como DataFrame: la memoria no crece con las filas.
+
+COLUMNAS_RANGO = ["fecha", "hora", "nombre", "porciones", "porcion_desc", *CLAVES]
+COLUMNAS_RESUMEN_RANGO = ["fecha", *CLAVES, "entradas", "kcal_obj", "prot_obj", "agua_obj"]
+COLUMNAS_PERFIL_RANGO = ["Peso (kg)", "Altura (cm)", "Edad", "Género", "Objetivo",
+                         "kcal_obj", "prot_obj", "agua_obj"]
+LOTE_CSV = 5000
+SPOOL_MAX = 8 * 1024 * 1024  # hasta 8 MB en memoria; más grande pasa a disco
+
+
+def _hora(minuto: int) -> str:
+    # minutos desde epoch (hora local) -> "HH:MM"
+    h, m = divmod(minuto % 1440, 60)
+    return f"{h:02d}:{m:02d}"
+
+
+def _hojas_rango(repo: RepositorioDiario, usuarios, desde: date, hasta: date):
+    """[(nombre, encabezado, filas)] con las filas como generadores.
+
+    ``usuarios``: [(usuario, alias)]. Con más de uno se agrega la columna "cliente".
+    """
+    varios = len(usuarios) > 1
+    prefijo = ["cliente"] if varios else []
+    claves = claves_export()
+    columnas = columnas_export(COLUMNAS_RANGO, claves)
+    columnas_resumen = columnas_export(COLUMNAS_RESUMEN_RANGO, claves)
+    # Posiciones de las columnas exportadas en cada fila de leer_entradas (mismo orden que COLUMNAS_RANGO)
+    posiciones = None if len(columnas) == len(COLUMNAS_RANGO) else [COLUMNAS_RANGO.index(c) for c in columnas]
+
+    def entradas():
+        for u, alias in usuarios:
+            pre = [alias or u] if varios else []
+            for fecha, minuto, *resto in repo.leer_entradas(u, desde, hasta):
+                fila = [fecha, _hora(minuto), *resto]
+                yield pre + (fila if posiciones is None else [fila[i] for i in posiciones])
+
+    def resumen():
+        for u, alias in usuarios:
+            pre = [alias or u] if varios else []
+            for r in repo.leer_rollups(u, desde, hasta):
+                yield pre + [r[c] for c in columnas_resumen]
+
+    def perfiles():
+        for u, alias in usuarios:
+            vigente = repo.leer_perfil_vigente(u, hasta)
+            if vigente is not None:
+                perfil, req = vigente
+                yield ([alias or u] if varios else []) + list(perfil.values()) + list(req.values())
+
+    return [
+        ("Diario", prefijo + columnas, entradas()),
+        ("Resumen", prefijo + columnas_resumen, resumen()),
+        ("Perfil", prefijo + COLUMNAS_PERFIL_RANGO, perfiles()),
+    ]
+
+
+def _xlsxwriter_streaming(destino, hojas):
+    import xlsxwriter
+
+    # constant_memory: cada fila se escribe al disco en cuanto se pasa a la siguiente
+    wb = xlsxwriter.Workbook(destino, {"constant_memory": True})
+    negrita = wb.add_format({"bold": True})
+    for nombre, encabezado, filas in hojas:
+        ws = wb.add_worksheet(nombre)
+        ws.write_row(0, 0, encabezado, negrita)
+        for i, fila in enumerate(filas, start=1):
+            ws.write_row(i, 0, fila)
+    wb.close()
+
+
+def _openpyxl_streaming(destino, hojas):
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    for nombre, encabezado, filas in hojas:
+        ws = wb.create_sheet(nombre)
+        ws.append(encabezado)
+        for fila in filas:
+            ws.append(fila)
+    wb.save(destino)
+
+
+def _zip_csv_streaming(destino, hojas):
+    import csv
+    import zipfile
+    from itertools import islice
+
+    with zipfile.ZipFile(destino, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for nombre, encabezado, filas in hojas:
+            with zf.open(f"{nombre}.csv", "w") as crudo, io.TextIOWrapper(crudo, encoding="utf-8", newline="") as txt:
+                escritor = csv.writer(txt, lineterminator="\n")
+                escritor.writerow(encabezado)
+                while lote := list(islice(filas, LOTE_CSV)):
+                    escritor.writerows(lote)
+
+
+def nombre_archivo_rango(desde: date, hasta: date, engine: str | None) -> str:
+    ext = "xlsx" if engine else "zip"
+    return f"diario_comidas_{desde.isoformat()}_{hasta.isoformat()}.{ext}"
+
+
+def escribir_rango(destino, repo: RepositorioDiario, usuarios, desde: date, hasta: date, engine: str | None = "auto") -> str | None:
+    """Escribe el export de un rango de fechas en ``destino`` (ruta o archivo binario).
+
+    Devuelve el engine usado (None = ZIP con CSVs).
+    """
+    if engine == "auto":
+        engine = detectar_engine()
+    hojas = _hojas_rango(repo, usuarios, desde, hasta)
+    if engine == "xlsxwriter":
+        _xlsxwriter_streaming(destino, hojas)
+    elif engine == "openpyxl":
+        _openpyxl_streaming(destino, hojas)
+    else:
+        _zip_csv_streaming(destino, hojas)
+    return engine
+
+
+def exportar_rango(repo: RepositorioDiario, usuarios, desde: date, hasta: date, engine: str | None = "auto") -> ArchivoExport:
+    """Export de varios días (o de varios clientes) como ``ArchivoExport``.
+
+    Se escribe en un SpooledTemporaryFile; en memoria solo queda el archivo
+    final comprimido, no las filas.
+    """
+    from tempfile import SpooledTemporaryFile
+
+    with SpooledTemporaryFile(max_size=SPOOL_MAX) as tmp:
+        engine = escribir_rango(tmp, repo, usuarios, desde, hasta, engine)
+        tmp.seek(0)
+        data = tmp.read()
+    return ArchivoExport(data=data, file_name=nombre_archivo_rango(desde, hasta, engine), mime=mime_archivo(engine))
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""Historial de varios días a partir de los rollups diarios.
+
+Un año son como mucho 365 filas ya agregadas: las semanas y los meses se
+calculan sobre ellas, nunca sobre las entradas crudas.
+"""
+
+from __future__ import annotations
+from datetime import date, timedelta
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from foodtrappcker.nutricion import CLAVES, CON_OBJETIVO, METRICAS
+
+PERIODOS = {"7 días": 7, "30 días": 30, "90 días": 90, "365 días": 365}
+COLUMNAS_OBJETIVO = tuple(n.objetivo for n in CON_OBJETIVO)  # kcal_obj, prot_obj, agua_obj
+
+
+def rango(dias: int, hasta: date | None = None) -> tuple:
+    hasta = hasta or date.today()
+    return hasta - timedelta(days=dias - 1), hasta
+
+
+def tabla_diaria(rollups: List[Dict]) -> pd.DataFrame:
+    cols = [*CLAVES, "entradas", *COLUMNAS_OBJETIVO]
+    if not rollups:
+        return pd.DataFrame(columns=cols, index=pd.DatetimeIndex([], name="fecha"))
+    df = pd.DataFrame(rollups)
+    df["fecha"] = pd.to_datetime(df["fecha"])
+    return df.set_index("fecha")[cols].astype(float)
+
+
+def en_objetivo(df: pd.DataFrame) -> pd.DataFrame:
+    """Booleano por día y métrica (NaN si ese día no había objetivo)."""
+    out = {}
+    for nombre, (total, obj, regla) in METRICAS.items():
+        t, o = df[total].to_numpy(), df[obj].to_numpy()
+        ok = (t <= o) if regla == "menor_mejor" else (t >= o)
+        out[nombre] = np.where(np.isnan(o) | (o <= 0), np.nan, ok)
+    return pd.DataFrame(out, index=df.index)
+
+
+def dias_en_objetivo(df: pd.DataFrame) -> Dict[str, tuple]:
+    """{métrica: (días en objetivo, días con objetivo)}."""
+    ok = en_objetivo(df)
+    return {c: (int(np.nansum(ok[c])), int(ok[c].notna().sum())) for c in ok.columns}
+
+
+def por_periodo(df: pd.DataFrame, freq: str) -> pd.DataFrame:
+    """Promedio diario y días en objetivo por semana ("W") o mes ("MS")."""
+    if df.empty:
+        return pd.DataFrame()
+    ok = en_objetivo(df)
+    medias = df[[*CLAVES, *COLUMNAS_OBJETIVO]].resample(freq).mean()
+    dias = df["entradas"].resample(freq).count().rename("días registrados")
+    en_obj = ok.resample(freq).sum(min_count=1).add_prefix("en objetivo · ")
+    tabla = pd.concat([dias, medias.round(1), en_obj], axis=1)
+    return tabla[tabla["días registrados"] > 0]
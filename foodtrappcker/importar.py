@@ -0,0 +1,327 @@
+# -*- coding: utf-8 -*-
+"""Importación de exports anteriores (Excel, ZIP con CSVs o Parquet/Feather) al historial.
+
+Cada archivo se lee y se valida por separado. Con varios archivos la lectura
+corre en un pool de procesos, porque el parseo de xlsx es Python puro y no
+suelta el GIL. Después, en el proceso principal, cada nombre se asocia de
+nuevo con su id del catálogo y los días de todos los archivos se insertan en
+una sola transacción.
+
+Un día que ya tiene registros se salta, salvo que se pida reemplazarlo. Así,
+importar dos veces el mismo archivo no duplica filas. Cada día importado es
+un evento del diario (agregar, o reemplazar con las filas anteriores), así
+que se puede deshacer como cualquier otro cambio.
+"""
+
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date, datetime, time
+from typing import Dict, Iterable, List, Tuple
+import csv
+import io
+import multiprocessing
+import os
+import re
+
+from foodtrappcker import almacen, eventos
+from foodtrappcker.diario import COLUMNAS, ID_AGUA, ID_SIN_CATALOGO, NOMBRE_AGUA, NUMERICAS, a_minuto, nuevo_id
+from foodtrappcker.nutricion import GENEROS, METRICAS, OPCIONALES, requerimientos_perfil
+
+MIN_PARALELO = 4  # con menos archivos no compensa arrancar procesos
+MAX_ERRORES = 10  # por archivo
+# Exports anteriores a un nutriente no traen su columna: queda sin dato (None), como una celda vacía
+COLUMNAS_REQUERIDAS = [c for c in COLUMNAS if c not in OPCIONALES]
+PATRON_FECHA = re.compile(r"(\d{4}-\d{2}-\d{2})")
+
+# Encabezados del bloque de perfil del export -> claves del perfil
+CAMPOS_PERFIL = {
+    "Peso (kg)": "peso_kg", "Altura (cm)": "altura_cm", "Edad": "edad",
+    "Género": "genero", "Objetivo": "objetivo",
+}
+REQUERIMIENTOS = ("kcal_obj", "prot_obj", "agua_obj")
+
+
+@dataclass
+class ArchivoLeido:
+    archivo: str
+    dias: Dict[str, List[Dict]] = field(default_factory=dict)  # fecha ISO -> filas
+    perfiles: Dict[str, tuple] = field(default_factory=dict)  # fecha ISO -> (perfil, requerimientos)
+    errores: List[str] = field(default_factory=list)
+
+
+@dataclass
+class ResultadoImport:
+    archivos: int = 0
+    fechas: List[str] = field(default_factory=list)  # días importados (ISO)
+    filas: int = 0
+    sin_catalogo: int = 0
+    omitidos: List[str] = field(default_factory=list)  # días que ya tenían registros
+    errores: List[str] = field(default_factory=list)   # "archivo: motivo"; esos archivos no se importan
+
+
+# ---- lectura de cada formato: {hoja: [encabezado, *filas]} ----
+
+def _tablas_xlsx(data: bytes) -> Dict[str, List[tuple]]:
+    from openpyxl import load_workbook
+
+    wb = load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    try:
+        tablas = {ws.title: list(ws.iter_rows(values_only=True)) for ws in wb.worksheets}
+    finally:
+        wb.close()
+    resumen = tablas.get("Resumen")
+    if resumen and "Perfil" not in tablas:
+        # Export de un día: el perfil va debajo del resumen, tras una fila en blanco
+        vacias = [i for i, fila in enumerate(resumen) if all(v is None for v in fila)]
+        if vacias:
+            tablas["Resumen"], tablas["Perfil"] = resumen[:vacias[0]], resumen[vacias[0] + 1:]
+    return tablas
+
+
+def _tablas_zip(data: bytes) -> Dict[str, List[tuple]]:
+    import zipfile
+
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        nombres = [n for n in zf.namelist() if not n.endswith("/")]
+        if nombres and all(n.endswith(".csv") for n in nombres):
+            tablas = {}
+            for n in nombres:
+                texto = zf.read(n).decode("utf-8-sig")
+                tablas[n.rsplit("/", 1)[-1][:-4]] = [tuple(f) for f in csv.reader(io.StringIO(texto))]
+            return tablas
+    from foodtrappcker import columnar
+
+    return {
+        nombre.capitalize(): [tuple(t.column_names)] + list(zip(*(c.to_pylist() for c in t.columns)))
+        for nombre, t in columnar.leer_export(data).items()
+    }
+
+
+# ---- validación ----
+
+def _texto(v) -> str:
+    return "" if v is None else str(v).strip()
+
+
+def _numero(v, columna: str = "valor") -> float:
+    if isinstance(v, (int, float)):
+        return float(v)
+    try:
+        return float(_texto(v).replace(",", "."))
+    except ValueError:
+        raise ValueError(f"{columna} no es numérico") from None
+
+
+def _opcional(fila: tuple, pos: int | None, columna: str) -> float | None:
+    # Celda vacía, sin columna o NaN de Parquet / Feather: el alimento no traía el dato.
+    # Las hojas recortan las celdas vacías del final de cada fila.
+    v = fila[pos] if pos is not None and pos < len(fila) else None
+    return None if _texto(v) in ("", "nan") else _numero(v, columna)
+
+
+def _hora(v) -> time:
+    if isinstance(v, datetime):
+        return v.time()
+    if isinstance(v, time):
+        return v
+    try:
+        return datetime.strptime(_texto(v), "%H:%M").time()
+    except ValueError:
+        raise ValueError(f"hora {_texto(v)!r} no es HH:MM") from None
+
+
+def _fecha(v) -> str:
+    if isinstance(v, datetime):
+        return v.date().isoformat()
+    if isinstance(v, date):
+        return v.isoformat()
+    try:
+        return date.fromisoformat(_texto(v)[:10]).isoformat()
+    except ValueError:
+        raise ValueError(f"fecha {_texto(v)!r} no es AAAA-MM-DD") from None
+
+
+def _filas(tabla: List[tuple]) -> Tuple[Dict[str, int], List[Tuple[int, tuple]]]:
+    """(columna -> posición, [(fila en la hoja, valores)]) sin las filas vacías."""
+    encabezado = {_texto(c): i for i, c in enumerate(tabla[0])} if tabla else {}
+    filas = [(n, f) for n, f in enumerate(tabla[1:], start=2) if any(_texto(v) for v in f)]
+    return encabezado, filas
+
+
+def _perfiles(tablas: Dict[str, List[tuple]], fecha_defecto: str | None) -> Dict[str, tuple]:
+    col, filas = _filas(tablas.get("Perfil", []))
+    if not filas or not all(c in col for c in CAMPOS_PERFIL):
+        return {}
+    objetivos = {}
+    col_r, filas_r = _filas(tablas.get("Resumen", []))
+    if "Métrica" in col_r and "Objetivo" in col_r:
+        for _, f in filas_r:
+            if _texto(f[col_r["Métrica"]]) in METRICAS:
+                objetivos[METRICAS[_texto(f[col_r["Métrica"]])][1]] = _numero(f[col_r["Objetivo"]])
+    perfiles = {}
+    for n, f in filas:
+        try:
+            perfil = {clave: f[col[c]] for c, clave in CAMPOS_PERFIL.items()}
+            perfil.update(peso_kg=_numero(perfil["peso_kg"], "peso"), altura_cm=_numero(perfil["altura_cm"], "altura"),
+                          edad=int(_numero(perfil["edad"], "edad")), genero=_texto(perfil["genero"]),
+                          objetivo=_texto(perfil["objetivo"]))
+        except ValueError as e:
+            raise ValueError(f"Perfil, fila {n}: {e}") from None
+        if perfil["genero"] not in GENEROS:
+            raise ValueError(f"Perfil, fila {n}: genero debe ser {' o '.join(GENEROS)}")
+        if all(c in col for c in REQUERIMIENTOS):
+            req = {c: _numero(f[col[c]]) for c in REQUERIMIENTOS}
+        elif len(objetivos) == len(REQUERIMIENTOS):
+            req = dict(objetivos)
+        else:
+            req = requerimientos_perfil(perfil)
+        # Un día: la fecha del bloque. Un rango: el perfil vigente al final, que se
+        # guarda en el primer día para que todo el rango tenga objetivo (si ese
+        # día no tenía ya uno: planificar no pisa perfiles guardados).
+        fecha = _fecha(f[col["Fecha"]]) if "Fecha" in col else fecha_defecto
+        if fecha is not None:
+            perfiles[fecha] = (perfil, req)
+    return perfiles
+
+
+def _interpretar(leido: ArchivoLeido, tablas: Dict[str, List[tuple]]):
+    if "Diario" not in tablas:
+        raise ValueError("no tiene la hoja Diario")
+    col, filas = _filas(tablas["Diario"])
+    faltan = [c for c in COLUMNAS_REQUERIDAS if c not in col]
+    if faltan:
+        raise ValueError(f"Diario: faltan columnas {', '.join(faltan)}")
+    if "cliente" in col:
+        raise ValueError("es un export de varios clientes; exporta e importa cada cliente por separado")
+
+    fecha_fija = None
+    if "fecha" not in col:
+        col_p, filas_p = _filas(tablas.get("Perfil", []))
+        if "Fecha" in col_p and filas_p:
+            fecha_fija = _fecha(filas_p[0][1][col_p["Fecha"]])
+        elif (m := PATRON_FECHA.search(leido.archivo)) is not None:
+            fecha_fija = date.fromisoformat(m.group(1)).isoformat()
+        else:
+            raise ValueError("no se sabe de qué fecha es (sin columna fecha, bloque de perfil ni fecha en el nombre)")
+
+    for n, f in filas:
+        try:
+            fecha = fecha_fija or _fecha(f[col["fecha"]])
+            hora = _hora(f[col["hora"]])
+            nombre = _texto(f[col["nombre"]])
+            if not nombre:
+                raise ValueError("nombre vacío")
+            fila = {c: _opcional(f, col.get(c), c) if c in OPCIONALES else _numero(f[col[c]], c)
+                    for c in NUMERICAS}
+        except ValueError as e:
+            leido.errores.append(f"Diario, fila {n}: {e}")
+            if len(leido.errores) >= MAX_ERRORES:
+                break
+            continue
+        fila.update(nombre=nombre, porcion_desc=_texto(f[col["porcion_desc"]]),
+                    minuto=a_minuto(datetime.combine(date.fromisoformat(fecha), hora)))
+        leido.dias.setdefault(fecha, []).append(fila)
+
+    leido.perfiles = _perfiles(tablas, min(leido.dias) if leido.dias else None)
+
+
+def leer_archivo(archivo: str, data: bytes) -> ArchivoLeido:
+    """Lee y valida un export. Los problemas quedan en ``errores`` (no se lanzan)."""
+    import zipfile
+
+    leido = ArchivoLeido(archivo)
+    try:
+        if archivo.lower().endswith(".xlsx"):
+            tablas = _tablas_xlsx(data)
+        elif archivo.lower().endswith(".zip"):
+            tablas = _tablas_zip(data)
+        else:
+            raise ValueError("se esperaba un .xlsx o un .zip exportado por la app")
+        _interpretar(leido, tablas)
+    except (ValueError, KeyError, OSError, zipfile.BadZipFile) as e:
+        leido.errores.append(str(e))
+    return leido
+
+
+def _leer(args: Tuple[str, bytes]) -> ArchivoLeido:
+    return leer_archivo(*args)
+
+
+def leer_archivos(archivos: List[Tuple[str, bytes]], procesos: int | None = None) -> List[ArchivoLeido]:
+    """Lee [(nombre, bytes)] en paralelo (procesos), en el mismo orden."""
+    procesos = min(procesos or os.cpu_count() or 1, len(archivos))
+    if procesos <= 1 or len(archivos) < MIN_PARALELO:
+        return [leer_archivo(n, d) for n, d in archivos]
+    # spawn: no hace fork de un proceso con hilos (servidor de Streamlit, escritura diferida)
+    with ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return list(pool.map(_leer, archivos, chunksize=max(1, len(archivos) // (procesos * 4))))
+
+
+# ---- inserción ----
+
+def _item_id(cat, nombre: str, porcion_desc: str) -> int:
+    item_id = cat.buscar_id(nombre, porcion_desc)
+    if item_id is not None:
+        return item_id
+    return ID_AGUA if nombre == NOMBRE_AGUA else ID_SIN_CATALOGO
+
+
+def planificar(usuario: str, leidos: Iterable[ArchivoLeido], cat, repo: almacen.RepositorioDiario,
+               reemplazar: bool = False) -> Tuple[List[tuple], ResultadoImport]:
+    """Operaciones de escritura (almacen.op_*) para los archivos sin errores.
+
+    Un perfil del archivo solo se guarda si ese día no tiene uno.
+    """
+    res = ResultadoImport()
+    dias: Dict[str, List[Dict]] = {}
+    perfiles: Dict[str, tuple] = {}
+    for leido in leidos:
+        if leido.errores:
+            res.errores.extend(f"{leido.archivo}: {e}" for e in leido.errores)
+            continue
+        res.archivos += 1
+        dias.update(leido.dias)  # el mismo día en dos archivos: gana el último
+        perfiles.update(leido.perfiles)
+    if not dias:
+        return [], res
+
+    fechas = sorted(dias)
+    con_registros = {r["fecha"] for r in repo.leer_rollups(usuario, date.fromisoformat(fechas[0]),
+                                                           date.fromisoformat(fechas[-1])) if r["entradas"]}
+    ops = []
+    for fecha in fechas:
+        antes = None
+        if fecha in con_registros:
+            if not reemplazar:
+                res.omitidos.append(fecha)
+                continue
+            antes = repo.cargar_dia(usuario, date.fromisoformat(fecha))
+        registros = []
+        for fila in dias[fecha]:
+            item_id = _item_id(cat, fila["nombre"], fila["porcion_desc"])
+            res.sin_catalogo += item_id == ID_SIN_CATALOGO
+            if item_id == ID_AGUA:
+                # Como nutricion.valores_fila: el agua no aporta más que hidratación (0, no "sin dato")
+                fila = dict(fila, **{c: 0.0 for c in OPCIONALES if fila[c] is None})
+            registros.append(dict(fila, id=nuevo_id(), item_id=item_id))
+        evento = eventos.agregar(registros) if antes is None else eventos.reemplazar(antes, registros)
+        ops.append(almacen.op_evento(usuario, date.fromisoformat(fecha), evento))
+        if fecha in perfiles:
+            ops.append(almacen.op_perfil(usuario, date.fromisoformat(fecha), *perfiles[fecha], reemplazar=False))
+        res.fechas.append(fecha)
+        res.filas += len(registros)
+    return ops, res
+
+
+def importar(usuario: str, archivos: List[Tuple[str, bytes]], repo: almacen.RepositorioDiario, cat=None,
+             reemplazar: bool = False, procesos: int | None = None) -> ResultadoImport:
+    """Lee, valida e inserta varios exports de ``usuario`` en una sola transacción."""
+    from foodtrappcker import catalogo
+
+    cat = cat if cat is not None else catalogo.cargar_catalogo()
+    leidos = leer_archivos(archivos, procesos)
+    ops, res = planificar(usuario, leidos, cat, repo, reemplazar)
+    if ops:
+        repo.aplicar_sincrono(ops)  # después de lo pendiente, y los errores llegan aquí
+    return res
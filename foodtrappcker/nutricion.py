@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""Requerimientos diarios, registro de nutrientes y valores por fila (sin Streamlit)."""
+
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Dict, Mapping, Tuple
+import math
+
+import numpy as np
+
+OBJETIVOS = [
+    "Perder peso",
+    "Tonificar",
+    "Aumentar masa muscular",
+    "Mejorar rendimiento físico",
+    "Mejorar salud",
+]
+GENEROS = ["Hombre", "Mujer"]
+
+
+@dataclass(frozen=True)
+class Nutriente:
+    clave: str  # columna en el catálogo, el diario, la base y los exports
+    nombre: str
+    unidad: str
+    decimales: int  # redondeo de cada fila del diario
+    decimales_total: int  # redondeo al mostrar y exportar totales
+    objetivo: str | None = None  # requerimiento diario (kcal_obj, ...), si lo tiene
+    regla: str | None = None  # "menor_mejor" / "mayor_mejor"
+    requerido: bool = False  # el catálogo y los exports anteriores siempre lo traen
+
+    @property
+    def etiqueta(self) -> str:
+        return f"{self.nombre} ({self.unidad})"
+
+    def formatear(self, total: float) -> str:
+        """Total para mostrar; "—" si algún alimento no trae el dato (NaN)."""
+        return "—" if math.isnan(total) else f"{total:.{self.decimales_total}f} {self.unidad}"
+
+
+# Registro de nutrientes: el orden es el de las columnas en todas partes.
+# Agregar uno aquí lo agrega al catálogo, al diario, a la base, a los exports
+# y al resumen del día. Si un alimento no trae un nutriente opcional, el valor
+# es "sin dato" (NaN en memoria, NULL en la base, celda vacía en los exports),
+# no 0; y un total con alguna fila sin dato también es "sin dato".
+NUTRIENTES: Tuple[Nutriente, ...] = (
+    Nutriente("kcal", "Calorías", "kcal", 1, 0, "kcal_obj", "menor_mejor", requerido=True),
+    Nutriente("proteina_g", "Proteína", "g", 1, 1, "prot_obj", "mayor_mejor", requerido=True),
+    Nutriente("hidr_ml", "Hidratación", "ml", 0, 0, "agua_obj", "mayor_mejor", requerido=True),
+    Nutriente("carbohidratos_g", "Carbohidratos", "g", 1, 1),
+    Nutriente("grasa_g", "Grasa", "g", 1, 1),
+    Nutriente("fibra_g", "Fibra", "g", 1, 1),
+    Nutriente("azucar_g", "Azúcar", "g", 1, 1),
+    Nutriente("sodio_mg", "Sodio", "mg", 0, 0),
+)
+CLAVES: Tuple[str, ...] = tuple(n.clave for n in NUTRIENTES)
+POR_CLAVE: Dict[str, Nutriente] = {n.clave: n for n in NUTRIENTES}
+CON_OBJETIVO: Tuple[Nutriente, ...] = tuple(n for n in NUTRIENTES if n.objetivo)
+SIN_OBJETIVO: Tuple[Nutriente, ...] = tuple(n for n in NUTRIENTES if not n.objetivo)
+OPCIONALES: Tuple[str, ...] = tuple(n.clave for n in NUTRIENTES if not n.requerido)
+I_HIDR = CLAVES.index("hidr_ml")
+
+# (total, objetivo, regla): mismas reglas que los colores del día
+METRICAS = {n.etiqueta: (n.clave, n.objetivo, n.regla) for n in CON_OBJETIVO}
+
+
+def es_objetivo_alto(obj: str) -> bool:
+    normal = obj.strip().lower()
+    return normal in {"aumentar masa muscular", "mejorar rendimiento físico", "mejorar rendimiento fisico"}
+
+
+def calcular_requerimientos(peso_kg: float, altura_cm: float, edad: int, genero: str, objetivo: str):
+    # Proteína
+    if genero == "Hombre":
+        prot = peso_kg * (2.0 if es_objetivo_alto(objetivo) else 1.6)
+    else:
+        prot = peso_kg * (1.8 if es_objetivo_alto(objetivo) else 1.4)
+
+    # Calorías (Mifflin-St Jeor) +/- 250 con piso 1200 cuando aplica
+    if genero == "Hombre":
+        bmr = (10 * peso_kg) + (6.25 * altura_cm) - (5 * edad) + 5
+    else:
+        bmr = (10 * peso_kg) + (6.25 * altura_cm) - (5 * edad) - 161
+
+    if es_objetivo_alto(objetivo):
+        kcal = bmr + 250
+    else:
+        kcal = bmr - 250
+        if kcal < 1200:
+            kcal = 1200
+
+    agua_ml = (peso_kg / 7.0) * 250.0
+    return round(kcal, 0), round(prot, 1), round(agua_ml, 0)
+
+
+def _redondear(x: np.ndarray, decimales: int) -> np.ndarray:
+    """Igual que ``round()`` de Python, elemento a elemento.
+
+    np.round escala por 10**decimales antes de redondear, y eso puede mover un
+    valor que está justo en ...5 al otro lado del empate. Solo esos casos
+    (muy pocos) se redondean con Python; el resto ya coincide.
+    """
+    r = np.round(x, decimales)
+    if decimales == 0:
+        return r  # rint: mismo medio-a-par exacto que round(x, 0)
+    escalado = x * 10.0 ** decimales
+    dudosos = np.flatnonzero(np.abs(escalado - np.floor(escalado) - 0.5) < 1e-6)
+    for i in dudosos:
+        r[i] = round(float(x[i]), decimales)
+    return r
+
+
+def calcular_requerimientos_lote(peso_kg, altura_cm, edad, genero, objetivo) -> Dict[str, np.ndarray]:
+    """Versión vectorizada de ``calcular_requerimientos`` para muchas personas.
+
+    Recibe secuencias alineadas (listas, arrays o columnas de pandas) y
+    devuelve {"kcal_obj", "prot_obj", "agua_obj"} como arrays, con los mismos
+    valores que la función escalar fila a fila.
+    """
+    peso = np.asarray(peso_kg, dtype=np.float64)
+    altura = np.asarray(altura_cm, dtype=np.float64)
+    edad = np.asarray(edad, dtype=np.float64)
+    hombre = np.asarray(genero, dtype=object) == "Hombre"
+    # Pocos objetivos distintos: se clasifica cada uno una vez
+    clases: Dict[str, bool] = {}
+    alto = np.fromiter(
+        (clases[o] if o in clases else clases.setdefault(o, es_objetivo_alto(o)) for o in objetivo),
+        dtype=bool, count=len(peso),
+    )
+
+    # Proteína
+    factor = np.where(hombre, np.where(alto, 2.0, 1.6), np.where(alto, 1.8, 1.4))
+    prot = peso * factor
+
+    # Calorías (Mifflin-St Jeor) +/- 250 con piso 1200 cuando aplica
+    bmr = (10 * peso) + (6.25 * altura) - (5 * edad) + np.where(hombre, 5.0, -161.0)
+    kcal = np.where(alto, bmr + 250, np.maximum(bmr - 250, 1200.0))
+
+    agua_ml = (peso / 7.0) * 250.0
+    return {
+        "kcal_obj": _redondear(kcal, 0),
+        "prot_obj": _redondear(prot, 1),
+        "agua_obj": _redondear(agua_ml, 0),
+    }
+
+
+def requerimientos_perfil(perfil: Mapping) -> Dict[str, float]:
+    """Objetivos del día para un perfil {peso_kg, altura_cm, edad, genero, objetivo}."""
+    kcal_obj, prot_obj, agua_obj = calcular_requerimientos(
+        perfil["peso_kg"], perfil["altura_cm"], perfil["edad"], perfil["genero"], perfil["objetivo"]
+    )
+    return {"kcal_obj": float(kcal_obj), "prot_obj": float(prot_obj), "agua_obj": float(agua_obj)}
+
+
+def valores_fila(porciones: float, item: Mapping | None,
+                 hidr_ml_override: float | None = None) -> Tuple[float, ...]:
+    """Valores de una fila (en el orden de CLAVES), redondeados como se guardan en el diario.
+
+    El agua (``item`` None) no aporta nada más que hidratación: sus otros valores son 0, no "sin dato".
+    """
+    valores = [round(item.get(n.clave, math.nan) * porciones, n.decimales) if item else 0.0 for n in NUTRIENTES]
+    if hidr_ml_override is not None:
+        valores[I_HIDR] = round(float(hidr_ml_override), 0)
+    return tuple(valores)
+
+
+def escalar_fila(valores, factor: float) -> Tuple[float, ...]:
+    """Valores de una fila multiplicados por ``factor``, con el redondeo del diario."""
+    return tuple(round(v * factor, n.decimales) for v, n in zip(valores, NUTRIENTES))
+
+
+def etiqueta_color(valor: float, objetivo: float, regla: str) -> str:
+    if objetivo <= 0:
+        return "⚪"
+    if regla == "menor_mejor":
+        return "🟢" if valor <= objetivo else "🔴"
+    else:
+        return "🟢" if valor >= objetivo else "🔴"
+
+
+# Color para pintar números (verde si cumple, rojo si no)
+def color_hex(valor: float, objetivo: float, regla: str) -> str:
+    if objetivo <= 0:
+        return "#ffffff"
+    if regla == "menor_mejor":
+        return "#2ecc71" if valor <= objetivo else "#e74c3c"
+    else:
+        return "#2ecc71" if valor >= objetivo else "#e74c3c"
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""Plantillas de comidas, favoritos y alimentos recientes por usuario."""
+
+from __future__ import annotations
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Tuple
+
+from foodtrappcker.catalogo import FoodCatalog
+from foodtrappcker.nutricion import CLAVES, NUTRIENTES
+
+MAX_RECIENTES = 12
+
+
+@dataclass(frozen=True)
+class Plantilla:
+    id: int
+    nombre: str
+    items: Tuple[Tuple[int, float], ...]  # (item_id, porciones)
+    totales: Tuple[float, ...]  # uno por nutriente, en el orden de CLAVES (NaN: sin dato)
+
+    def por_clave(self) -> Dict[str, float]:
+        return dict(zip(CLAVES, self.totales))
+
+
+def totales_items(cat: FoodCatalog, items: Iterable[Tuple[int, float]]) -> Tuple[float, ...]:
+    """Totales por nutriente (orden de CLAVES) de una lista (item_id, porciones), desde la matriz del catálogo."""
+    return tuple(round(v, n.decimales) for v, n in zip(cat.totales(items).tolist(), NUTRIENTES))
+
+
+def nueva_plantilla(cat: FoodCatalog, id: int, nombre: str, items: Iterable[Tuple[int, float]]) -> Plantilla:
+    items = tuple((int(i), float(p)) for i, p in items)
+    return Plantilla(id, nombre.strip(), items, totales_items(cat, items))
+
+
+class Recientes:
+    """LRU acotado de item_ids: el último usado va primero."""
+
+    def __init__(self, ids: Iterable[int] = (), maximo: int = MAX_RECIENTES):
+        self.maximo = maximo
+        self._orden: OrderedDict = OrderedDict()
+        for i in reversed(list(ids)):
+            self.usar(i)
+
+    def usar(self, item_id: int):
+        self._orden[item_id] = None
+        self._orden.move_to_end(item_id, last=False)
+        while len(self._orden) > self.maximo:
+            self._orden.popitem(last=True)
+
+    def lista(self) -> List[int]:
+        return list(self._orden)
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""Listas de clientes (roster) de un coach: CSV -> requerimientos por persona.
+
+Columnas obligatorias: peso, altura, edad, genero y objetivo (se aceptan
+variantes como "Peso (kg)", "Género" o "sexo"). Cualquier otra columna (id,
+nombre, email...) se conserva tal cual en la salida.
+"""
+
+from __future__ import annotations
+from typing import TYPE_CHECKING, Dict, List
+
+from foodtrappcker.busqueda import normalizar
+from foodtrappcker.nutricion import GENEROS, OBJETIVOS, calcular_requerimientos_lote
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+COLUMNAS = ("peso_kg", "altura_cm", "edad", "genero", "objetivo")
+NUMERICAS = ("peso_kg", "altura_cm", "edad")
+SALIDA = ("kcal_obj", "prot_obj", "agua_obj")
+
+# Encabezado normalizado (minúsculas, sin tildes, "_" entre palabras) -> columna
+ALIAS: Dict[str, str] = {
+    "peso": "peso_kg", "peso_kg": "peso_kg",
+    "altura": "altura_cm", "altura_cm": "altura_cm", "talla": "altura_cm", "talla_cm": "altura_cm",
+    "edad": "edad", "edad_años": "edad", "edad_anos": "edad",
+    "genero": "genero", "sexo": "genero",
+    "objetivo": "objetivo",
+}
+# Objetivo normalizado -> como se escribe en la app ("mejorar rendimiento fisico" también vale)
+OBJETIVO_POR_CLAVE: Dict[str, str] = {normalizar(o): o for o in OBJETIVOS}
+MAX_ERRORES = 10
+
+
+def _columna(encabezado: str) -> str:
+    clave = normalizar(str(encabezado)).replace(" ", "_")
+    return ALIAS.get(clave, encabezado)
+
+
+def leer_roster(fuente) -> pd.DataFrame:
+    """Lee un CSV (ruta o archivo abierto). Acepta "," o ";" como separador y coma decimal."""
+    import pandas as pd
+
+    # Las líneas en blanco se leen (y se quitan aquí) para que el índice siga
+    # siendo la línea del archivo menos 2 y los errores nombren la fila correcta
+    df = pd.read_csv(fuente, sep=None, engine="python", dtype=str, skipinitialspace=True,
+                     encoding="utf-8-sig", keep_default_na=False, skip_blank_lines=False)
+    vacias = df.apply(lambda col: col.fillna("").str.strip().eq("")).all(axis=1)
+    return validar_roster(df[~vacias].rename(columns=_columna))
+
+
+def validar_roster(df: pd.DataFrame) -> pd.DataFrame:
+    """Normaliza tipos y valida; los errores indican la fila del CSV (la 1 es el encabezado).
+
+    La fila sale del índice (índice 0 = fila 2), así que no hay que reiniciarlo al quitar filas.
+    """
+    import pandas as pd
+
+    faltan = [c for c in COLUMNAS if c not in df.columns]
+    if faltan:
+        raise ValueError(f"Roster: faltan columnas {', '.join(faltan)}")
+    df = df.copy()
+    errores: List[str] = []
+    for c in NUMERICAS:
+        texto = df[c].astype(str).str.strip().str.replace(",", ".", regex=False)
+        df[c] = pd.to_numeric(texto, errors="coerce")
+        for i in df.index[df[c].isna()]:
+            errores.append(f"fila {i + 2}: {c} no es numérico")
+    genero = df["genero"].astype(str).str.strip().str.capitalize()
+    for i in df.index[~genero.isin(GENEROS)]:
+        errores.append(f"fila {i + 2}: genero debe ser {' o '.join(GENEROS)}")
+    df["genero"] = genero
+    objetivo = df["objetivo"].astype(str).map(normalizar).map(OBJETIVO_POR_CLAVE)
+    for i in df.index[objetivo.isna()]:
+        errores.append(f"fila {i + 2}: objetivo debe ser uno de: {', '.join(OBJETIVOS)}")
+    df["objetivo"] = objetivo
+    if errores:
+        extra = f" (y {len(errores) - MAX_ERRORES} más)" if len(errores) > MAX_ERRORES else ""
+        raise ValueError("Roster: " + "; ".join(errores[:MAX_ERRORES]) + extra)
+    return df
+
+
+def requerimientos_roster(df: pd.DataFrame) -> pd.DataFrame:
+    """Agrega kcal_obj, prot_obj y agua_obj a cada fila, en una sola pasada vectorizada."""
+    req = calcular_requerimientos_lote(
+        df["peso_kg"].to_numpy(), df["altura_cm"].to_numpy(), df["edad"].to_numpy(),
+        df["genero"].to_numpy(), df["objetivo"].to_numpy(),
+    )
+    return df.assign(**req)
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""Fixtures comunes: base SQLite y catálogos de prueba en un directorio temporal."""
+
+from __future__ import annotations
+import json
+
+import pytest
+
+from foodtrappcker import almacen, catalogo
+
+# Un alimento trae grasa y otro no: sirve para los totales "sin dato"
+ITEMS_PRUEBA = [
+    {"id": 0, "nombre": "Pollo", "porcion_desc": "100g", "kcal": 120.0, "proteina_g": 22.0, "hidr_ml": 0,
+     "grasa_g": 2.5, "sodio_mg": 70},
+    {"id": 1, "nombre": "Arroz", "porcion_desc": "1 taza", "kcal": 200.0, "proteina_g": 4.0, "hidr_ml": 0},
+    {"id": 2, "nombre": "Manzana", "porcion_desc": "1 unidad", "kcal": 95.0, "proteina_g": 0.5, "hidr_ml": 85,
+     "grasa_g": 0.3},
+]
+
+
+@pytest.fixture
+def repo(tmp_path):
+    r = almacen.RepositorioSQLite(tmp_path / "diario.sqlite3")
+    yield r
+    r.cerrar()
+
+
+@pytest.fixture
+def cat(tmp_path, monkeypatch):
+    # También como catálogo vigente: los exports y el import lo leen de DIARIO_CATALOGO
+    ruta = tmp_path / "catalogo.json"
+    ruta.write_text(json.dumps(ITEMS_PRUEBA), encoding="utf-8")
+    monkeypatch.setenv("DIARIO_CATALOGO", str(ruta))
+    return catalogo.cargar_catalogo()
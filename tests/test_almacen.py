@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""Migración de bases anteriores al registro de nutrientes (solo kcal, proteína e hidratación)."""
+
+from __future__ import annotations
+from datetime import date
+import math
+import sqlite3
+
+import pytest
+
+from foodtrappcker import almacen, eventos
+from foodtrappcker.diario import Diario, ID_AGUA
+from foodtrappcker.nutricion import CLAVES, OPCIONALES
+
+DIA = date(2026, 3, 14)
+
+# Tablas que cambian con los nutrientes, como las creaba la versión anterior
+ESQUEMA_ANTERIOR = """
+CREATE TABLE entradas (
+    id INTEGER PRIMARY KEY, usuario TEXT NOT NULL, fecha TEXT NOT NULL, minuto INTEGER NOT NULL,
+    item_id INTEGER NOT NULL, nombre TEXT NOT NULL, porcion_desc TEXT NOT NULL, porciones REAL NOT NULL,
+    kcal REAL NOT NULL, proteina_g REAL NOT NULL, hidr_ml REAL NOT NULL
+);
+CREATE INDEX ix_entradas_usuario_fecha ON entradas(usuario, fecha, minuto);
+
+CREATE TABLE rollup_diario (
+    usuario TEXT NOT NULL, fecha TEXT NOT NULL,
+    kcal REAL NOT NULL DEFAULT 0, proteina_g REAL NOT NULL DEFAULT 0, hidr_ml REAL NOT NULL DEFAULT 0,
+    entradas INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (usuario, fecha)
+) WITHOUT ROWID;
+
+CREATE TRIGGER tr_entradas_alta AFTER INSERT ON entradas BEGIN
+    INSERT INTO rollup_diario (usuario, fecha, kcal, proteina_g, hidr_ml, entradas)
+    VALUES (NEW.usuario, NEW.fecha, NEW.kcal, NEW.proteina_g, NEW.hidr_ml, 1)
+    ON CONFLICT (usuario, fecha) DO UPDATE SET
+        kcal = kcal + excluded.kcal, proteina_g = proteina_g + excluded.proteina_g,
+        hidr_ml = hidr_ml + excluded.hidr_ml, entradas = entradas + 1;
+END;
+
+CREATE TABLE plantillas (
+    id INTEGER PRIMARY KEY, usuario TEXT NOT NULL, nombre TEXT NOT NULL,
+    kcal REAL NOT NULL, proteina_g REAL NOT NULL, hidr_ml REAL NOT NULL
+);
+CREATE TABLE plantilla_items (
+    plantilla_id INTEGER NOT NULL REFERENCES plantillas(id) ON DELETE CASCADE,
+    orden INTEGER NOT NULL, item_id INTEGER NOT NULL, porciones REAL NOT NULL,
+    PRIMARY KEY (plantilla_id, orden)
+) WITHOUT ROWID;
+"""
+FILAS = [
+    (1, "u", DIA.isoformat(), 100, 0, "Pollo", "100g", 1.0, 120.0, 22.0, 0.0),
+    (2, "u", DIA.isoformat(), 200, 1, "Arroz", "1 taza", 2.0, 400.0, 8.0, 0.0),
+    (3, "u", DIA.isoformat(), 300, ID_AGUA, "Agua (ml)", "500 ml", 1.0, 0.0, 0.0, 500.0),
+]
+
+
+def _base_anterior(ruta, opcionales_en_cero=False):
+    con = sqlite3.connect(ruta)
+    con.executescript(ESQUEMA_ANTERIOR)
+    con.executemany("INSERT INTO entradas VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", FILAS)
+    con.execute("INSERT INTO plantillas VALUES (7, 'u', 'Almuerzo', 520.0, 30.0, 0.0)")
+    con.executemany("INSERT INTO plantilla_items VALUES (7, ?, ?, ?)", [(0, 0, 1.0), (1, 1, 2.0)])
+    if opcionales_en_cero:
+        # Primera versión del registro: columnas opcionales NOT NULL con 0 en lugar de "sin dato"
+        for c in OPCIONALES:
+            con.execute(f"ALTER TABLE entradas ADD COLUMN {c} REAL NOT NULL DEFAULT 0")
+    con.commit()
+    con.close()
+
+
+@pytest.mark.parametrize("opcionales_en_cero", [False, True])
+def test_migrar_base_anterior(tmp_path, opcionales_en_cero):
+    ruta = tmp_path / "vieja.sqlite3"
+    _base_anterior(ruta, opcionales_en_cero)
+    repo = almacen.RepositorioSQLite(ruta)
+
+    columnas = {f[1]: f[3] for f in repo._conexion().execute("PRAGMA table_info(entradas)")}
+    assert all(c in columnas for c in CLAVES)
+    assert not any(columnas[c] for c in OPCIONALES)  # NULL permitido: "sin dato"
+
+    pollo, arroz, agua = repo.cargar_dia("u", DIA)
+    assert (pollo["kcal"], arroz["porciones"], agua["hidr_ml"]) == (120.0, 2.0, 500.0)
+    assert all(pollo[c] is None and arroz[c] is None for c in OPCIONALES)
+    assert all(agua[c] == 0.0 for c in OPCIONALES)  # el agua no aporta más que hidratación
+
+    rollup, = repo.leer_rollups("u", DIA, DIA)
+    assert (rollup["kcal"], rollup["proteina_g"], rollup["hidr_ml"], rollup["entradas"]) == (520.0, 30.0, 500.0, 3)
+    assert all(rollup[c] is None for c in OPCIONALES)
+
+    plantilla, = repo.leer_plantillas("u")
+    assert plantilla.items == ((0, 1.0), (1, 2.0))
+    assert plantilla.por_clave()["kcal"] == 520.0
+    assert all(math.isnan(plantilla.por_clave()[c]) for c in OPCIONALES)
+    repo.cerrar()
+
+
+def test_escribir_despues_de_migrar(tmp_path, cat):
+    ruta = tmp_path / "vieja.sqlite3"
+    _base_anterior(ruta)
+    repo = almacen.RepositorioSQLite(ruta)
+    d = Diario.desde_registros(repo.cargar_dia("u", DIA))
+    arroz = d.ids[1]
+    registros = [d.registro(1)]
+    d.eliminar_ids([arroz])
+    d.agregar_fila("Manzana", 1.0, cat.item(2))
+    repo.aplicar([
+        almacen.op_evento("u", DIA, eventos.eliminar(registros)),
+        almacen.op_evento("u", DIA, eventos.agregar([d.registro(len(d) - 1)])),
+    ])
+    repo.cerrar()
+
+    # Reabrir ya no migra nada y los triggers siguen al día
+    repo = almacen.RepositorioSQLite(ruta)
+    assert repo.cargar_dia("u", DIA) == d.registros()
+    rollup, = repo.leer_rollups("u", DIA, DIA)
+    assert rollup["kcal"] == pytest.approx(120.0 + 95.0)
+    assert rollup["grasa_g"] is None  # el pollo migrado no tiene el dato
+    assert rollup["entradas"] == 3
+    repo.cerrar()
+
+
+def test_base_nueva(repo):
+    assert repo.cargar_dia("u", DIA) == []
+    assert repo.leer_rollups("u", DIA, DIA) == []
+    assert repo.leer_estado("u", DIA) == []
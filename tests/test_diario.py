@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""Diario por ids estables: borrar y editar no dependen del orden de la tabla."""
+
+from __future__ import annotations
+from datetime import date
+
+import numpy as np
+import pytest
+
+from foodtrappcker import almacen, eventos
+from foodtrappcker.diario import Diario, NOMBRE_AGUA
+from foodtrappcker.nutricion import CLAVES
+
+
+def _diario(cat, n=6) -> Diario:
+    d = Diario()
+    for i in range(n):
+        item = cat.item(i % 3)
+        d.agregar_fila(item["nombre"], 1.0 + i, item)
+    d.agregar_fila(NOMBRE_AGUA, 1.0, None, hidr_ml_override=250)
+    return d
+
+
+def test_eliminar_por_id(cat):
+    d = _diario(cat)
+    ids = list(d.ids)
+    quitar = [ids[4], ids[1], ids[6]]  # en otro orden que la tabla, con el agua
+    esperado = [r for r in d.registros() if r["id"] not in quitar]
+
+    assert sorted(d.eliminar_ids(quitar)) == sorted(quitar)
+    assert d.registros() == esperado
+    assert d.eliminar_ids(quitar) == []  # ya no están: no se borra otra fila
+
+
+def test_eliminar_ignora_ids_desconocidos(cat):
+    d = _diario(cat)
+    antes = d.registros()
+    assert d.eliminar_ids([123456789]) == []
+    assert d.registros() == antes
+
+
+def test_totales_tras_borrar(cat):
+    d = _diario(cat)
+    d.eliminar_ids(list(d.ids)[::2])
+    recalculado = d.recalcular_totales()
+    for c in CLAVES:
+        np.testing.assert_allclose(d.totales[c], recalculado[c], equal_nan=True)
+
+
+def test_editar_porciones_por_id(cat):
+    d = _diario(cat)
+    id_ = d.ids[2]
+    r = d.actualizar_porciones(id_, 2.0, cat)
+    assert r["id"] == id_ and r["porciones"] == 2.0
+    assert r["kcal"] == cat.item(2)["kcal"] * 2
+    assert d.actualizar_porciones(123456789, 2.0, cat) is None
+
+
+def test_eliminar_en_la_base_solo_esos_ids(repo, cat):
+    hoy = date(2026, 3, 14)
+    d = _diario(cat)
+    repo.aplicar([almacen.op_evento("u", hoy, eventos.agregar(d.registros()))])
+    quitar = [d.ids[0], d.ids[3]]
+    registros = [d.registro(int(i)) for i in d.posiciones(quitar)]
+    d.eliminar_ids(quitar)
+    repo.aplicar([almacen.op_evento("u", hoy, eventos.eliminar(registros))])
+
+    assert repo.cargar_dia("u", hoy) == d.registros()
+    rollup, = repo.leer_rollups("u", hoy, hoy)
+    assert rollup["entradas"] == len(d)
+    assert rollup["kcal"] == pytest.approx(sum(r["kcal"] for r in d.registros()))
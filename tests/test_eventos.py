@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""Registro de eventos: el pliegue desde los snapshots coincide con la proyección en ``entradas``."""
+
+from __future__ import annotations
+from datetime import date
+import random
+
+import pytest
+
+from foodtrappcker import almacen, eventos
+from foodtrappcker.diario import Diario, NOMBRE_AGUA
+
+USUARIO = "u"
+DIA = date(2026, 3, 14)
+
+
+class Sesion:
+    """Lo que hace la app: cambia el diario en memoria, registra el evento y lo persiste."""
+
+    def __init__(self, repo, cat):
+        self.repo, self.cat = repo, cat
+        self.diario = Diario()
+        self.historial = eventos.Historial()
+        self.estados = {}  # seq -> registros después de ese evento
+
+    def registrar(self, ev):
+        self.repo.aplicar([almacen.op_evento(USUARIO, DIA, ev)])
+        self.historial.registrar(ev)
+        self.estados[len(self.estados) + 1] = self.registros()
+
+    def registros(self):
+        # La sesión agrega al final (también lo que vuelve al deshacer); la base ordena por hora e id
+        return sorted(self.diario.registros(), key=lambda r: (r["minuto"], r["id"]))
+
+    def agregar(self, rng):
+        if rng.random() < 0.2:
+            self.diario.agregar_fila(NOMBRE_AGUA, 1.0, None, hidr_ml_override=rng.choice([150, 250, 500]))
+        else:
+            item = self.cat.item(rng.randrange(len(self.cat)))
+            self.diario.agregar_fila(item["nombre"], rng.choice([0.5, 1.0, 1.5, 2.0]), item)
+        self.registrar(eventos.agregar([self.diario.registro(len(self.diario) - 1)]))
+
+    def eliminar(self, rng):
+        ids = rng.sample(list(self.diario.ids), k=min(len(self.diario), rng.randint(1, 3)))
+        registros = [self.diario.registro(int(i)) for i in self.diario.posiciones(ids)]
+        self.diario.eliminar_ids(ids)
+        self.registrar(eventos.eliminar(registros))
+
+    def editar(self, rng):
+        id_ = rng.choice(list(self.diario.ids))
+        antes = self.diario.registro(int(self.diario.posiciones([id_])[0]))
+        despues = self.diario.actualizar_porciones(id_, rng.choice([0.25, 1.0, 3.0]), self.cat)
+        self.registrar(eventos.editar([antes], [despues]))
+
+    def vaciar(self, rng):
+        registros = self.diario.registros()
+        self.diario.vaciar()
+        self.registrar(eventos.vaciar(registros))
+
+    def deshacer(self, rng, rehacer=False):
+        ev = self.historial.siguiente_rehacer() if rehacer else self.historial.siguiente_deshacer()
+        if ev is not None:
+            eventos.aplicar_a_diario(self.diario, ev)
+            self.registrar(ev)
+
+
+def _jugar(repo, cat, pasos, semilla) -> Sesion:
+    rng = random.Random(semilla)
+    s = Sesion(repo, cat)
+    for _ in range(pasos):
+        accion = rng.choices(["agregar", "eliminar", "editar", "vaciar", "deshacer", "rehacer"],
+                             weights=[8, 2, 2, 0.3, 3, 2])[0]
+        if accion in ("eliminar", "editar") and not len(s.diario):
+            accion = "agregar"
+        if accion == "rehacer":
+            s.deshacer(rng, rehacer=True)
+        else:
+            getattr(s, accion)(rng)
+    return s
+
+
+@pytest.mark.parametrize("semilla", [1, 2, 3])
+def test_estado_final_igual_a_entradas(repo, cat, semilla):
+    s = _jugar(repo, cat, 3 * eventos.SNAPSHOT_CADA + 7, semilla)
+    assert repo.cargar_dia(USUARIO, DIA) == s.registros()
+    assert repo.leer_estado(USUARIO, DIA) == s.registros()
+    assert repo.leer_rollups(USUARIO, DIA, DIA)[0]["entradas"] == len(s.diario)
+
+
+def test_cada_punto_del_dia_desde_el_snapshot(repo, cat):
+    s = _jugar(repo, cat, 2 * eventos.SNAPSHOT_CADA + 13, semilla=7)
+    snapshots = repo._conexion().execute("SELECT COUNT(*) FROM snapshots").fetchone()[0]
+    assert snapshots == 1 + len(s.estados) // eventos.SNAPSHOT_CADA  # el 0 (antes del primer evento) y uno cada SNAPSHOT_CADA
+    for seq, registros in s.estados.items():
+        assert repo.leer_estado(USUARIO, DIA, seq) == registros, seq
+
+
+def test_plegar_todo_el_registro(repo, cat):
+    s = _jugar(repo, cat, eventos.SNAPSHOT_CADA + 20, semilla=11)
+    todos = repo.leer_eventos(USUARIO, DIA, ultimos=len(s.estados))
+    assert len(todos) == len(s.estados)
+    assert eventos.plegar([], todos) == repo.cargar_dia(USUARIO, DIA)
+
+
+def test_deshacer_y_rehacer(repo, cat):
+    s = Sesion(repo, cat)
+    rng = random.Random(0)
+    for _ in range(3):
+        s.agregar(rng)
+    tres = s.registros()
+    s.vaciar(rng)
+    s.deshacer(rng)  # deshace el vaciado
+    assert repo.cargar_dia(USUARIO, DIA) == tres
+    s.deshacer(rng)  # quita la tercera fila
+    assert repo.cargar_dia(USUARIO, DIA) == tres[:2]
+    s.deshacer(rng, rehacer=True)
+    assert repo.cargar_dia(USUARIO, DIA) == tres
+
+    # Las pilas se rearman igual desde la base (tras un refresh)
+    rearmado = eventos.Historial(repo.leer_eventos(USUARIO, DIA))
+    assert rearmado.descripcion() == s.historial.descripcion()
+    assert rearmado.descripcion(rehacer=True) == s.historial.descripcion(rehacer=True)
+
+
+def test_evento_repetido_se_ignora(repo, cat):
+    d = Diario()
+    d.agregar_fila(cat.item(0)["nombre"], 1.0, cat.item(0))
+    ev = eventos.agregar(d.registros())
+    repo.aplicar([almacen.op_evento(USUARIO, DIA, ev)])
+    repo.aplicar([almacen.op_evento(USUARIO, DIA, ev)])  # p. ej. una bitácora reaplicada
+    assert len(repo.leer_eventos(USUARIO, DIA)) == 1
+    assert repo.cargar_dia(USUARIO, DIA) == d.registros()
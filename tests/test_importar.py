@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""El importador lee los mismos archivos que exporta la app (día y rango; Excel o ZIP con CSVs)."""
+
+from __future__ import annotations
+from datetime import date, datetime
+from importlib.util import find_spec
+
+import pytest
+
+from foodtrappcker import almacen, eventos, exportar, importar
+from foodtrappcker.diario import Diario, NOMBRE_AGUA, a_minuto
+from foodtrappcker.nutricion import requerimientos_perfil
+
+DIAS = (date(2026, 3, 13), date(2026, 3, 14))
+PERFIL = {"peso_kg": 68.5, "altura_cm": 171.0, "edad": 34, "genero": "Mujer", "objetivo": "Tonificar"}
+ENGINES = [pytest.param(e, marks=pytest.mark.skipif(find_spec(e) is None, reason=f"{e} no instalado"))
+           for e in ("xlsxwriter", "openpyxl")] + [None]
+
+
+def _diario(cat, fecha: date) -> Diario:
+    d = Diario()
+    for hora, (item_id, porciones) in zip((8, 13, 20), ((0, 1.5), (1, 1.0), (2, 2.0))):
+        item = cat.item(item_id)
+        d.agregar_fila(item["nombre"], porciones, item)
+        d.minuto[-1] = a_minuto(datetime(fecha.year, fecha.month, fecha.day, hora, 15))
+    d.agregar_fila(NOMBRE_AGUA, 1.0, None, hidr_ml_override=500)
+    d.minuto[-1] = a_minuto(datetime(fecha.year, fecha.month, fecha.day, 21, 0))
+    return d
+
+
+@pytest.fixture
+def origen(repo, cat):
+    """Dos días de "a", con perfil, guardados en la base."""
+    ops = []
+    for fecha in DIAS:
+        ops.append(almacen.op_evento("a", fecha, eventos.agregar(_diario(cat, fecha).registros())))
+        ops.append(almacen.op_perfil("a", fecha, PERFIL, requerimientos_perfil(PERFIL)))
+    repo.aplicar(ops)
+    return repo
+
+
+def _sin_id(registros):
+    return [{k: v for k, v in r.items() if k != "id"} for r in registros]
+
+
+def _mismos_dias(repo, dias=DIAS):
+    for fecha in dias:
+        assert _sin_id(repo.cargar_dia("b", fecha)) == _sin_id(repo.cargar_dia("a", fecha))
+        assert repo.leer_perfil_vigente("b", fecha) == repo.leer_perfil_vigente("a", fecha)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_export_de_un_dia(origen, cat, engine):
+    fecha = DIAS[1]
+    d = Diario.desde_registros(origen.cargar_dia("a", fecha))
+    archivo = exportar.exportar_diario(d, requerimientos_perfil(PERFIL), PERFIL, fecha, engine)
+    res = importar.importar("b", [(exportar.nombre_archivo(fecha, engine), archivo.data)], origen, cat=cat)
+    assert not res.errores
+    assert res.fechas == [fecha.isoformat()] and res.filas == len(d)
+    _mismos_dias(origen, [fecha])
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_export_de_un_rango(origen, cat, engine):
+    archivo = exportar.exportar_rango(origen, [("a", "")], *DIAS, engine)
+    res = importar.importar("b", [(exportar.nombre_archivo_rango(*DIAS, engine), archivo.data)], origen, cat=cat)
+    assert not res.errores
+    assert sorted(res.fechas) == [f.isoformat() for f in DIAS]
+    _mismos_dias(origen)
+
+
+def test_reimportar_no_duplica(origen, cat):
+    archivo = exportar.exportar_rango(origen, [("a", "")], *DIAS, None)
+    nombre = exportar.nombre_archivo_rango(*DIAS, None)
+    importar.importar("b", [(nombre, archivo.data)], origen, cat=cat)
+    res = importar.importar("b", [(nombre, archivo.data)], origen, cat=cat)
+    assert sorted(res.omitidos) == [f.isoformat() for f in DIAS] and not res.fechas
+    res = importar.importar("b", [(nombre, archivo.data)], origen, cat=cat, reemplazar=True)
+    assert sorted(res.fechas) == [f.isoformat() for f in DIAS]
+    _mismos_dias(origen)
+
+
+def test_no_pisa_un_perfil_guardado(origen, cat):
+    otro = dict(PERFIL, peso_kg=90.0)
+    origen.aplicar([almacen.op_perfil("b", DIAS[0], otro, requerimientos_perfil(otro))])
+    archivo = exportar.exportar_rango(origen, [("a", "")], *DIAS, None)
+    importar.importar("b", [(exportar.nombre_archivo_rango(*DIAS, None), archivo.data)], origen, cat=cat)
+    # El perfil de un rango va al primer día, que ya tenía uno guardado
+    assert origen.cargar_perfil("b", DIAS[0])[0]["peso_kg"] == 90.0
+    assert len(origen.cargar_dia("b", DIAS[0])) == len(origen.cargar_dia("a", DIAS[0]))
+
+
+def test_archivo_invalido(repo, cat):
+    res = importar.importar("b", [("otro.zip", b"no es un zip"), ("notas.txt", b"")], repo, cat=cat)
+    assert len(res.errores) == 2 and not res.fechas
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""Nutrientes opcionales: "sin dato" (NaN / NULL) no es 0, y un total con alguna fila sin dato tampoco."""
+
+from __future__ import annotations
+from datetime import date
+import math
+
+import pytest
+
+from foodtrappcker import almacen, eventos
+from foodtrappcker.diario import Diario, NOMBRE_AGUA
+from foodtrappcker.nutricion import CLAVES, OPCIONALES, POR_CLAVE, valores_fila
+from foodtrappcker.plantillas import nueva_plantilla
+
+DIA = date(2026, 3, 14)
+
+
+def _valores(cat, item_id, porciones=1.0):
+    return dict(zip(CLAVES, valores_fila(porciones, cat.item(item_id))))
+
+
+def test_valores_fila_sin_dato(cat):
+    arroz = _valores(cat, 1, 2.0)
+    assert arroz["kcal"] == 400.0
+    assert all(math.isnan(arroz[c]) for c in OPCIONALES)
+    assert _valores(cat, 0, 2.0)["grasa_g"] == 5.0
+
+
+def test_agua_aporta_cero():
+    agua = dict(zip(CLAVES, valores_fila(1.0, None, hidr_ml_override=300)))
+    assert agua["hidr_ml"] == 300.0
+    assert all(agua[c] == 0.0 for c in CLAVES if c != "hidr_ml")
+
+
+def test_total_sin_dato_mientras_alguna_fila_no_lo_tenga(cat):
+    d = Diario()
+    pollo = d.agregar_fila("Pollo", 1.0, cat.item(0))
+    d.agregar_fila(NOMBRE_AGUA, 1.0, None, hidr_ml_override=250)
+    assert d.totales["grasa_g"] == 2.5
+    assert math.isnan(d.totales["fibra_g"])  # el pollo no la trae
+
+    arroz = d.agregar_fila("Arroz", 1.0, cat.item(1))
+    assert math.isnan(d.totales["grasa_g"])
+    assert d.totales["kcal"] == 320.0
+
+    d.eliminar_ids([arroz])
+    assert d.totales["grasa_g"] == 2.5
+    d.eliminar_ids([pollo])
+    assert d.totales["grasa_g"] == 0.0  # solo queda agua
+
+
+def test_formatear_sin_dato():
+    assert POR_CLAVE["grasa_g"].formatear(math.nan) == "—"
+    assert POR_CLAVE["grasa_g"].formatear(2.54) == "2.5 g"
+    assert POR_CLAVE["sodio_mg"].formatear(0.0) == "0 mg"
+
+
+def test_catalogo(cat):
+    assert [n.clave for n in cat.nutrientes] == ["kcal", "proteina_g", "hidr_ml", "grasa_g", "sodio_mg"]
+    # Un NaN solo cuenta si ese alimento está en la lista
+    totales = dict(zip(CLAVES, cat.totales([(0, 1.0), (2, 2.0)]).tolist()))
+    assert totales["grasa_g"] == pytest.approx(2.5 + 2 * 0.3)
+    assert math.isnan(totales["sodio_mg"])
+    assert math.isnan(dict(zip(CLAVES, cat.totales([(1, 1.0)]).tolist()))["grasa_g"])
+
+
+def test_registro_y_base_guardan_none(repo, cat):
+    d = Diario()
+    d.agregar_fila("Arroz", 1.0, cat.item(1))
+    d.agregar_fila("Pollo", 1.0, cat.item(0))
+    assert d.registro(0)["grasa_g"] is None
+    repo.aplicar([almacen.op_evento("u", DIA, eventos.agregar(d.registros()))])
+    assert repo.cargar_dia("u", DIA) == d.registros()
+
+    rollup, = repo.leer_rollups("u", DIA, DIA)
+    assert rollup["kcal"] == 320.0
+    assert rollup["grasa_g"] is None  # el arroz no la trae
+    repo.aplicar([almacen.op_evento("u", DIA, eventos.eliminar([d.registro(0)]))])
+    rollup, = repo.leer_rollups("u", DIA, DIA)
+    assert rollup["grasa_g"] == 2.5
+
+
+def test_plantilla_guarda_sin_dato(repo, cat):
+    p = nueva_plantilla(cat, 1, "Almuerzo", [(0, 1.0), (1, 1.0)])
+    repo.aplicar([almacen.op_plantilla("u", p)])
+    leida, = repo.leer_plantillas("u")
+    assert leida.items == p.items
+    assert leida.por_clave()["kcal"] == 320.0
+    assert math.isnan(leida.por_clave()["grasa_g"])
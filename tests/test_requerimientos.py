@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""calcular_requerimientos_lote (y el roster CSV) contra la función escalar, persona por persona."""
+
+from __future__ import annotations
+import io
+import itertools
+
+import numpy as np
+import pytest
+
+from foodtrappcker.nutricion import GENEROS, OBJETIVOS, calcular_requerimientos, calcular_requerimientos_lote
+from foodtrappcker.roster import leer_roster, requerimientos_roster
+
+
+def _comparar(peso, altura, edad, genero, objetivo):
+    lote = calcular_requerimientos_lote(peso, altura, edad, genero, objetivo)
+    for i, fila in enumerate(zip(peso, altura, edad, genero, objetivo)):
+        assert (lote["kcal_obj"][i], lote["prot_obj"][i], lote["agua_obj"][i]) == calcular_requerimientos(*fila), fila
+
+
+def test_grilla_de_perfiles():
+    combinaciones = list(itertools.product(
+        np.arange(40.0, 140.0, 7.5), (150.0, 165.5, 180.0, 195.5), (18, 35, 60, 80), GENEROS, OBJETIVOS,
+    ))
+    _comparar(*(list(c) for c in zip(*combinaciones)))
+
+
+def test_valores_al_azar():
+    rng = np.random.default_rng(18)
+    n = 5_000
+    _comparar(
+        rng.uniform(30, 200, n).round(1).tolist(),
+        rng.uniform(120, 220, n).round(1).tolist(),
+        rng.integers(10, 100, n).tolist(),
+        rng.choice(GENEROS, n).tolist(),
+        rng.choice(OBJETIVOS + ["mejorar rendimiento fisico", " Aumentar masa muscular "], n).tolist(),
+    )
+
+
+@pytest.mark.parametrize("peso", [4.2, 11.06, 25.9, 33.18])
+def test_empates_de_redondeo(peso):
+    # Pesos cuya proteína o agua cae en ...5 justo antes de redondear
+    _comparar([peso] * 2, [170.0] * 2, [30] * 2, GENEROS, ["Tonificar", "Aumentar masa muscular"])
+
+
+def test_piso_de_1200_kcal():
+    lote = calcular_requerimientos_lote([40.0], [140.0], [90], ["Mujer"], ["Perder peso"])
+    assert lote["kcal_obj"][0] == 1200.0
+
+
+def test_roster_csv():
+    csv = ("nombre;Peso (kg);Altura;Edad;Sexo;Objetivo\n"
+           "Ana;61,5;163;29;mujer;Tonificar\n"
+           "\n"
+           "Beto;92;181,5;44;Hombre;mejorar rendimiento fisico\n")
+    df = requerimientos_roster(leer_roster(io.StringIO(csv)))
+    assert df["nombre"].tolist() == ["Ana", "Beto"]
+    for _, fila in df.iterrows():
+        esperado = calcular_requerimientos(fila.peso_kg, fila.altura_cm, fila.edad, fila.genero, fila.objetivo)
+        assert (fila.kcal_obj, fila.prot_obj, fila.agua_obj) == esperado
+
+
+def test_roster_errores_con_la_fila_del_csv():
+    with pytest.raises(ValueError, match="fila 3: peso_kg"):
+        leer_roster(io.StringIO("peso,altura,edad,genero,objetivo\n70,170,30,Hombre,Tonificar\nx,170,30,Mujer,Tonificar\n"))